@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from benchmarks.generators import (
+    BMP_PEER,
+    SyntheticRule,
+    bmp_initiation,
+    bmp_route_monitoring,
+    generate_rules,
+)
+from benchmarks.parsers import _git_commit
+from flowspec_exporter.bmp import BMPServer
+from flowspec_exporter.flowspec import FlowSpec
+
+DEFAULT_HOST = "127.0.0.1"
+
+DEFAULT_PORT = 11019
+
+
+def router_messages(index: int, rules: list[SyntheticRule]) -> bytes:
+    """Initiation and one route monitoring message per rule of a router."""
+
+    peer = BMP_PEER + index
+
+    return bmp_initiation(f"router-{index}") + b"".join(
+        bmp_route_monitoring(rule, peer) for rule in rules
+    )
+
+
+async def send(host: str, port: int, data: bytes, hold: float) -> None:
+    """Send a BMP session and keep it open for `hold` seconds."""
+
+    _, writer = await asyncio.open_connection(host, port)
+
+    writer.write(data)
+    await writer.drain()
+
+    await asyncio.sleep(hold)
+
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    rules = generate_rules(args.rules)
+
+    sessions = [router_messages(i, rules) for i in range(args.routers)]
+
+    announced = 0
+
+    def on_change(event: str, flowspec: FlowSpec) -> None:
+        nonlocal announced
+
+        if event == "announce":
+            announced += 1
+
+    server: asyncio.Server | None = None
+    bmp_server = BMPServer(on_change)
+
+    host, port = args.host, args.port
+
+    if args.local:
+        server = await bmp_server.start(DEFAULT_HOST, 0)
+        host, port = server.sockets[0].getsockname()[:2]
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    senders = [
+        asyncio.create_task(send(host, port, data, args.hold)) for data in sessions
+    ]
+
+    result: dict[str, Any] = {
+        "sessions": len(sessions),
+        "bytes": sum(map(len, sessions)),
+    }
+
+    if server is not None:
+        # Wait for every rule to be announced, with the listener in the same
+        # process this measures the decoding side.
+        expected = args.routers * args.rules
+
+        while announced < expected:
+            await asyncio.sleep(0.001)
+
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        result |= {
+            "seconds": wall,
+            "rules_per_sec": expected / wall,
+            "cpu_seconds": cpu,
+            # ru_maxrss is in kilobytes on Linux.
+            "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        }
+
+    await asyncio.gather(*senders)
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+    return result
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(
+        description="Send synthetic rules to a BMP listener over concurrent sessions"
+    )
+    arg_parser.add_argument("--routers", type=int, default=10)
+    arg_parser.add_argument("--rules", type=int, default=10_000)
+    arg_parser.add_argument("--host", default=DEFAULT_HOST)
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument(
+        "--local",
+        action="store_true",
+        help="Start the listener in this process and measure how fast it "
+        "builds the rule tables",
+    )
+    arg_parser.add_argument(
+        "--hold",
+        type=float,
+        default=0,
+        help="Seconds to keep the sessions open after sending the rules",
+    )
+    arg_parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Where to write the results as JSON",
+    )
+
+    args = arg_parser.parse_args()
+
+    result = asyncio.run(run(args))
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {
+            "routers": args.routers,
+            "rules": args.rules,
+            "local": args.local,
+        },
+        "result": result,
+    }
+
+    with args.output as fp:
+        json.dump(report, fp, indent=2)
+        fp.write("\n")
+
+
+if __name__ == "__main__":
+    main()
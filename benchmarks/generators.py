@@ -0,0 +1,572 @@
+import random
+import struct
+from dataclasses import dataclass, field
+
+from netaddr import IPAddress, IPNetwork
+
+from flowspec_exporter.flowspec import (
+    Action,
+    BitmaskOp,
+    BitmaskValues,
+    FlowSpec,
+    NumericOpEq,
+    NumericOpGte,
+    NumericOpLte,
+    NumericValues,
+)
+
+PROTOCOLS = (1, 6, 17)
+
+PORTS = (22, 53, 80, 123, 443, 1900, 11211)
+
+TCP_FLAGS = (0x02, 0x10, 0x12)
+
+BMP_PEER = IPAddress("10.1.1.2")
+
+
+@dataclass
+class Counters:
+    matched_packets: int = 0
+    matched_bytes: int = 0
+    transmitted_packets: int = 0
+    transmitted_bytes: int = 0
+    dropped_packets: int = 0
+    dropped_bytes: int = 0
+
+
+@dataclass
+class SyntheticRule:
+    destination_prefix: IPNetwork
+    source_prefix: IPNetwork | None = None
+    ip_protocol: int | None = None
+    destination_port: int | None = None
+    source_port_range: tuple[int, int] | None = None
+    icmp_type: int | None = None
+    tcp_flags: int | None = None
+    packet_length: int | None = None
+    fragment: bool = False
+    action: Action = Action.DISCARD
+    rate_limit_bps: int = 0
+
+    counters: Counters = field(default_factory=Counters)
+
+
+def generate_rules(count: int, seed: int = 0) -> list[SyntheticRule]:
+    rnd = random.Random(seed)
+
+    rules: list[SyntheticRule] = []
+    seen: set[tuple] = set()
+
+    while len(rules) < count:
+        prefixlen = rnd.choice((24, 28, 32, 32, 32))
+        destination_prefix = IPNetwork(
+            f"{IPAddress(rnd.randrange(0x0B000000, 0xDF000000))}/{prefixlen}"
+        ).cidr
+
+        rule = SyntheticRule(destination_prefix=destination_prefix)
+
+        if rnd.random() < 0.2:
+            rule.source_prefix = IPNetwork(
+                f"{IPAddress(rnd.randrange(0x0B000000, 0xDF000000))}/16"
+            ).cidr
+
+        rule.ip_protocol = rnd.choice(PROTOCOLS)
+
+        if rule.ip_protocol == 1:
+            rule.icmp_type = rnd.choice((0, 3, 8, 11))
+        else:
+            if rnd.random() < 0.7:
+                rule.destination_port = rnd.choice(PORTS)
+            if rnd.random() < 0.3:
+                low = rnd.randrange(1024, 60000)
+                rule.source_port_range = (low, low + rnd.randrange(1, 5000))
+            if rule.ip_protocol == 6 and rnd.random() < 0.3:
+                rule.tcp_flags = rnd.choice(TCP_FLAGS)
+
+        if rnd.random() < 0.2:
+            rule.packet_length = rnd.choice((512, 1000, 1400))
+
+        if rule.ip_protocol == 17 and rnd.random() < 0.1:
+            rule.fragment = True
+
+        match rnd.random():
+            case x if x < 0.6:
+                rule.action = Action.DISCARD
+            case x if x < 0.9:
+                rule.action = Action.RATE_LIMIT
+                rule.rate_limit_bps = rnd.choice((1, 10, 100, 1000)) * 1_000_000
+            case _:
+                rule.action = Action.ACCEPT
+
+        key = (
+            rule.destination_prefix,
+            rule.source_prefix,
+            rule.ip_protocol,
+            rule.destination_port,
+            rule.source_port_range,
+            rule.icmp_type,
+            rule.tcp_flags,
+            rule.packet_length,
+            rule.fragment,
+        )
+        if key in seen:
+            continue
+        seen.add(key)
+
+        tick_counters(rule, rnd)
+
+        rules.append(rule)
+
+    return rules
+
+
+def tick_counters(rule: SyntheticRule, rnd: random.Random, seconds: float = 60) -> None:
+    """Advance the counters of a rule as if traffic hit it for `seconds`."""
+
+    packets = int(rnd.expovariate(1 / 1000) * seconds)
+    size = rnd.choice((64, 512, 1400))
+
+    counters = rule.counters
+
+    counters.matched_packets += packets
+    counters.matched_bytes += packets * size
+
+    match rule.action:
+        case Action.DISCARD:
+            counters.dropped_packets += packets
+            counters.dropped_bytes += packets * size
+        case Action.RATE_LIMIT:
+            transmitted = min(packets, rule.rate_limit_bps * int(seconds) // 8 // size)
+
+            counters.transmitted_packets += transmitted
+            counters.transmitted_bytes += transmitted * size
+            counters.dropped_packets += packets - transmitted
+            counters.dropped_bytes += (packets - transmitted) * size
+        case _:
+            counters.transmitted_packets += packets
+            counters.transmitted_bytes += packets * size
+
+
+def _cisco_ios_rule(rule: SyntheticRule) -> str:
+    s = [f"Dest:{rule.destination_prefix}"]
+
+    if rule.source_prefix is not None:
+        s.append(f"Source:{rule.source_prefix}")
+    if rule.ip_protocol is not None:
+        s.append(f"Proto:={rule.ip_protocol}")
+    if rule.destination_port is not None:
+        s.append(f"DPort:={rule.destination_port}")
+    if rule.source_port_range is not None:
+        s.append(f"SPort:>={rule.source_port_range[0]}&<={rule.source_port_range[1]}")
+    if rule.packet_length is not None:
+        s.append(f"Length:>={rule.packet_length}")
+    if rule.icmp_type is not None:
+        s.append(f"ICMPType:={rule.icmp_type}")
+    if rule.tcp_flags is not None:
+        s.append(f"TCPFlags:=0x{rule.tcp_flags:02x}")
+    if rule.fragment:
+        s.append("Frag:=IsF")
+
+    return ",".join(s)
+
+
+def cisco_ios_output(rules: list[SyntheticRule]) -> str:
+    """Render `show flowspec vrf all ipv4 detail`."""
+
+    lines = ["", "AFI: IPv4"]
+
+    for rule in rules:
+        counters = rule.counters
+
+        match rule.action:
+            case Action.DISCARD:
+                action = "Traffic-rate: 0 bps"
+            case Action.RATE_LIMIT:
+                action = f"Traffic-rate: {rule.rate_limit_bps} bps"
+            case _:
+                action = "transmit"
+
+        lines += [
+            f"  Flow           :{_cisco_ios_rule(rule)}",
+            f"    Actions      :{action}  (bgp.1)",
+            "    Statistics                        (packets/bytes)",
+            f"      Matched             :{counters.matched_packets:>20}/{counters.matched_bytes:<20}",
+        ]
+
+        if rule.action != Action.DISCARD:
+            lines.append(
+                f"      Transmitted         :{counters.transmitted_packets:>20}/{counters.transmitted_bytes:<20}"
+            )
+        if rule.action != Action.ACCEPT:
+            lines.append(
+                f"      Dropped             :{counters.dropped_packets:>20}/{counters.dropped_bytes:<20}"
+            )
+
+    return "\n".join(lines) + "\n"
+
+
+def _juniper_junos_prefix(prefix: IPNetwork | None) -> str:
+    if prefix is None:
+        return "*"
+    if prefix.prefixlen == 32:
+        return str(prefix.ip)
+    return str(prefix)
+
+
+def _juniper_junos_rule(rule: SyntheticRule) -> str:
+    s = [
+        _juniper_junos_prefix(rule.destination_prefix),
+        _juniper_junos_prefix(rule.source_prefix),
+    ]
+
+    if rule.ip_protocol is not None:
+        s.append(f"proto={rule.ip_protocol}")
+    if rule.destination_port is not None:
+        s.append(f"dstport={rule.destination_port}")
+    if rule.source_port_range is not None:
+        s.append(f"srcport>={rule.source_port_range[0]}&<={rule.source_port_range[1]}")
+    if rule.icmp_type is not None:
+        s.append(f"icmp-type={rule.icmp_type}")
+    if rule.tcp_flags is not None:
+        s.append(f"tcp-flag:{rule.tcp_flags:02x}")
+    if rule.packet_length is not None:
+        s.append(f"len>={rule.packet_length}")
+    if rule.fragment:
+        s.append("frag:02")
+
+    return ",".join(s)
+
+
+def _juniper_junos_policer(rule: SyntheticRule) -> str:
+    return f"{rule.rate_limit_bps // 1000}K_{_juniper_junos_rule(rule)}"
+
+
+def juniper_junos_output(rules: list[SyntheticRule]) -> str:
+    """Render `show firewall filter __flowspec_default_inet__`."""
+
+    lines = [
+        "",
+        "Filter: __flowspec_default_inet__",
+        "Counters:",
+        f"{'Name':<52}{'Bytes':>20}{'Packets':>20}",
+    ]
+
+    for rule in rules:
+        counters = rule.counters
+
+        # The counter of a rate limited rule only counts the transmitted traffic.
+        if rule.action == Action.RATE_LIMIT:
+            bytes, packets = counters.transmitted_bytes, counters.transmitted_packets
+        else:
+            bytes, packets = counters.matched_bytes, counters.matched_packets
+
+        lines.append(f"{_juniper_junos_rule(rule):<52}{bytes:>20}{packets:>20}")
+
+    lines += ["Policers:", f"{'Name':<52}{'Bytes':>20}{'Packets':>20}"]
+
+    for rule in rules:
+        if rule.action != Action.RATE_LIMIT:
+            continue
+
+        counters = rule.counters
+
+        lines.append(
+            f"{_juniper_junos_policer(rule):<52}{counters.dropped_bytes:>20}{counters.dropped_packets:>20}"
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+def juniper_junos_json_output(rules: list[SyntheticRule]) -> str:
+    """Render `show firewall filter __flowspec_default_inet__ | display json`."""
+
+    def entry(kind: str, name: str, bytes: int, packets: int) -> str:
+        return (
+            "{"
+            f'"{kind}-name": [{{"data": "{name}"}}], '
+            f'"packet-count": [{{"data": "{packets}"}}], '
+            f'"byte-count": [{{"data": "{bytes}"}}]'
+            "}"
+        )
+
+    counters = []
+    policers = []
+
+    for rule in rules:
+        if rule.action == Action.RATE_LIMIT:
+            counters.append(
+                entry(
+                    "counter",
+                    _juniper_junos_rule(rule),
+                    rule.counters.transmitted_bytes,
+                    rule.counters.transmitted_packets,
+                )
+            )
+            policers.append(
+                entry(
+                    "policer",
+                    _juniper_junos_policer(rule),
+                    rule.counters.dropped_bytes,
+                    rule.counters.dropped_packets,
+                )
+            )
+        else:
+            counters.append(
+                entry(
+                    "counter",
+                    _juniper_junos_rule(rule),
+                    rule.counters.matched_bytes,
+                    rule.counters.matched_packets,
+                )
+            )
+
+    return (
+        '{"firewall-information": [{"filter-information": [{'
+        '"filter-name": [{"data": "__flowspec_default_inet__"}], '
+        f'"counter": [{",\n".join(counters)}], '
+        f'"policer": [{",\n".join(policers)}]'
+        "}]}]}\n"
+    )
+
+
+def _huawei_vrp_rule(rule: SyntheticRule) -> list[str]:
+    lines = [f"   Destination IP : {rule.destination_prefix}"]
+
+    if rule.source_prefix is not None:
+        lines.append(f"   Source IP      : {rule.source_prefix}")
+    if rule.ip_protocol is not None:
+        lines.append(f"   Protocol       : eq {rule.ip_protocol}")
+    if rule.destination_port is not None:
+        lines.append(f"   Dest. Port     : eq {rule.destination_port}")
+    if rule.source_port_range is not None:
+        low, high = rule.source_port_range
+        lines.append(
+            f"   Src. Port      : greater or equal {low} and less or equal {high}"
+        )
+    if rule.icmp_type is not None:
+        lines.append(f"   ICMP Type      : eq {rule.icmp_type}")
+    if rule.tcp_flags is not None:
+        lines.append(f"   TCP-flags      : match {rule.tcp_flags}")
+    if rule.packet_length is not None:
+        lines.append(f"   Packet-Length  : greater or equal {rule.packet_length}")
+    if rule.fragment:
+        lines.append("   FragmentType   : match (Is a fragment)")
+
+    return lines
+
+
+def huawei_vrp_output(rules: list[SyntheticRule]) -> str:
+    """Render `display bgp flow vpnv4 vpn-instance <name> routing-table`."""
+
+    lines = [
+        "",
+        " BGP Local router ID is 10.1.1.1",
+        " Status codes: * - valid, > - best, d - damped,",
+        "               h - history,  i - internal, s - suppressed, S - Stale",
+        f" Total Number of Routes: {len(rules)}",
+        "",
+    ]
+
+    for re_index, rule in enumerate(rules, start=1):
+        lines += [
+            f" ReIndex : {re_index}",
+            " Dissemination Rules:",
+            *_huawei_vrp_rule(rule),
+            "   MED            : 0",
+            "   LocalPref      : 100",
+            "   PrefVal        : 0",
+            "",
+        ]
+
+    return "\n".join(lines) + "\n"
+
+
+def huawei_vrp_statistics_output(re_index: int, rule: SyntheticRule) -> str:
+    """Render `display flowspec vpnv4 vpn-instance <name> statistics <re_index>`."""
+
+    counters = rule.counters
+
+    return "\n".join(
+        [
+            "",
+            f" ReIndex: {re_index}",
+            " Dissemination Rules:",
+            *_huawei_vrp_rule(rule),
+            "",
+            " Item          Packets          Bytes        Pps        Bps",
+            f" Matched  {counters.matched_packets:>14} {counters.matched_bytes:>14}          0          0",
+            f" Passed   {counters.transmitted_packets:>14} {counters.transmitted_bytes:>14}          0          0",
+            f" Dropped  {counters.dropped_packets:>14} {counters.dropped_bytes:>14}          0          0",
+            "",
+        ]
+    )
+
+
+def _flowspec(rule: SyntheticRule) -> FlowSpec:
+    flowspec = FlowSpec(
+        destination_prefix=rule.destination_prefix,
+        source_prefix=rule.source_prefix,
+    )
+
+    if rule.ip_protocol is not None:
+        flowspec.ip_protocol = NumericValues((NumericOpEq, rule.ip_protocol))
+    if rule.destination_port is not None:
+        flowspec.destination_port = NumericValues((NumericOpEq, rule.destination_port))
+    if rule.source_port_range is not None:
+        flowspec.source_port = NumericValues(
+            (NumericOpGte, rule.source_port_range[0]),
+            (NumericOpLte.set_and(True), rule.source_port_range[1]),
+        )
+    if rule.icmp_type is not None:
+        flowspec.icmp_type = NumericValues((NumericOpEq, rule.icmp_type))
+    if rule.tcp_flags is not None:
+        flowspec.tcp_flags = BitmaskValues((BitmaskOp(match=True), rule.tcp_flags))
+    if rule.packet_length is not None:
+        flowspec.packet_length = NumericValues((NumericOpGte, rule.packet_length))
+    if rule.fragment:
+        flowspec.fragment = BitmaskValues((BitmaskOp(match=True), 0x02))
+
+    return flowspec
+
+
+def _mrt_record(timestamp: int, type_: int, subtype: int, data: bytes) -> bytes:
+    return struct.pack("!IHHI", timestamp, type_, subtype, len(data)) + data
+
+
+def _bgp_attribute(type_: int, data: bytes) -> bytes:
+    if len(data) > 0xFF:
+        return struct.pack("!BBH", 0xD0, type_, len(data)) + data
+
+    return struct.pack("!BBB", 0xC0, type_, len(data)) + data
+
+
+def _bgp_extended_communities(rule: SyntheticRule) -> bytes:
+    match rule.action:
+        case Action.DISCARD:
+            rate = 0.0
+        case Action.RATE_LIMIT:
+            rate = rule.rate_limit_bps / 8
+        case _:
+            return b""
+
+    return _bgp_attribute(16, struct.pack("!BBHf", 0x80, 0x06, 0, rate))
+
+
+def mrt_table_dump_output(rules: list[SyntheticRule], timestamp: int = 0) -> bytes:
+    """Render a `TABLE_DUMP_V2` RIB dump, one `RIB_GENERIC` record per rule."""
+
+    peer_ip = IPAddress("10.1.1.2")
+
+    records = [
+        _mrt_record(
+            timestamp,
+            13,
+            1,
+            IPAddress("10.1.1.1").packed
+            + struct.pack("!HH", 0, 1)
+            + struct.pack("!B", 0x02)
+            + peer_ip.packed
+            + peer_ip.packed
+            + struct.pack("!I", 65001),
+        )
+    ]
+
+    for sequence, rule in enumerate(rules):
+        attributes = _bgp_attribute(1, b"\x00") + _bgp_extended_communities(rule)
+
+        records.append(
+            _mrt_record(
+                timestamp,
+                13,
+                6,
+                struct.pack("!IHB", sequence, 1, 133)
+                + bytes(_flowspec(rule))
+                + struct.pack("!HHIH", 1, 0, timestamp, len(attributes))
+                + attributes,
+            )
+        )
+
+    return b"".join(records)
+
+
+def _bgp_update(rule: SyntheticRule, withdraw: bool = False) -> bytes:
+    if withdraw:
+        attributes = _bgp_attribute(
+            15, struct.pack("!HB", 1, 133) + bytes(_flowspec(rule))
+        )
+    else:
+        attributes = (
+            _bgp_attribute(1, b"\x00")
+            + _bgp_attribute(
+                14, struct.pack("!HBBB", 1, 133, 0, 0) + bytes(_flowspec(rule))
+            )
+            + _bgp_extended_communities(rule)
+        )
+
+    update = struct.pack("!HH", 0, len(attributes)) + attributes
+
+    return b"\xff" * 16 + struct.pack("!HB", 19 + len(update), 2) + update
+
+
+def mrt_bgp4mp_output(rules: list[SyntheticRule], timestamp: int = 0) -> bytes:
+    """Render `BGP4MP_MESSAGE_AS4` updates, one FlowSpec NLRI per update."""
+
+    header = struct.pack("!IIHH", 65001, 65000, 0, 1)
+    header += IPAddress("10.1.1.2").packed + IPAddress("10.1.1.1").packed
+
+    return b"".join(
+        _mrt_record(timestamp, 16, 4, header + _bgp_update(rule)) for rule in rules
+    )
+
+
+def _bmp_message(type_: int, data: bytes) -> bytes:
+    return struct.pack("!BIB", 3, 6 + len(data), type_) + data
+
+
+def _bmp_per_peer_header(
+    peer: IPAddress, timestamp: int, distinguisher: bytes = b""
+) -> bytes:
+    # A peer with a distinguisher is a peer of a VRF, RFC 7854 peer type 1.
+    return struct.pack(
+        "!BB8s16sIIII",
+        1 if distinguisher else 0,
+        0,
+        distinguisher,
+        b"\x00" * 12 + peer.packed,
+        65001,
+        int(peer),
+        timestamp,
+        0,
+    )
+
+
+def bmp_initiation(sys_name: str) -> bytes:
+    name = sys_name.encode()
+
+    return _bmp_message(4, struct.pack("!HH", 2, len(name)) + name)
+
+
+def bmp_route_monitoring(
+    rule: SyntheticRule,
+    peer: IPAddress = BMP_PEER,
+    timestamp: int = 0,
+    withdraw: bool = False,
+    distinguisher: bytes = b"",
+) -> bytes:
+    """Render a route monitoring message announcing or withdrawing a rule."""
+
+    return _bmp_message(
+        0,
+        _bmp_per_peer_header(peer, timestamp, distinguisher)
+        + _bgp_update(rule, withdraw),
+    )
+
+
+def bmp_peer_down(
+    peer: IPAddress = BMP_PEER, timestamp: int = 0, distinguisher: bytes = b""
+) -> bytes:
+    """Render a peer down message, the local system closed the session."""
+
+    return _bmp_message(
+        2, _bmp_per_peer_header(peer, timestamp, distinguisher) + b"\x01"
+    )
@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, cast
+
+import asyncssh
+
+from benchmarks import simulator
+from benchmarks.parsers import _git_commit
+from flowspec_exporter.cache import ParseCache
+from flowspec_exporter.parser import Platform, parse_flow_spec
+
+DEFAULT_DURATION = 30
+
+DEFAULT_SCRAPE_TIMEOUT = 60
+
+MODES = ["exporter", "worker"]
+
+
+def _start_simulator(args: argparse.Namespace) -> subprocess.Popen:
+    # The routers run in their own process so the CPU and memory measured
+    # here only belong to the scraping side.
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.simulator",
+            "--routers",
+            str(args.routers),
+            "--platforms",
+            *args.platforms,
+            "--rules",
+            str(args.rules),
+            "--latency",
+            str(args.latency),
+            "--jitter",
+            str(args.jitter),
+            "--host",
+            args.host,
+            "--port",
+            str(args.port),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+    assert process.stdout is not None
+
+    if not process.stdout.readline().startswith("ready"):
+        process.kill()
+        raise RuntimeError("Simulator failed to start")
+
+    return process
+
+
+def _worker_scraper(
+    args: argparse.Namespace, port: int, router: simulator.SimulatedRouter
+) -> Callable[[], Awaitable[int]]:
+    # Same collection path as `worker.scrape`, without the database insert.
+    parameters = simulator.router_parameters(
+        router.platform, args.juniper_junos_output_format
+    )
+    cache = ParseCache()
+
+    async def scrape() -> int:
+        async with asyncssh.connect(
+            args.host,
+            port=port,
+            username="admin",
+            known_hosts=None,
+            connect_timeout=DEFAULT_SCRAPE_TIMEOUT,
+        ) as conn:
+            entries = await parse_flow_spec(
+                platform=cast(Platform, router.platform),
+                connection=conn,
+                cache=cache,
+                **parameters,
+            )
+
+        now = datetime.now(timezone.utc)
+
+        rows = [
+            [
+                f"sim-{port}",
+                now,
+                entry.filter or entry.str_filter(),
+                entry.matched_packets,
+                entry.matched_bytes,
+                entry.transmitted_packets,
+                entry.transmitted_bytes,
+                entry.dropped_packets,
+                entry.dropped_bytes,
+            ]
+            for entry in entries
+        ]
+
+        return len(rows)
+
+    return scrape
+
+
+def _exporter_scraper(
+    args: argparse.Namespace, port: int, router: simulator.SimulatedRouter
+) -> Callable[[], Awaitable[int]]:
+    # Calls the `/metrics` handler directly, the HTTP layer isn't measured.
+    from flowspec_exporter import exporter
+
+    name = f"sim-{port}"
+
+    exporter.app.extra[name] = exporter.Router(
+        name=name,
+        platform=router.platform,
+        ssh_host=args.host,
+        ssh_port=port,
+        ssh_username="admin",
+        parameters=simulator.router_parameters(
+            router.platform, args.juniper_junos_output_format
+        ),
+    )
+
+    async def scrape() -> int:
+        response = await exporter.metrics(name)
+        return len(response.body)
+
+    return scrape
+
+
+async def _scrape_loop(
+    scrape: Callable[[], Awaitable[int]],
+    deadline: float,
+    interval: float,
+    latencies: list[float],
+    errors: list[str],
+) -> None:
+    while (start := time.perf_counter()) < deadline:
+        try:
+            await asyncio.wait_for(scrape(), DEFAULT_SCRAPE_TIMEOUT)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        else:
+            latencies.append(time.perf_counter() - start)
+
+        if interval:
+            await asyncio.sleep(max(0, interval - (time.perf_counter() - start)))
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    routers = simulator.create_routers(args.routers, args.platforms, 0)
+
+    match args.mode:
+        case "exporter":
+            create_scraper = _exporter_scraper
+        case _:
+            create_scraper = _worker_scraper
+
+    scrapers = [
+        create_scraper(args, args.port + i, router) for i, router in enumerate(routers)
+    ]
+
+    latencies: list[float] = []
+    errors: list[str] = []
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    await asyncio.gather(
+        *(
+            _scrape_loop(
+                scrape, wall_start + args.duration, args.interval, latencies, errors
+            )
+            for scrape in scrapers
+        )
+    )
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    result: dict[str, Any] = {
+        "scrapes": len(latencies),
+        "errors": len(errors),
+        "seconds": wall,
+        "scrapes_per_sec": len(latencies) / wall,
+        "rules_per_sec": len(latencies) * args.rules / wall,
+        "cpu_seconds": cpu,
+        "cpu_utilization": cpu / wall,
+        # ru_maxrss is in kilobytes on Linux.
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+    if latencies:
+        result["latency"] = {
+            "min": min(latencies),
+            "mean": statistics.fmean(latencies),
+            "max": max(latencies),
+        }
+
+        if len(latencies) > 1:
+            percentiles = statistics.quantiles(latencies, n=100)
+            result["latency"] |= {
+                "p50": percentiles[49],
+                "p95": percentiles[94],
+                "p99": percentiles[98],
+            }
+
+    if errors:
+        result["first_errors"] = errors[:10]
+
+    return result
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(
+        description="Scrape simulated routers and measure the throughput, "
+        "latency, CPU and memory of the scraping side"
+    )
+    simulator.add_arguments(arg_parser)
+    arg_parser.add_argument("--mode", choices=MODES, default="worker")
+    arg_parser.add_argument(
+        "--duration", type=float, default=DEFAULT_DURATION, help="Seconds to run"
+    )
+    arg_parser.add_argument(
+        "--interval",
+        type=float,
+        default=0,
+        help="Seconds between the scrapes of a router, 0 to scrape back to back",
+    )
+    arg_parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Where to write the results as JSON",
+    )
+
+    args = arg_parser.parse_args()
+
+    process = _start_simulator(args)
+
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        process.terminate()
+        process.wait()
+
+    simulator_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {
+            "mode": args.mode,
+            "routers": args.routers,
+            "platforms": args.platforms,
+            "rules": args.rules,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "interval": args.interval,
+            "juniper_junos_output_format": args.juniper_junos_output_format,
+        },
+        "result": result,
+        "simulator": {
+            "cpu_seconds": simulator_usage.ru_utime + simulator_usage.ru_stime,
+            "max_rss_bytes": simulator_usage.ru_maxrss * 1024,
+        },
+    }
+
+    with args.output as fp:
+        json.dump(report, fp, indent=2)
+        fp.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from benchmarks.generators import (
+    SyntheticRule,
+    cisco_ios_output,
+    generate_rules,
+    huawei_vrp_output,
+    juniper_junos_json_output,
+    juniper_junos_output,
+)
+from flowspec_exporter.cache import ParseCache
+from flowspec_exporter.flowspec import FlowSpec, FlowSpecs, sort_flows
+from flowspec_exporter.routers.cisco_ios import parse_flows as cisco_ios_parse_flows
+from flowspec_exporter.routers.huawei_vrp import parse_flows as huawei_vrp_parse_flows
+from flowspec_exporter.routers.juniper_junos import (
+    parse_flows as juniper_junos_parse_flows,
+)
+from flowspec_exporter.routers.juniper_junos import (
+    parse_flows_json as juniper_junos_json_parse_flows,
+)
+
+DEFAULT_SIZES = [100, 10_000, 100_000]
+
+DEFAULT_REPEAT = 3
+
+PLATFORMS: dict[
+    str,
+    tuple[
+        Callable[[list[SyntheticRule]], str],
+        Callable[[str, ParseCache | None], list[FlowSpec]],
+    ],
+] = {
+    "cisco_ios": (cisco_ios_output, cisco_ios_parse_flows),
+    "juniper_junos": (juniper_junos_output, juniper_junos_parse_flows),
+    "juniper_junos_json": (juniper_junos_json_output, juniper_junos_json_parse_flows),
+    "huawei_vrp": (huawei_vrp_output, huawei_vrp_parse_flows),
+}
+
+
+def _best_of(repeat: int, func: Callable[[], Any]) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def _peak_memory(func: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def _result(operation: str, rules: int, seconds: float, **extra: Any) -> dict:
+    return {
+        "operation": operation,
+        "rules": rules,
+        "seconds": seconds,
+        "rules_per_sec": rules / seconds if seconds else None,
+        **extra,
+    }
+
+
+def run_platform(name: str, size: int, repeat: int) -> list[dict]:
+    render, parse = PLATFORMS[name]
+
+    output = render(generate_rules(size))
+    flows = parse(output, None)
+    nlri = bytes(FlowSpecs(flows=flows))  # type: ignore
+
+    # Juniper reports a counter and a policer for rate limited rules.
+    cache = ParseCache(2 * size)
+    parse(output, cache)
+
+    results = [
+        _result(
+            "parse_flows",
+            len(flows),
+            _best_of(repeat, lambda: parse(output, None)),
+            peak_memory_bytes=_peak_memory(lambda: parse(output, None)),
+            output_bytes=len(output),
+        ),
+        _result(
+            "parse_flows_cached",
+            len(flows),
+            _best_of(repeat, lambda: parse(output, cache)),
+        ),
+        _result(
+            "str_filter",
+            len(flows),
+            _best_of(repeat, lambda: [flow.str_filter() for flow in flows]),
+        ),
+        _result(
+            "to_nlri",
+            len(flows),
+            _best_of(repeat, lambda: [flow.to_nlri() for flow in flows]),
+        ),
+        _result(
+            "sort_flows",
+            len(flows),
+            _best_of(repeat, lambda: sort_flows(flows)),
+        ),
+        _result(
+            "nlri_from_bytes",
+            len(flows),
+            _best_of(repeat, lambda: FlowSpecs.from_bytes(nlri)),
+            input_bytes=len(nlri),
+        ),
+        _result(
+            "to_json",
+            len(flows),
+            _best_of(repeat, lambda: FlowSpecs(flows=flows).to_json()),  # type: ignore
+            peak_memory_bytes=_peak_memory(
+                lambda: FlowSpecs(flows=flows).to_json()  # type: ignore
+            ),
+        ),
+    ]
+
+    for result in results:
+        result["platform"] = name
+        result["size"] = size
+
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict) -> None:
+    def key(result: dict) -> tuple:
+        return result["platform"], result["size"], result["operation"]
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+
+    print(
+        f"{'platform':<20}{'size':>8}  {'operation':<20}{'baseline':>12}{'current':>12}{'time':>9}"
+    )
+
+    for result in current["results"]:
+        if (baseline_result := baseline_results.get(key(result))) is None:
+            continue
+
+        change = result["seconds"] / baseline_result["seconds"] - 1
+
+        print(
+            f"{result['platform']:<20}{result['size']:>8}  {result['operation']:<20}"
+            f"{baseline_result['rules_per_sec']:>12.0f}{result['rules_per_sec']:>12.0f}"
+            f"{change:>+9.1%}"
+        )
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(
+        description="Benchmark the router output parsers with synthetic rules"
+    )
+    arg_parser.add_argument(
+        "--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Number of rules"
+    )
+    arg_parser.add_argument(
+        "--platforms", nargs="+", choices=PLATFORMS.keys(), default=list(PLATFORMS)
+    )
+    arg_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    arg_parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Where to write the results as JSON",
+    )
+    arg_parser.add_argument(
+        "--compare",
+        type=argparse.FileType("r"),
+        help="Results of a previous run to compare against",
+    )
+
+    args = arg_parser.parse_args()
+
+    results: list[dict] = []
+
+    for size in args.sizes:
+        for name in args.platforms:
+            print(f"Running {name} with {size} rules", file=sys.stderr)
+            results.extend(run_platform(name, size, args.repeat))
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    with args.output as fp:
+        json.dump(report, fp, indent=2)
+        fp.write("\n")
+
+    if args.compare:
+        with args.compare as fp:
+            compare(json.load(fp), report)
+
+
+if __name__ == "__main__":
+    main()
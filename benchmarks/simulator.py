@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import itertools
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import TextIO
+
+import asyncssh
+
+from benchmarks.generators import (
+    SyntheticRule,
+    cisco_ios_output,
+    generate_rules,
+    huawei_vrp_output,
+    huawei_vrp_statistics_output,
+    juniper_junos_json_output,
+    juniper_junos_output,
+    tick_counters,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 2200
+
+DEFAULT_RULES = 1000
+
+PLATFORMS = ["cisco_ios", "juniper_junos", "huawei_vrp"]
+
+HUAWEI_VRP_PROMPT = "<HUAWEI>"
+
+RE_CISCO_IOS_SHOW_FLOWSPEC = re.compile(r"show flowspec vrf \S+ ipv[46] detail")
+
+RE_JUNIPER_JUNOS_SHOW_FIREWALL_FILTER = re.compile(
+    r"show firewall filter \S+(?P<json>\s*\|\s*display json)?(\s*\|\s*no-more)?"
+)
+
+RE_HUAWEI_VRP_DISPLAY_ROUTING_TABLE = re.compile(
+    r"display bgp flow vpnv4 vpn-instance \S+ routing-table(\s*\|\s*no-more)?"
+)
+RE_HUAWEI_VRP_DISPLAY_STATISTICS = re.compile(
+    r"display flowspec vpnv4 vpn-instance \S+ statistics (?P<re_index>\d+)(\s*\|\s*no-more)?"
+)
+
+
+@dataclass
+class SimulatedRouter:
+    """Serves a synthetic rule table whose counters move with the wall clock."""
+
+    platform: str
+    rules: list[SyntheticRule]
+    latency: float = 0
+    jitter: float = 0
+    seed: int = 0
+
+    commands: int = field(default=0, init=False)
+
+    _rnd: random.Random = field(init=False)
+    _last_tick: float = field(init=False)
+
+    def __post_init__(self) -> None:
+        self._rnd = random.Random(self.seed)
+        self._last_tick = time.monotonic()
+
+    def tick(self) -> None:
+        now = time.monotonic()
+        seconds, self._last_tick = now - self._last_tick, now
+
+        for rule in self.rules:
+            tick_counters(rule, self._rnd, seconds)
+
+    async def delay(self) -> None:
+        delay = self.latency + self._rnd.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def execute(self, command: str) -> str | None:
+        """Return the output of `command`, None when it isn't recognized."""
+
+        self.commands += 1
+
+        match self.platform:
+            case "cisco_ios":
+                if RE_CISCO_IOS_SHOW_FLOWSPEC.fullmatch(command):
+                    self.tick()
+                    return cisco_ios_output(self.rules)
+            case "juniper_junos":
+                if match := RE_JUNIPER_JUNOS_SHOW_FIREWALL_FILTER.fullmatch(command):
+                    self.tick()
+                    if match.group("json"):
+                        return juniper_junos_json_output(self.rules)
+                    return juniper_junos_output(self.rules)
+            case "huawei_vrp":
+                if RE_HUAWEI_VRP_DISPLAY_ROUTING_TABLE.fullmatch(command):
+                    self.tick()
+                    return huawei_vrp_output(self.rules)
+                if match := RE_HUAWEI_VRP_DISPLAY_STATISTICS.fullmatch(command):
+                    re_index = int(match.group("re_index"))
+                    if 0 < re_index <= len(self.rules):
+                        return huawei_vrp_statistics_output(
+                            re_index, self.rules[re_index - 1]
+                        )
+
+        return None
+
+    async def handle_process(self, process: asyncssh.SSHServerProcess) -> None:
+        try:
+            if process.command is None:
+                await self._handle_shell(process)
+            else:
+                await self._handle_exec(process)
+        except (asyncssh.BreakReceived, asyncssh.TerminalSizeChanged):
+            process.exit(1)
+        except (BrokenPipeError, ConnectionError, asyncssh.Error):
+            process.close()
+
+    async def _handle_exec(self, process: asyncssh.SSHServerProcess) -> None:
+        await self.delay()
+
+        if (output := self.execute(process.command.strip())) is None:
+            process.stderr.write(f"% Invalid input: {process.command}\n")
+            process.exit(1)
+            return
+
+        process.stdout.write(output)
+        process.exit(0)
+
+    async def _handle_shell(self, process: asyncssh.SSHServerProcess) -> None:
+        # VRP has no exec channel, commands are typed in a shell which echoes
+        # them and prints the prompt once the output is done.
+        process.stdout.write(
+            f"\nInfo: The max number of VTY users is 10.\n\n{HUAWEI_VRP_PROMPT}"
+        )
+
+        while line := await process.stdin.readline():
+            command = line.strip()
+
+            if command in ("quit", "exit"):
+                break
+
+            if command:
+                await self.delay()
+
+                if (output := self.execute(command)) is None:
+                    output = "\nError: Unrecognized command found at '^' position.\n"
+
+                process.stdout.write(f"{command}\n{output}\n")
+
+            process.stdout.write(HUAWEI_VRP_PROMPT)
+
+        process.exit(0)
+
+
+class SimulatorServer(asyncssh.SSHServer):
+    def begin_auth(self, username: str) -> bool:
+        # Accept any user without credentials.
+        return False
+
+
+async def start_router(
+    router: SimulatedRouter,
+    host: str,
+    port: int,
+    server_host_key: asyncssh.SSHKey,
+) -> asyncssh.SSHAcceptor:
+    return await asyncssh.create_server(
+        SimulatorServer,
+        host,
+        port,
+        server_host_keys=[server_host_key],
+        process_factory=router.handle_process,
+    )
+
+
+def create_routers(
+    count: int,
+    platforms: list[str],
+    rules: int,
+    latency: float = 0,
+    jitter: float = 0,
+) -> list[SimulatedRouter]:
+    return [
+        SimulatedRouter(
+            platform=platform,
+            rules=generate_rules(rules, seed=i),
+            latency=latency,
+            jitter=jitter,
+            seed=i,
+        )
+        for i, platform in zip(range(count), itertools.cycle(platforms))
+    ]
+
+
+def router_parameters(platform: str, juniper_junos_output_format: str) -> dict:
+    match platform:
+        case "cisco_ios":
+            return {"vrf": "all"}
+        case "juniper_junos":
+            return {"output_format": juniper_junos_output_format}
+        case "huawei_vrp":
+            return {"vpn_instance": "flowspec"}
+        case _:
+            raise ValueError(f"Unsupported platform: {platform}")
+
+
+def write_config(
+    fp: TextIO,
+    routers: list[SimulatedRouter],
+    host: str,
+    port: int,
+    juniper_junos_output_format: str = "text",
+) -> None:
+    """Write a config file pointing the worker and the exporter at the routers."""
+
+    for i, router in enumerate(routers):
+        parameters = router_parameters(router.platform, juniper_junos_output_format)
+
+        fp.write(
+            "[[routers]]\n"
+            f'name = "sim-{i}"\n'
+            f'platform = "{router.platform}"\n'
+            'scrape_interval = "1m"\n'
+            'scrape_timeout = "10s"\n'
+            f'ssh_host = "{host}"\n'
+            f"ssh_port = {port + i}\n"
+            'ssh_username = "admin"\n'
+            "\n"
+            "[routers.parameters]\n"
+            + "".join(f'{key} = "{value}"\n' for key, value in parameters.items())
+            + "\n"
+        )
+
+
+async def serve(args: argparse.Namespace) -> None:
+    routers = create_routers(
+        args.routers, args.platforms, args.rules, args.latency, args.jitter
+    )
+
+    server_host_key = asyncssh.generate_private_key("ssh-ed25519")
+
+    servers = [
+        await start_router(router, args.host, args.port + i, server_host_key)
+        for i, router in enumerate(routers)
+    ]
+
+    if args.config:
+        with args.config as fp:
+            write_config(
+                fp, routers, args.host, args.port, args.juniper_junos_output_format
+            )
+
+    # Let a parent process know when the routers accept connections.
+    print(f"ready {args.host}:{args.port}-{args.port + len(routers) - 1}", flush=True)
+
+    try:
+        await asyncio.gather(*(server.wait_closed() for server in servers))
+    finally:
+        for server in servers:
+            server.close()
+
+
+def add_arguments(arg_parser: argparse.ArgumentParser) -> None:
+    arg_parser.add_argument(
+        "--routers", type=int, default=1, help="Number of simulated routers"
+    )
+    arg_parser.add_argument(
+        "--platforms",
+        nargs="+",
+        choices=PLATFORMS,
+        default=PLATFORMS,
+        help="Platforms of the routers, assigned round robin",
+    )
+    arg_parser.add_argument(
+        "--rules", type=int, default=DEFAULT_RULES, help="Number of rules per router"
+    )
+    arg_parser.add_argument(
+        "--latency", type=float, default=0, help="Seconds before each command output"
+    )
+    arg_parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0,
+        help="Maximum seconds added to or removed from the latency",
+    )
+    arg_parser.add_argument("--host", default=DEFAULT_HOST)
+    arg_parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="Port of the first router, the others use the next ports",
+    )
+    arg_parser.add_argument(
+        "--juniper-junos-output-format",
+        choices=["text", "json"],
+        default="text",
+        help="Output format the generated config asks the Juniper routers for",
+    )
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(
+        description="Serve synthetic FlowSpec tables over SSH, emulating the router CLIs"
+    )
+    add_arguments(arg_parser)
+    arg_parser.add_argument(
+        "--config",
+        type=argparse.FileType("w"),
+        help="Write a config file for the worker and the exporter",
+    )
+
+    args = arg_parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("Stopped", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.generators import (
+    cisco_ios_output,
+    generate_rules,
+    huawei_vrp_output,
+    juniper_junos_json_output,
+    juniper_junos_output,
+)
+from benchmarks.parsers import _git_commit
+
+DEFAULT_RUNS = 20
+
+DEFAULT_RULES = 10
+
+# Median wall time of a single file parse by the CLI, in milliseconds.
+DEFAULT_BUDGET = 100.0
+
+OUTPUTS = {
+    "cisco_ios_parse_flows": cisco_ios_output,
+    "juniper_junos_parse_flows": juniper_junos_output,
+    "juniper_junos_json_parse_flows": juniper_junos_json_output,
+    "huawei_vrp_parse_flows": huawei_vrp_output,
+}
+
+
+def _run(args: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def _import_times(args: list[str], top: int) -> list[dict]:
+    """Slowest imports of a run, cumulative, from `python -X importtime`."""
+
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    ).stderr
+
+    imports = []
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative, module = line.split("|")
+
+        if cumulative.strip().isdigit():
+            imports.append(
+                {"module": module.strip(), "seconds": int(cumulative) / 1_000_000}
+            )
+
+    return sorted(imports, key=lambda i: i["seconds"], reverse=True)[:top]
+
+
+def run_parser(name: str, path: str, runs: int) -> dict:
+    args = ["-m", "flowspec_exporter.main", "--parser", name, path]
+
+    seconds = sorted(_run(args) for _ in range(runs))
+
+    return {
+        "parser": name,
+        "runs": runs,
+        "median_seconds": statistics.median(seconds),
+        "p95_seconds": seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))],
+        "imports": _import_times(args, 10),
+    }
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(
+        description="Measure the cold start of the offline parsing CLI, a new "
+        "interpreter per run"
+    )
+    arg_parser.add_argument(
+        "--parsers", nargs="+", choices=OUTPUTS.keys(), default=list(OUTPUTS)
+    )
+    arg_parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    arg_parser.add_argument(
+        "--rules", type=int, default=DEFAULT_RULES, help="Rules of the parsed output"
+    )
+    arg_parser.add_argument(
+        "--budget",
+        type=float,
+        default=DEFAULT_BUDGET,
+        help="Median milliseconds allowed per run, exits with 1 above it",
+    )
+    arg_parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Where to write the results as JSON",
+    )
+
+    args = arg_parser.parse_args()
+
+    rules = generate_rules(args.rules)
+    results: list[dict] = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The interpreter alone, the floor of every run.
+        baseline = statistics.median(_run(["-c", "pass"]) for _ in range(args.runs))
+
+        for name in args.parsers:
+            path = os.path.join(directory, name)
+
+            with open(path, "w") as fp:
+                fp.write(OUTPUTS[name](rules))
+
+            print(f"Running {name}", file=sys.stderr)
+            results.append(run_parser(name, path, args.runs))
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "interpreter_seconds": baseline,
+        "budget_seconds": args.budget / 1000,
+        "results": results,
+    }
+
+    with args.output as fp:
+        json.dump(report, fp, indent=2)
+        fp.write("\n")
+
+    over = [
+        result for result in results if result["median_seconds"] * 1000 > args.budget
+    ]
+
+    for result in over:
+        print(
+            f"{result['parser']}: {result['median_seconds'] * 1000:.1f}ms over "
+            f"the {args.budget:.0f}ms budget",
+            file=sys.stderr,
+        )
+
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,561 @@
+import argparse
+import bisect
+import functools
+import json
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, NamedTuple
+
+from netaddr import IPNetwork
+
+from flowspec_exporter.flowspec import (
+    BitmaskOp,
+    BitmaskValues,
+    FlowSpec,
+    NumericOp,
+    NumericValues,
+)
+
+# Width of the header field matched by each component, the values of a
+# component are handled as a bitset over every possible value of the field.
+DOMAIN_BITS = {
+    "ip_protocol": 8,
+    "port": 16,
+    "destination_port": 16,
+    "source_port": 16,
+    "icmp_type": 8,
+    "icmp_code": 8,
+    "tcp_flags": 12,
+    "packet_length": 16,
+    "dscp": 6,
+    "fragment": 8,
+}
+
+# Components matched on their own field, the ports are handled apart since
+# `port` matches either of them.
+_DIMENSIONS = (
+    "icmp_type",
+    "icmp_code",
+    "tcp_flags",
+    "packet_length",
+    "dscp",
+    "fragment",
+)
+
+# Rules of a destination prefix compared one by one, the larger groups are
+# looked up in the interval indexes.
+INDEX_THRESHOLD = 16
+
+TCP = 6
+UDP = 17
+ICMP = 1
+ICMPV6 = 58
+
+
+def _full(bits: int) -> int:
+    return (1 << (1 << bits)) - 1
+
+
+def _protocols(*protocols: int) -> int:
+    return sum(1 << protocol for protocol in protocols)
+
+
+@functools.lru_cache(maxsize=4096)
+def _numeric_term(op: NumericOp, value: int, bits: int) -> int:
+    size = 1 << bits
+
+    below = (1 << min(value, size)) - 1
+    equal = 1 << value if value < size else 0
+    above = _full(bits) & ~(below | equal)
+
+    return (below if op.lt else 0) | (equal if op.eq else 0) | (above if op.gt else 0)
+
+
+@functools.lru_cache(maxsize=4096)
+def _bitmask_term(op: BitmaskOp, value: int, bits: int) -> int:
+    result = 0
+
+    for i in range(1 << bits):
+        masked = i & value
+        matched = masked == value if op.match else masked != 0
+
+        if matched != op.not_:
+            result |= 1 << i
+
+    return result
+
+
+@functools.lru_cache(maxsize=4096)
+def value_set(values: NumericValues | BitmaskValues, bits: int) -> int:
+    """Bitset of the field values matched by an operator list.
+
+    Same grouping as `matching._evaluate`, AND binds tighter than OR.
+    """
+
+    term = _bitmask_term if isinstance(values, BitmaskValues) else _numeric_term
+
+    result = 0
+    group: int | None = None
+
+    for op, value in values:
+        mask = term(op, value, bits)  # type: ignore
+
+        if op.and_ and group is not None:
+            group &= mask
+        else:
+            if group is not None:
+                result |= group
+            group = mask
+
+    if group is not None:
+        result |= group
+
+    return result
+
+
+class _Prefix(NamedTuple):
+    version: int
+    prefixlen: int
+    network: int
+
+    @classmethod
+    def from_network(cls, prefix: IPNetwork | None) -> "_Prefix | None":
+        if prefix is None:
+            return None
+
+        return cls(prefix.version, prefix.prefixlen, int(prefix.network))
+
+    def ancestor(self, prefixlen: int) -> "_Prefix":
+        shift = (32 if self.version == 4 else 128) - prefixlen
+
+        return _Prefix(self.version, prefixlen, self.network >> shift << shift)
+
+    def contains(self, other: "_Prefix") -> bool:
+        return (
+            self.version == other.version
+            and self.prefixlen <= other.prefixlen
+            and other.ancestor(self.prefixlen).network == self.network
+        )
+
+
+def _prefix_contains(a: _Prefix | None, b: _Prefix | None) -> bool:
+    return a is None or (b is not None and a.contains(b))
+
+
+def _prefix_intersects(a: _Prefix | None, b: _Prefix | None) -> bool:
+    # Prefixes are either nested or disjoint.
+    return a is None or b is None or a.contains(b) or b.contains(a)
+
+
+@dataclass(slots=True)
+class _Rule:
+    # Position in the precedence order, lower first.
+    position: int
+    flow: FlowSpec
+    version: int | None
+    destination: _Prefix | None
+    source: _Prefix | None
+    protocols: int
+    # (destination ports, source ports) pairs the rule matches the union of,
+    # one pair without `port` and two with it (either port in the set).
+    ports: tuple[tuple[int, int], ...]
+    dimensions: tuple[int, ...]
+    # Lowest and highest value matched on each indexed dimension, see
+    # `_hulls`.
+    hulls: tuple[tuple[int, int], ...] = ()
+
+
+def _hull(values: int) -> tuple[int, int]:
+    return (values & -values).bit_length() - 1, values.bit_length() - 1
+
+
+def _hulls(rule: _Rule) -> tuple[tuple[int, int], ...]:
+    """Ranges of the protocols, destination and source ports, and the other
+    dimensions matched by a non-empty rule, rules matching some common packets
+    overlap on all of them."""
+
+    destination_ports = source_ports = 0
+
+    for d, s in rule.ports:
+        destination_ports |= d
+        source_ports |= s
+
+    return tuple(
+        _hull(values)
+        for values in (rule.protocols, destination_ports, source_ports)
+        + rule.dimensions
+    )
+
+
+class _Node(NamedTuple):
+    center: int
+    # The intervals containing the center, by ascending low and descending
+    # high bound.
+    by_low: list[tuple[int, int, _Rule]]
+    by_high: list[tuple[int, int, _Rule]]
+    left: "_Node | None"
+    right: "_Node | None"
+
+
+def _build(intervals: list[tuple[int, int, _Rule]]) -> _Node | None:
+    if not intervals:
+        return None
+
+    bounds = sorted(bound for low, high, _ in intervals for bound in (low, high))
+    center = bounds[len(bounds) // 2]
+
+    here = [i for i in intervals if i[0] <= center <= i[1]]
+
+    return _Node(
+        center,
+        sorted(here, key=lambda i: i[0]),
+        sorted(here, key=lambda i: i[1], reverse=True),
+        _build([i for i in intervals if i[1] < center]),
+        _build([i for i in intervals if i[0] > center]),
+    )
+
+
+class _Intervals:
+    """Centered interval tree of the ranges of the rules on one dimension."""
+
+    def __init__(self, intervals: list[tuple[int, int, _Rule]]) -> None:
+        self.lows = sorted(low for low, _, _ in intervals)
+        self.highs = sorted(high for _, high, _ in intervals)
+        self.root = _build(intervals)
+
+    def count(self, low: int, high: int) -> int:
+        """Number of ranges overlapping `[low, high]`, the ones starting at
+        most at `high` but not those ending before `low`."""
+
+        return bisect.bisect_right(self.lows, high) - bisect.bisect_left(
+            self.highs, low
+        )
+
+    def overlapping(self, low: int, high: int) -> Iterator[_Rule]:
+        nodes = [self.root]
+
+        while nodes:
+            if (node := nodes.pop()) is None:
+                continue
+
+            if high < node.center:
+                for i in node.by_low:
+                    if i[0] > high:
+                        break
+                    yield i[2]
+
+                nodes.append(node.left)
+            elif low > node.center:
+                for i in node.by_high:
+                    if i[1] < low:
+                        break
+                    yield i[2]
+
+                nodes.append(node.right)
+            else:
+                for i in node.by_low:
+                    yield i[2]
+
+                nodes.append(node.left)
+                nodes.append(node.right)
+
+
+class _Group:
+    """The rules of a destination prefix, with an interval index per
+    dimension once there are more than `INDEX_THRESHOLD`."""
+
+    def __init__(self) -> None:
+        self.rules: list[_Rule] = []
+        self._indexes: list[_Intervals] | None = None
+
+    def candidates(self, rule: _Rule) -> Iterable[_Rule]:
+        """The rules possibly matching some packets of `rule`, a superset."""
+
+        if len(self.rules) <= INDEX_THRESHOLD:
+            return self.rules
+
+        if self._indexes is None:
+            self._indexes = [
+                _Intervals([(*other.hulls[i], other) for other in self.rules])
+                for i in range(len(rule.hulls))
+            ]
+
+        # Enumerated from the dimension the fewest rules overlap on.
+        index, (low, high) = min(
+            zip(self._indexes, rule.hulls), key=lambda i: i[0].count(*i[1])
+        )
+
+        return sorted(index.overlapping(low, high), key=lambda other: other.position)
+
+
+def _rule(position: int, flow: FlowSpec) -> _Rule:
+    def values(key: str) -> int:
+        value = getattr(flow, key)
+        bits = DOMAIN_BITS[key]
+
+        return _full(bits) if value is None else value_set(value, bits)
+
+    destination = _Prefix.from_network(flow.destination_prefix)
+    source = _Prefix.from_network(flow.source_prefix)
+
+    version = None
+
+    if destination is not None:
+        version = destination.version
+    elif source is not None:
+        version = source.version
+
+    # The components of the transport headers only match their protocols.
+    protocols = values("ip_protocol")
+
+    if (
+        flow.port is not None
+        or flow.destination_port is not None
+        or flow.source_port is not None
+    ):
+        protocols &= _protocols(TCP, UDP)
+    if flow.icmp_type is not None or flow.icmp_code is not None:
+        protocols &= _protocols(ICMP, ICMPV6)
+    if flow.tcp_flags is not None:
+        protocols &= _protocols(TCP)
+
+    destination_ports = values("destination_port")
+    source_ports = values("source_port")
+
+    if flow.port is None:
+        ports = ((destination_ports, source_ports),)
+    else:
+        port = values("port")
+        ports = (
+            (destination_ports & port, source_ports),
+            (destination_ports, source_ports & port),
+        )
+
+    return _Rule(
+        position=position,
+        flow=flow,
+        version=version,
+        destination=destination,
+        source=source,
+        protocols=protocols,
+        ports=tuple((d, s) for d, s in ports if d and s),
+        dimensions=tuple(values(key) for key in _DIMENSIONS),
+    )
+
+
+def match_key(flow: FlowSpec) -> tuple:
+    """Key of the packets matched by a rule, equal for the rules written
+    differently but matching the same values, e.g. `0x10` and `=0x10` for the
+    TCP flags."""
+
+    return (
+        _Prefix.from_network(flow.destination_prefix),
+        _Prefix.from_network(flow.source_prefix),
+        *(
+            None if (value := getattr(flow, key)) is None else value_set(value, bits)
+            for key, bits in DOMAIN_BITS.items()
+        ),
+    )
+
+
+def _is_empty(rule: _Rule) -> bool:
+    return not rule.protocols or not rule.ports or not all(rule.dimensions)
+
+
+def _contains(a: _Rule, b: _Rule) -> bool:
+    """Whether every packet matched by `b` is matched by `a`.
+
+    Only a sufficient condition with `port`, a pair of ports of `b` must be
+    within a single pair of `a`.
+    """
+
+    return (
+        (a.version is None or a.version == b.version)
+        and _prefix_contains(a.destination, b.destination)
+        and _prefix_contains(a.source, b.source)
+        and not b.protocols & ~a.protocols
+        and all(not y & ~x for x, y in zip(a.dimensions, b.dimensions))
+        and all(
+            any(not d & ~ad and not s & ~as_ for ad, as_ in a.ports) for d, s in b.ports
+        )
+    )
+
+
+def _intersects(a: _Rule, b: _Rule) -> bool:
+    return (
+        (a.version is None or b.version is None or a.version == b.version)
+        and _prefix_intersects(a.destination, b.destination)
+        and _prefix_intersects(a.source, b.source)
+        and bool(a.protocols & b.protocols)
+        and all(x & y for x, y in zip(a.dimensions, b.dimensions))
+        and any(ad & bd and as_ & bs for ad, as_ in a.ports for bd, bs in b.ports)
+    )
+
+
+@dataclass
+class Analysis:
+    """Rules that never match or match the same packets as others.
+
+    Each pair is (rule, other rule), the other rule being the first rule with
+    the same filter for `duplicates`, the first rule by precedence matching
+    every packet of the rule for `shadowed` and a rule matching some of its
+    packets, without either containing the other, for `overlapping`.
+    """
+
+    duplicates: list[tuple[FlowSpec, FlowSpec]] = field(default_factory=list)
+    shadowed: list[tuple[FlowSpec, FlowSpec]] = field(default_factory=list)
+    overlapping: list[tuple[FlowSpec, FlowSpec]] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, list[dict[str, str]]]:
+        def pairs(
+            values: list[tuple[FlowSpec, FlowSpec]], other: str
+        ) -> list[dict[str, str]]:
+            return [
+                {"filter": a.str_filter(), other: b.str_filter()} for a, b in values
+            ]
+
+        return {
+            "duplicates": pairs(self.duplicates, "duplicate_of"),
+            "shadowed": pairs(self.shadowed, "shadowed_by"),
+            "overlapping": pairs(self.overlapping, "overlaps"),
+        }
+
+
+def analyze(flows: Iterable[FlowSpec]) -> Analysis:
+    """Find the duplicate, shadowed and overlapping rules of a rule set.
+
+    The rules are indexed by destination prefix. Since prefixes are either
+    nested or disjoint, the rules a rule can overlap with are the ones of the
+    prefixes containing its own, looked up once per prefix length in use,
+    instead of comparing every pair of rules. Within a prefix (or without
+    one), the rules are looked up in interval indexes of the protocols, ports
+    and other components, by the component the fewest rules overlap on, so
+    the many rules of a single victim prefix aren't compared one by one.
+
+    A rule is shadowed when a single rule of higher precedence matches all of
+    its packets, rules shadowed by several rules together aren't found.
+    """
+
+    analysis = Analysis()
+
+    rules: list[_Rule] = []
+    filters: dict[str, FlowSpec] = {}
+
+    for flow in sorted(flows, key=FlowSpec.sort_key):
+        filter = flow.str_filter()
+
+        if (first := filters.get(filter)) is not None:
+            analysis.duplicates.append((flow, first))
+        else:
+            filters[filter] = flow
+            rules.append(_rule(len(rules), flow))
+
+    index: defaultdict[_Prefix | None, _Group] = defaultdict(_Group)
+    prefixlens: defaultdict[int, set[int]] = defaultdict(set)
+
+    for rule in rules:
+        # The empty rules match no packets, they never overlap.
+        if _is_empty(rule):
+            continue
+
+        rule.hulls = _hulls(rule)
+        index[rule.destination].rules.append(rule)
+
+        if rule.destination is not None:
+            prefixlens[rule.destination.version].add(rule.destination.prefixlen)
+
+    for rule in rules:
+        if _is_empty(rule):
+            continue
+
+        keys: list[_Prefix | None] = [None]
+
+        if (destination := rule.destination) is not None:
+            keys.extend(
+                destination.ancestor(prefixlen)
+                for prefixlen in sorted(prefixlens[destination.version])
+                if prefixlen <= destination.prefixlen
+            )
+
+        shadowed_by: _Rule | None = None
+
+        for key in keys:
+            if (group := index.get(key)) is None:
+                continue
+
+            for other in group.candidates(rule):
+                if other is rule or not _intersects(other, rule):
+                    continue
+
+                if other.position < rule.position and _contains(other, rule):
+                    if shadowed_by is None or other.position < shadowed_by.position:
+                        shadowed_by = other
+                elif (
+                    # The rules of the same prefix see each other, the pair
+                    # is reported once.
+                    (key != destination or other.position < rule.position)
+                    and not _contains(rule, other)
+                    and not _contains(other, rule)
+                ):
+                    analysis.overlapping.append((rule.flow, other.flow))
+
+        if shadowed_by is not None:
+            analysis.shadowed.append((rule.flow, shadowed_by.flow))
+
+    return analysis
+
+
+def main() -> None:
+    # Imported here, the exporter doesn't need the parsers registry.
+    from flowspec_exporter.main import (
+        PARSE_ERRORS,
+        _iter_paths,
+        _parser_name,
+        parse_file,
+    )
+
+    arg_parser = argparse.ArgumentParser(
+        description="Report the duplicate, shadowed and overlapping rules of "
+        "router outputs or MRT dumps, one JSON line per input"
+    )
+    arg_parser.add_argument("paths", nargs="+", help="Files or directories")
+    arg_parser.add_argument(
+        "--parser",
+        type=_parser_name,
+        metavar="PARSER",
+        help="Parser to use, detected from the output when not given",
+    )
+
+    args = arg_parser.parse_args()
+
+    failed = False
+
+    for path in _iter_paths(args.paths):
+        try:
+            flows = parse_file(path, args.parser)
+        except PARSE_ERRORS as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            failed = True
+            continue
+
+        report: dict[str, Any] = {"source": path, "rules": len(flows)}
+        report |= analyze(flows).to_dict()
+
+        sys.stdout.write(json.dumps(report) + "\n")
+        sys.stdout.flush()
+
+    if failed:
+        sys.exit(1)
+
+
+__all__ = [
+    "Analysis",
+    "analyze",
+    "match_key",
+    "value_set",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import logging
+import struct
+from typing import Iterator
+
+from flowspec_exporter.flowspec import Action, FlowSpec, UnsupportedNLRIError
+
+logger = logging.getLogger(__name__)
+
+BGP_HEADER_SIZE = 19
+
+BGP_UPDATE = 2
+
+ATTR_EXTENDED_LENGTH = 0x10
+
+ATTR_MP_REACH_NLRI = 14
+ATTR_MP_UNREACH_NLRI = 15
+ATTR_EXTENDED_COMMUNITIES = 16
+
+AFI_IPV4 = 1
+AFI_IPV6 = 2
+
+SAFI_FLOWSPEC = 133
+SAFI_FLOWSPEC_VPN = 134
+
+
+def is_flowspec(afi: int, safi: int) -> bool:
+    return afi in (AFI_IPV4, AFI_IPV6) and safi in (SAFI_FLOWSPEC, SAFI_FLOWSPEC_VPN)
+
+
+def parse_attributes(data: memoryview) -> dict[int, memoryview]:
+    """Split path attributes by type, the values are views into `data`."""
+
+    attributes: dict[int, memoryview] = {}
+
+    offset = 0
+
+    while offset + 3 <= len(data):
+        flags, type_ = data[offset], data[offset + 1]
+
+        if flags & ATTR_EXTENDED_LENGTH:
+            (length,) = struct.unpack_from("!H", data, offset + 2)
+            offset += 4
+        else:
+            length = data[offset + 2]
+            offset += 3
+
+        if offset + length > len(data):
+            raise ValueError("Truncated path attribute")
+
+        attributes[type_] = data[offset : offset + length]
+
+        offset += length
+
+    return attributes
+
+
+def apply_actions(flowspec: FlowSpec, extended_communities: memoryview | None) -> None:
+    # RFC 8955 section 7, a traffic rate of 0 discards. Only the actions the
+    # exporter knows about are looked at.
+
+    action = Action.ACCEPT
+
+    if extended_communities is not None:
+        for offset in range(0, len(extended_communities) - 7, 8):
+            type_, subtype = extended_communities[offset : offset + 2]
+
+            match (type_, subtype):
+                case (0x80, 0x06):
+                    (rate,) = struct.unpack_from("!f", extended_communities, offset + 4)
+
+                    if rate == 0:
+                        action = Action.DISCARD
+                    else:
+                        action = Action.RATE_LIMIT
+                        flowspec.rate_limit_bps = int(rate * 8)
+                case (0x80, 0x0C):
+                    (rate,) = struct.unpack_from("!f", extended_communities, offset + 4)
+
+                    action = Action.DISCARD if rate == 0 else Action.RATE_LIMIT
+                case (0x80 | 0x81 | 0x82, 0x08) if action == Action.ACCEPT:
+                    action = Action.REDIRECT
+
+    flowspec.action = action
+
+
+def decode_nlris(
+    data: memoryview, afi: int, safi: int, addpath: bool = False
+) -> Iterator[FlowSpec]:
+    version = 4 if afi == AFI_IPV4 else 6
+
+    offset = 0
+
+    while offset < len(data):
+        if addpath:
+            offset += 4
+
+        try:
+            flowspec, offset = FlowSpec.decode(
+                data, offset, version, vpn=safi == SAFI_FLOWSPEC_VPN
+            )
+        except UnsupportedNLRIError as e:
+            logger.warning("Skipped NLRI: %s", e)
+            offset = e.end
+            continue
+
+        yield flowspec
+
+
+def parse_update(
+    message: memoryview, addpath: bool = False
+) -> tuple[list[FlowSpec], list[FlowSpec]]:
+    """Decode the FlowSpec rules of a BGP message, starting at its marker.
+
+    Returns the announced rules, with their actions, and the withdrawn ones.
+    Anything but an UPDATE carrying SAFI 133/134 gives two empty lists.
+    """
+
+    announced: list[FlowSpec] = []
+    withdrawn: list[FlowSpec] = []
+
+    if len(message) < BGP_HEADER_SIZE or message[18] != BGP_UPDATE:
+        return announced, withdrawn
+
+    offset = BGP_HEADER_SIZE
+
+    (withdrawn_length,) = struct.unpack_from("!H", message, offset)
+    offset += 2 + withdrawn_length
+
+    (attributes_length,) = struct.unpack_from("!H", message, offset)
+    offset += 2
+
+    attributes = parse_attributes(message[offset : offset + attributes_length])
+
+    if (reach := attributes.get(ATTR_MP_REACH_NLRI)) is not None:
+        afi, safi, next_hop_length = struct.unpack_from("!HBB", reach)
+
+        if is_flowspec(afi, safi):
+            extended_communities = attributes.get(ATTR_EXTENDED_COMMUNITIES)
+
+            for flowspec in decode_nlris(
+                reach[5 + next_hop_length :], afi, safi, addpath
+            ):
+                apply_actions(flowspec, extended_communities)
+                announced.append(flowspec)
+
+    if (unreach := attributes.get(ATTR_MP_UNREACH_NLRI)) is not None:
+        afi, safi = struct.unpack_from("!HB", unreach)
+
+        if is_flowspec(afi, safi):
+            withdrawn.extend(decode_nlris(unreach[3:], afi, safi, addpath))
+
+    return announced, withdrawn
+
+
+__all__ = [
+    "apply_actions",
+    "decode_nlris",
+    "is_flowspec",
+    "parse_attributes",
+    "parse_update",
+]
@@ -0,0 +1,390 @@
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import struct
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Literal
+
+from netaddr import IPAddress
+
+from flowspec_exporter.bgp import parse_update
+from flowspec_exporter.flowspec import FlowSpec, _format_route_distinguisher
+
+DEFAULT_HOST = "0.0.0.0"
+
+DEFAULT_PORT = 11019
+
+BMP_VERSION = 3
+
+# Larger than any BGP message with the BMP headers, anything bigger is garbage.
+MAX_MESSAGE_SIZE = 1 << 20
+
+COMMON_HEADER = struct.Struct("!BIB")
+
+PER_PEER_HEADER = struct.Struct("!BB8s16sIIII")
+
+# RFC 7854 message types.
+
+ROUTE_MONITORING = 0
+STATISTICS_REPORT = 1
+PEER_DOWN = 2
+PEER_UP = 3
+INITIATION = 4
+TERMINATION = 5
+ROUTE_MIRRORING = 6
+
+INFORMATION_SYS_NAME = 2
+
+PEER_FLAG_IPV6 = 0x80
+# The routes of the Adj-RIB-In after the inbound policy, before it without.
+PEER_FLAG_POST_POLICY = 0x40
+
+# Counters of the scraped rules, the rule tables only have their definitions.
+COUNTERS = (
+    "matched_packets",
+    "matched_bytes",
+    "transmitted_packets",
+    "transmitted_bytes",
+    "dropped_packets",
+    "dropped_bytes",
+)
+
+logger = logging.getLogger(__name__)
+
+type Event = Literal["announce", "withdraw"]
+
+type Policy = Literal["pre", "post"]
+
+# A peer of the router, its address and its distinguisher, empty for the
+# peers of the global instance, the same address can be a peer of several VRFs.
+type Peer = tuple[str, str]
+
+
+@dataclass
+class RuleTable:
+    """Rules a router currently has, by the peer that sent them and whether
+    they are before or after its inbound policy, both can be monitored."""
+
+    router: str
+
+    rules: dict[tuple[Peer, Policy, str, str], FlowSpec] = field(default_factory=dict)
+
+    def _key(
+        self, peer: Peer, policy: Policy, flowspec: FlowSpec
+    ) -> tuple[Peer, Policy, str, str]:
+        return (
+            peer,
+            policy,
+            flowspec.metadata.get("route_distinguisher", ""),
+            flowspec.str_filter(),
+        )
+
+    def announce(self, peer: Peer, policy: Policy, flowspec: FlowSpec) -> None:
+        address, distinguisher = peer
+
+        flowspec.filter = flowspec.str_filter()
+        flowspec.metadata.update(router=self.router, peer=address, policy=policy)
+
+        if distinguisher:
+            flowspec.metadata["peer_distinguisher"] = distinguisher
+
+        self.rules[self._key(peer, policy, flowspec)] = flowspec
+
+    def withdraw(
+        self, peer: Peer, policy: Policy, flowspec: FlowSpec
+    ) -> FlowSpec | None:
+        return self.rules.pop(self._key(peer, policy, flowspec), None)
+
+    def peer_down(self, peer: Peer) -> list[FlowSpec]:
+        keys = [key for key in self.rules if key[0] == peer]
+
+        return [self.rules.pop(key) for key in keys]
+
+    def flows(self) -> list[FlowSpec]:
+        return list(self.rules.values())
+
+    def installed(self) -> list[FlowSpec]:
+        """Rules the router installs, one per route distinguisher and filter:
+        the post-policy ones when they are monitored, else the pre-policy ones.
+        """
+
+        policy: Policy = (
+            "post" if any(key[1] == "post" for key in self.rules) else "pre"
+        )
+
+        rules: dict[tuple[str, str], FlowSpec] = {}
+
+        for key, flowspec in self.rules.items():
+            _, rule_policy, route_distinguisher, filter = key
+
+            if rule_policy == policy:
+                rules.setdefault((route_distinguisher, filter), flowspec)
+
+        return list(rules.values())
+
+
+def with_counters(flows: list[FlowSpec], scraped: list[FlowSpec]) -> list[FlowSpec]:
+    """Copies of the rules of a `RuleTable` with the counters of the scraped
+    rules of the same filter, the rules aren't taken from the scrape.
+
+    A filter scraped from several VRFs or address families gives a rule for
+    each of them, with their `vrf` and `afi`, the rules that weren't scraped
+    (yet) have no counters.
+    """
+
+    by_filter: dict[str, list[FlowSpec]] = {}
+
+    for entry in scraped:
+        by_filter.setdefault(entry.filter or entry.str_filter(), []).append(entry)
+
+    merged: list[FlowSpec] = []
+
+    for flowspec in flows:
+        for entry in by_filter.get(flowspec.filter or flowspec.str_filter(), [None]):
+            flow = copy.copy(flowspec)
+            flow.metadata = dict(flowspec.metadata)
+
+            if entry is not None:
+                for counter in COUNTERS:
+                    setattr(flow, counter, getattr(entry, counter))
+
+                for key in ("vrf", "afi"):
+                    if (value := entry.metadata.get(key)) is not None:
+                        flow.metadata[key] = value
+
+            merged.append(flow)
+
+    return merged
+
+
+def _peer(flags: int, distinguisher: bytes, address: bytes) -> Peer:
+    if flags & PEER_FLAG_IPV6:
+        ip_address = IPAddress(int.from_bytes(address), 6)
+    else:
+        ip_address = IPAddress(int.from_bytes(address[12:]), 4)
+
+    return (
+        str(ip_address),
+        _format_route_distinguisher(distinguisher) if any(distinguisher) else "",
+    )
+
+
+def _sys_name(data: memoryview) -> str | None:
+    offset = 0
+
+    while offset + 4 <= len(data):
+        type_, length = struct.unpack_from("!HH", data, offset)
+        offset += 4
+
+        if type_ == INFORMATION_SYS_NAME:
+            return str(data[offset : offset + length], "utf-8", "replace")
+
+        offset += length
+
+    return None
+
+
+class BMPServer:
+    """Receive BMP sessions from the routers and keep their rule tables.
+
+    Each session gets a `RuleTable`, named after the sysName of its initiation
+    message or the address of the router. `on_change` is called for every rule
+    announced or withdrawn, including the ones dropped when a peer or the
+    session goes down. A new session of the same router replaces the table of
+    the old one, whose rules are withdrawn then, and the changes of the old
+    session are no longer reported.
+
+    The peers are told apart by their address and distinguisher, the peers of
+    different VRFs can have the same address.
+    """
+
+    def __init__(
+        self, on_change: Callable[[Event, FlowSpec], None] | None = None
+    ) -> None:
+        self.on_change = on_change
+
+        self.tables: dict[str, RuleTable] = {}
+
+    def rules(self, router: str, scraped: list[FlowSpec]) -> list[FlowSpec]:
+        """Rules of a router from its rule table, with the counters of the
+        scraped rules, see `with_counters`. Without a session of the router,
+        the scraped rules are the only source."""
+
+        if (table := self.tables.get(router)) is None:
+            return scraped
+
+        return with_counters(table.installed(), scraped)
+
+    def _register(self, table: RuleTable, router: str) -> None:
+        if self.tables.get(table.router) is table:
+            del self.tables[table.router]
+
+        table.router = router
+
+        # A new session of the same router replaces the old one.
+        if (replaced := self.tables.get(router)) is not None:
+            self._notify(replaced, "withdraw", replaced.flows())
+
+        self.tables[router] = table
+
+    def _notify(
+        self, table: RuleTable, event: Event, flowspecs: list[FlowSpec]
+    ) -> None:
+        # The changes of a replaced session are stale.
+        if self.on_change is not None and self.tables.get(table.router) is table:
+            for flowspec in flowspecs:
+                self.on_change(event, flowspec)
+
+    def _route_monitoring(self, table: RuleTable, data: memoryview) -> None:
+        _, flags, distinguisher, address, _, _, seconds, _ = (
+            PER_PEER_HEADER.unpack_from(data)
+        )
+
+        peer = _peer(flags, distinguisher, address)
+        policy: Policy = "post" if flags & PEER_FLAG_POST_POLICY else "pre"
+
+        # ADD-PATH is negotiated in the OPEN messages of the peer up, which
+        # aren't tracked, the paths are assumed to be plain.
+        announced, withdrawn = parse_update(data[PER_PEER_HEADER.size :])
+
+        timestamp = datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+        for flowspec in announced:
+            flowspec.metadata["timestamp"] = timestamp
+            table.announce(peer, policy, flowspec)
+
+        self._notify(table, "announce", announced)
+
+        self._notify(
+            table,
+            "withdraw",
+            [
+                removed
+                for flowspec in withdrawn
+                if (removed := table.withdraw(peer, policy, flowspec)) is not None
+            ],
+        )
+
+    def _peer_down(self, table: RuleTable, data: memoryview) -> None:
+        _, flags, distinguisher, address, *_ = PER_PEER_HEADER.unpack_from(data)
+
+        self._notify(
+            table, "withdraw", table.peer_down(_peer(flags, distinguisher, address))
+        )
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        host = writer.get_extra_info("peername")[0]
+
+        table = RuleTable(router=host)
+
+        self._register(table, host)
+
+        logger.info("BMP session started", extra={"router": host})
+
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(COMMON_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+
+                version, length, type_ = COMMON_HEADER.unpack(header)
+
+                if version != BMP_VERSION or not (
+                    COMMON_HEADER.size <= length <= MAX_MESSAGE_SIZE
+                ):
+                    logger.error(
+                        "Invalid BMP message",
+                        extra={"router": table.router, "version": version},
+                    )
+                    break
+
+                data = memoryview(await reader.readexactly(length - COMMON_HEADER.size))
+
+                try:
+                    if type_ == ROUTE_MONITORING:
+                        self._route_monitoring(table, data)
+                    elif type_ == PEER_DOWN:
+                        self._peer_down(table, data)
+                    elif type_ == INITIATION:
+                        if (sys_name := _sys_name(data)) is not None:
+                            self._register(table, sys_name)
+                    elif type_ == TERMINATION:
+                        break
+                except (ValueError, IndexError, struct.error) as e:
+                    logger.error(
+                        "Invalid BMP message",
+                        extra={"router": table.router, "error": str(e)},
+                    )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            # The rules can't be kept up to date without the session, unless
+            # a newer session of the router replaced it.
+            self._notify(table, "withdraw", table.flows())
+
+            if self.tables.get(table.router) is table:
+                del self.tables[table.router]
+
+            writer.close()
+
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+            logger.info("BMP session ended", extra={"router": table.router})
+
+    async def start(
+        self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+    ) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def serve(host: str, port: int) -> None:
+    def on_change(event: Event, flowspec: FlowSpec) -> None:
+        sys.stdout.write(
+            json.dumps({"event": event, "flow": flowspec.to_dict()}, default=str) + "\n"
+        )
+        sys.stdout.flush()
+
+    server = await BMPServer(on_change).start(host, port)
+
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(
+        description="Listen for BMP sessions and stream the rule changes as NDJSON"
+    )
+    arg_parser.add_argument("--host", default=DEFAULT_HOST)
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="Enable debug logging",
+    )
+
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    asyncio.run(serve(args.host, args.port))
+
+
+__all__ = [
+    "BMPServer",
+    "RuleTable",
+    "with_counters",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import copy
+from collections import OrderedDict
+from typing import Callable, cast
+
+from flowspec_exporter.flowspec import FlowSpec
+
+DEFAULT_PARSE_CACHE_SIZE = 10_000
+
+
+class ParseCache:
+    """Bounded LRU cache of parsed rules, keyed by the raw rule text.
+
+    Rule definitions rarely change between scrapes, only their counters do, so
+    a hit returns a copy of the already parsed rule (match components and
+    canonical filter key) and the caller only attaches fresh counters.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_PARSE_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[str, FlowSpec | None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get[T: FlowSpec | None](self, raw: str, parse: Callable[[str], T]) -> T:
+        try:
+            template = self._entries[raw]
+        except KeyError:
+            self.misses += 1
+
+            template = parse(raw)
+
+            if template is not None:
+                template.filter = template.str_filter()
+
+            self._entries[raw] = template
+
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        else:
+            self.hits += 1
+
+            self._entries.move_to_end(raw)
+
+        if template is None:
+            return cast(T, None)
+
+        flowspec = copy.copy(template)
+        flowspec.metadata = dict(template.metadata)
+
+        return cast(T, flowspec)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def parse_rule[T: FlowSpec | None](
+    raw: str,
+    parse: Callable[[str], T],
+    cache: ParseCache | None = None,
+) -> T:
+    if cache is None:
+        return parse(raw)
+
+    return cache.get(raw, parse)
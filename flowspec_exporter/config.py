@@ -0,0 +1,142 @@
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Self
+
+import asyncssh
+from pytimeparse import parse as parse_time  # type: ignore
+
+from flowspec_exporter.cache import DEFAULT_PARSE_CACHE_SIZE, ParseCache
+from flowspec_exporter.flowspec import FlowSpec
+from flowspec_exporter.parser import get_platform, parse_flow_spec
+
+DEFAULT_SCRAPE_INTERVAL = "1m"
+DEFAULT_SCRAPE_TIMEOUT = "10s"
+
+DEFAULT_SSH_PORT = 22
+
+
+@dataclass
+class Router:
+    """A `[[routers]]` entry of the config, shared by the worker and the
+    exporter, with the state kept between its scrapes."""
+
+    name: str
+    platform: str
+    ssh_host: str
+    scrape_interval: str = DEFAULT_SCRAPE_INTERVAL
+    scrape_timeout: str = DEFAULT_SCRAPE_TIMEOUT
+    ssh_port: int = DEFAULT_SSH_PORT
+    ssh_username: str | None = None
+    ssh_password: str | None = None
+    ssh_kwargs: dict[str, Any] = field(default_factory=dict)
+    # A list value (e.g. several `vrf` or `ip_version`) scrapes every
+    # combination of the values, see `fan_out`.
+    parameters: dict[str, Any] = field(default_factory=dict)
+    parse_cache_size: int = DEFAULT_PARSE_CACHE_SIZE
+    # The sysName (or address) of the BMP session of the router, when the
+    # worker listens for BMP, the name of the router by default.
+    bmp_name: str | None = None
+
+    parse_cache: ParseCache = field(init=False)
+
+    # Rules of the last scrape by filter.
+    scraped: bool = field(init=False)
+    rules: dict[str, FlowSpec] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.parse_cache = ParseCache(self.parse_cache_size)
+
+        self.scraped = False
+        self.rules = {}
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> Self:
+        # Imports the module of the platform, only the configured ones are,
+        # and fails early on an unknown one.
+        get_platform(config["platform"])
+
+        return cls(
+            name=config["name"],
+            platform=config["platform"],
+            ssh_host=config["ssh_host"],
+            scrape_interval=config.get("scrape_interval", DEFAULT_SCRAPE_INTERVAL),
+            scrape_timeout=config.get("scrape_timeout", DEFAULT_SCRAPE_TIMEOUT),
+            ssh_port=config.get("ssh_port", DEFAULT_SSH_PORT),
+            ssh_username=config.get("ssh_username"),
+            ssh_password=config.get("ssh_password"),
+            ssh_kwargs=config.get("ssh_kwargs", {}),
+            parameters=config.get("parameters", {}),
+            parse_cache_size=config.get("parse_cache_size", DEFAULT_PARSE_CACHE_SIZE),
+            bmp_name=config.get("bmp_name"),
+        )
+
+    @property
+    def interval(self) -> float:
+        interval = parse_time(self.scrape_interval)
+
+        assert interval is not None, "Invalid scrape interval"
+
+        return interval
+
+    @property
+    def timeout(self) -> float:
+        timeout = parse_time(self.scrape_timeout)
+
+        assert timeout is not None, "Invalid scrape timeout"
+
+        return timeout
+
+    def fan_out(self) -> list[dict[str, Any]]:
+        """Parameters of every command set to run, one per combination of the
+        list values of the parameters."""
+
+        keys = [
+            key for key, value in self.parameters.items() if isinstance(value, list)
+        ]
+
+        return [
+            {**self.parameters, **dict(zip(keys, values))}
+            for values in itertools.product(*(self.parameters[key] for key in keys))
+        ]
+
+    async def scrape(self) -> list[FlowSpec]:
+        """Connect to the router and parse its rules, the `ssh_kwargs` override
+        the connection options (e.g. `connect_timeout`).
+
+        The combinations of parameters run concurrently, each on its own
+        channels of the same connection, the platforms tell the rules apart
+        with their `vrf` and `afi` metadata.
+        """
+
+        async with asyncssh.connect(
+            self.ssh_host,
+            port=self.ssh_port,
+            username=self.ssh_username,
+            password=self.ssh_password,
+            known_hosts=None,
+            **{"connect_timeout": self.timeout, **self.ssh_kwargs},
+        ) as conn:
+            results = await asyncio.gather(
+                *(
+                    parse_flow_spec(
+                        platform=self.platform,
+                        connection=conn,
+                        cache=self.parse_cache,
+                        **parameters,
+                    )
+                    for parameters in self.fan_out()
+                )
+            )
+
+        return list(itertools.chain.from_iterable(results))
+
+
+def load_routers[R: Router](config: dict[str, Any], cls: type[R]) -> list[R]:
+    return [cls.from_config(router) for router in config["routers"]]
+
+
+__all__ = [
+    "Router",
+    "load_routers",
+]
@@ -0,0 +1,200 @@
+import argparse
+import json
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from flowspec_exporter.analysis import match_key
+from flowspec_exporter.flowspec import Action, FlowSpec
+
+type Treatment = tuple[Action | None, int | None]
+
+
+def _treatment(flow: FlowSpec) -> Treatment:
+    return flow.action, flow.rate_limit_bps
+
+
+def _key(flow: FlowSpec) -> tuple:
+    # The rules of different VRFs or address families are different rules.
+    return (
+        flow.metadata.get("vrf", ""),
+        flow.metadata.get("afi", ""),
+        *match_key(flow),
+    )
+
+
+def _diverges(flow: FlowSpec, expected: FlowSpec) -> bool:
+    # Not every output has the actions, the unknown ones aren't compared.
+    return (
+        flow.action is not None
+        and expected.action is not None
+        and _treatment(flow) != _treatment(expected)
+    )
+
+
+@dataclass
+class RouterDiff:
+    """Rules of a router against the expected rule set.
+
+    `divergent` pairs the rule of the router with the expected one, they
+    match the same packets but with another action or rate.
+    """
+
+    router: str
+
+    missing: list[FlowSpec] = field(default_factory=list)
+    extra: list[FlowSpec] = field(default_factory=list)
+    divergent: list[tuple[FlowSpec, FlowSpec]] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "router": self.router,
+            "missing": [flow.str_filter() for flow in self.missing],
+            "extra": [flow.str_filter() for flow in self.extra],
+            "divergent": [
+                {
+                    "filter": flow.str_filter(),
+                    "action": flow.action,
+                    "rate_limit_bps": flow.rate_limit_bps,
+                    "expected_action": expected.action,
+                    "expected_rate_limit_bps": expected.rate_limit_bps,
+                }
+                for flow, expected in self.divergent
+            ],
+        }
+
+
+def diff_rule_sets(
+    rule_sets: dict[str, list[FlowSpec]], reference: str | None = None
+) -> dict[str, RouterDiff]:
+    """Compare the rules of several routers.
+
+    The rules are identified by their VRF, address family and
+    `analysis.match_key`, so the same rule shown differently by two platforms
+    isn't reported, unlike the same rule in another VRF. The expected rule set
+    is the one of the `reference` router, or without one, the rules carried by
+    more than half of the routers, with their most common action. Runs in
+    linear time of the number of rules.
+    """
+
+    if reference is not None and reference not in rule_sets:
+        raise ValueError(f"Unknown reference router '{reference}'")
+
+    indexed: dict[str, dict[tuple, FlowSpec]] = {}
+
+    for router, flows in rule_sets.items():
+        rules: dict[tuple, FlowSpec] = {}
+
+        for flow in flows:
+            rules.setdefault(_key(flow), flow)
+
+        indexed[router] = rules
+
+    expected: dict[tuple, FlowSpec]
+
+    if reference is not None:
+        expected = indexed[reference]
+    else:
+        carriers: Counter[tuple] = Counter()
+        treatments: Counter[tuple[tuple, Treatment]] = Counter()
+        # The rule with the most common known action of every key.
+        flows: dict[tuple, FlowSpec] = {}
+
+        for rules in indexed.values():
+            for key, flow in rules.items():
+                carriers[key] += 1
+
+                if key not in flows:
+                    flows[key] = flow
+
+                if flow.action is not None:
+                    treatment = (key, _treatment(flow))
+                    treatments[treatment] += 1
+
+                    current = flows[key]
+
+                    if current.action is None or (
+                        treatments[treatment] > treatments[key, _treatment(current)]
+                    ):
+                        flows[key] = flow
+
+        expected = {
+            key: flows[key]
+            for key, count in carriers.items()
+            if count * 2 > len(indexed)
+        }
+
+    result: dict[str, RouterDiff] = {}
+
+    for router, rules in indexed.items():
+        router_diff = RouterDiff(router)
+
+        for key, flow in expected.items():
+            if (own := rules.get(key)) is None:
+                router_diff.missing.append(flow)
+            elif _diverges(own, flow):
+                router_diff.divergent.append((own, flow))
+
+        router_diff.extra.extend(
+            flow for key, flow in rules.items() if key not in expected
+        )
+
+        result[router] = router_diff
+
+    return result
+
+
+def main() -> None:
+    # Imported here, the exporter doesn't need the parsers registry.
+    from flowspec_exporter.main import (
+        PARSE_ERRORS,
+        _iter_paths,
+        _parser_name,
+        parse_file,
+    )
+
+    arg_parser = argparse.ArgumentParser(
+        description="Compare the rules of router outputs or MRT dumps, one file "
+        "per router, and print the differences as one JSON line per router"
+    )
+    arg_parser.add_argument("paths", nargs="+", help="Files or directories")
+    arg_parser.add_argument(
+        "--parser",
+        type=_parser_name,
+        metavar="PARSER",
+        help="Parser to use, detected from the output when not given",
+    )
+    arg_parser.add_argument(
+        "--reference",
+        help="Path of the reference router output, the rules carried by most "
+        "of the routers are expected when not given",
+    )
+
+    args = arg_parser.parse_args()
+
+    rule_sets: dict[str, list[FlowSpec]] = {}
+
+    for path in _iter_paths(args.paths):
+        try:
+            rule_sets[path] = parse_file(path, args.parser)
+        except PARSE_ERRORS as e:
+            arg_parser.error(f"{path}: {e}")
+
+    try:
+        diffs = diff_rule_sets(rule_sets, args.reference)
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    for router_diff in diffs.values():
+        sys.stdout.write(json.dumps(router_diff.to_dict()) + "\n")
+
+
+__all__ = [
+    "RouterDiff",
+    "diff_rule_sets",
+]
+
+
+if __name__ == "__main__":
+    main()
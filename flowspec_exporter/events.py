@@ -0,0 +1,410 @@
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Literal
+
+from flowspec_exporter.flowspec import FlowSpec
+
+DEFAULT_BATCH_SIZE = 500
+
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+# Events kept for the webhook while it fails, the oldest are dropped first.
+MAX_PENDING_EVENTS = 100_000
+
+logger = logging.getLogger("flowspec-collector-worker")
+
+type EventType = Literal["add", "remove", "modify"]
+
+
+@dataclass
+class RuleEvent:
+    type: EventType
+    router: str
+    timestamp: datetime
+    filter: str
+    # The rule as of the event, the removed rule for `remove`.
+    flow: FlowSpec
+    # The rule before a `modify`.
+    previous: FlowSpec | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "type": self.type,
+            "router": self.router,
+            "timestamp": self.timestamp.isoformat(),
+            "filter": self.filter,
+            "vrf": self.flow.metadata.get("vrf"),
+            "afi": self.flow.metadata.get("afi"),
+            "action": self.flow.action,
+            "rate_limit_bps": self.flow.rate_limit_bps,
+            "previous_action": None if self.previous is None else self.previous.action,
+            "previous_rate_limit_bps": (
+                None if self.previous is None else self.previous.rate_limit_bps
+            ),
+            "flow": self.flow.to_dict(),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), default=str)
+
+
+def diff_rules(
+    router: str,
+    timestamp: datetime,
+    previous: dict[str, FlowSpec],
+    current: dict[str, FlowSpec],
+) -> list[RuleEvent]:
+    """Events between two scrapes of a router, with the rules by `rule_key`.
+
+    A rule whose action or rate changed is modified, the counters aren't
+    looked at.
+    """
+
+    def event(
+        type: EventType, flow: FlowSpec, old: FlowSpec | None = None
+    ) -> RuleEvent:
+        return RuleEvent(
+            type, router, timestamp, flow.filter or flow.str_filter(), flow, old
+        )
+
+    events = [
+        event("remove", previous[key]) for key in previous.keys() - current.keys()
+    ]
+
+    events.extend(
+        event("add", current[key]) for key in current.keys() - previous.keys()
+    )
+
+    for key in current.keys() & previous.keys():
+        flow, old = current[key], previous[key]
+
+        if (flow.action, flow.rate_limit_bps) != (old.action, old.rate_limit_bps):
+            events.append(event("modify", flow, old))
+
+    return events
+
+
+class EventOutput(ABC):
+    """Destination of the rule events, like `sinks.Sink` for the counters."""
+
+    async def open(self) -> None:
+        pass
+
+    @abstractmethod
+    async def emit(self, events: list[RuleEvent]) -> None: ...
+
+    async def close(self) -> None:
+        pass
+
+
+class NDJSONOutput(EventOutput):
+    """Append the events to a file, one JSON object per line.
+
+    The file is written in a thread of its own, like `sinks.SQLiteSink`, so a
+    slow disk doesn't block the event loop, and the events stay in order.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="ndjson-output"
+        )
+
+    async def _run[T](self, function: Any, *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, function, *args
+        )
+
+    def _open(self) -> None:
+        self._fp = open(self.path, "a")
+
+    def _write(self, events: list[RuleEvent]) -> None:
+        self._fp.writelines(f"{event.to_json()}\n" for event in events)
+        self._fp.flush()
+
+    async def open(self) -> None:
+        await self._run(self._open)
+
+    async def emit(self, events: list[RuleEvent]) -> None:
+        await self._run(self._write, events)
+
+    async def close(self) -> None:
+        await self._run(self._fp.close)
+
+        self._executor.shutdown()
+
+
+class WebhookOutput(EventOutput):
+    """POST the events as a JSON array, by batches of at most `batch_size` or
+    every `flush_interval` seconds.
+
+    The events are only queued by `emit`, a background task sends them, so a
+    slow webhook doesn't hold up the scrapes. The events of a failed request
+    are sent again with the next batch.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ) -> None:
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._pending: list[dict[str, Any]] = []
+        self._lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def open(self) -> None:
+        # Only needed by this output, it comes with the fastapi extra.
+        import httpx
+
+        self._client = httpx.AsyncClient(timeout=10)
+        self._task = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            # Woken up early once a full batch is pending.
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+
+            self._full.clear()
+
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            while self._pending:
+                # Taken out while it is sent, the events emitted meanwhile can
+                # drop the oldest pending ones.
+                batch = self._pending[: self.batch_size]
+                del self._pending[: len(batch)]
+
+                sent = False
+
+                try:
+                    response = await self._client.post(self.url, json=batch)
+                    response.raise_for_status()
+
+                    sent = True
+                except Exception as e:
+                    logger.error(
+                        "Failed to send rule events",
+                        extra={"url": self.url, "error": str(e)},
+                    )
+                    return
+                finally:
+                    if not sent:
+                        self._pending[:0] = batch
+
+    async def emit(self, events: list[RuleEvent]) -> None:
+        self._pending.extend(event.to_dict() for event in events)
+
+        if (dropped := len(self._pending) - MAX_PENDING_EVENTS) > 0:
+            logger.error(
+                "Dropped rule events", extra={"url": self.url, "events": dropped}
+            )
+            del self._pending[:dropped]
+
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+            # Puts back the batch it was sending, if any.
+            await asyncio.gather(self._task, return_exceptions=True)
+
+        await self.flush()
+        await self._client.aclose()
+
+
+class PostgresOutput(EventOutput):
+    """Insert the events in the `rule_events` table and notify the listeners of
+    the `rule_events` channel of every event (its id, type, router, filter, VRF
+    and address family, the rest is in the table)."""
+
+    def __init__(self, connection: str) -> None:
+        self.connection = connection
+
+        self._conn: Any = None
+
+    async def open(self) -> None:
+        # Only needed by this output.
+        import asyncpg
+
+        self._conn = await asyncpg.connect(self.connection)
+
+        await self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS rule_events (
+            id bigserial primary key,
+            router text not null,
+            timestamp timestamptz not null,
+            type text not null,
+            filter text not null,
+            vrf text not null default '',
+            afi text not null default '',
+            action text,
+            previous_action text,
+            flow jsonb not null
+        );
+        """)
+
+        # Tables created before the VRFs.
+        await self._conn.execute("""
+        ALTER TABLE rule_events
+            ADD COLUMN IF NOT EXISTS vrf text not null default '',
+            ADD COLUMN IF NOT EXISTS afi text not null default '';
+        """)
+
+        await self._conn.execute("""
+        CREATE INDEX IF NOT EXISTS rule_events_router_timestamp_idx ON rule_events (router, timestamp DESC);
+        """)
+
+    async def emit(self, events: list[RuleEvent]) -> None:
+        # A single statement for the batch, the notifications are sent when
+        # it commits.
+        await self._conn.execute(
+            """
+            WITH inserted AS (
+                INSERT INTO rule_events (
+                    router,
+                    timestamp,
+                    type,
+                    filter,
+                    vrf,
+                    afi,
+                    action,
+                    previous_action,
+                    flow
+                )
+                SELECT * FROM unnest(
+                    $1::text[],
+                    $2::timestamptz[],
+                    $3::text[],
+                    $4::text[],
+                    $5::text[],
+                    $6::text[],
+                    $7::text[],
+                    $8::text[],
+                    $9::jsonb[]
+                )
+                RETURNING id, router, type, filter, vrf, afi
+            )
+            SELECT pg_notify('rule_events', json_build_object(
+                'id', id,
+                'type', type,
+                'router', router,
+                'filter', filter,
+                'vrf', vrf,
+                'afi', afi
+            )::text)
+            FROM inserted
+            """,
+            [event.router for event in events],
+            [event.timestamp for event in events],
+            [event.type for event in events],
+            [event.filter for event in events],
+            [event.flow.metadata.get("vrf", "") for event in events],
+            [event.flow.metadata.get("afi", "") for event in events],
+            [event.flow.action for event in events],
+            [
+                None if event.previous is None else event.previous.action
+                for event in events
+            ],
+            [event.flow.to_json(default=str) for event in events],
+        )
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+
+
+class EventOutputs(EventOutput):
+    """Emit to several outputs at once, a failing output is logged and doesn't
+    keep the others from getting the events."""
+
+    def __init__(self, outputs: list[EventOutput]) -> None:
+        self.outputs = outputs
+
+    async def open(self) -> None:
+        results = await asyncio.gather(
+            *(output.open() for output in self.outputs), return_exceptions=True
+        )
+
+        errors = [result for result in results if isinstance(result, BaseException)]
+
+        if errors:
+            # Like `sinks.FanOutSink`, the outputs that did open are closed.
+            await asyncio.gather(
+                *(
+                    output.close()
+                    for output, result in zip(self.outputs, results)
+                    if not isinstance(result, BaseException)
+                ),
+                return_exceptions=True,
+            )
+
+            raise errors[0]
+
+    async def emit(self, events: list[RuleEvent]) -> None:
+        if not events:
+            return
+
+        results = await asyncio.gather(
+            *(output.emit(events) for output in self.outputs),
+            return_exceptions=True,
+        )
+
+        for output, result in zip(self.outputs, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    "Failed to emit rule events",
+                    extra={"output": type(output).__name__, "error": str(result)},
+                )
+
+    async def close(self) -> None:
+        await asyncio.gather(*(output.close() for output in self.outputs))
+
+
+def create_output(value: str, connection: str) -> EventOutput:
+    """Output from its command line value, `webhook:URL`, `ndjson:PATH` or
+    `postgres`."""
+
+    kind, _, target = value.partition(":")
+
+    if kind == "webhook" and target:
+        return WebhookOutput(target)
+    if kind == "ndjson" and target:
+        return NDJSONOutput(target)
+    if kind == "postgres":
+        return PostgresOutput(connection)
+
+    raise ValueError(
+        f"Invalid events output '{value}', expected webhook:URL, ndjson:PATH "
+        "or postgres"
+    )
+
+
+__all__ = [
+    "EventOutput",
+    "EventOutputs",
+    "NDJSONOutput",
+    "PostgresOutput",
+    "RuleEvent",
+    "WebhookOutput",
+    "create_output",
+    "diff_rules",
+]
@@ -1,25 +1,35 @@
 import argparse
+import asyncio
 import logging
 import tomllib
 from dataclasses import dataclass, field
-from typing import Any, cast
+from typing import Any
 
-import asyncssh
 import uvicorn
 from fastapi import FastAPI, HTTPException, Response
+from netaddr import AddrFormatError, IPNetwork
 from prometheus_client import (
     CONTENT_TYPE_LATEST,
     CollectorRegistry,
     Counter,
+    Gauge,
     generate_latest,
 )
 from pythonjsonlogger.json import JsonFormatter
 
-from flowspec_exporter.parser import Platform, parse_flow_spec
+from flowspec_exporter.analysis import analyze
+from flowspec_exporter.config import Router as RouterConfig
+from flowspec_exporter.config import load_routers
+from flowspec_exporter.diff import diff_rule_sets
+from flowspec_exporter.flowspec import FlowSpec, rule_key
+from flowspec_exporter.sketch import DEFAULT_CAPACITY, DEFAULT_HALF_LIFE, HeavyHitters
+from flowspec_exporter.trie import PrefixTrie
 
-DEFAULT_SSH_PORT = 22
+# Counters of the rules tracked by the heavy hitters, with the number of top
+# rules exposed as metrics.
+TOP_COUNTERS = ("matched_bytes", "matched_packets", "dropped_bytes", "dropped_packets")
 
-DEFAULT_SSH_CONNECT_TIMEOUT = 10
+DEFAULT_TOP_METRICS = 20
 
 logger = logging.getLogger("flowspec-exporter")
 
@@ -29,6 +39,47 @@ logger.addHandler(logger_handler)
 
 app = FastAPI()
 
+# The routers are scraped by `/metrics`, unless the worker scrapes them on its
+# own schedule and the metrics are only served from its last scrape.
+app.state.scrape_on_request = True
+
+# Compared by `/fleet/metrics`, the rules carried by most of the routers are
+# expected when not set.
+app.state.reference_router = None
+
+# Rates of the rules of every router, by (router, filter, vrf, afi), fed with the
+# deltas of the counters between scrapes.
+app.state.heavy_hitters = {counter: HeavyHitters() for counter in TOP_COUNTERS}
+app.state.top_metrics = DEFAULT_TOP_METRICS
+
+fleet_registry = CollectorRegistry()
+
+rules_missing = Gauge(
+    "rules_missing",
+    "Number of expected rules the router doesn't carry",
+    labelnames=["router"],
+    registry=fleet_registry,
+)
+rules_extra = Gauge(
+    "rules_extra",
+    "Number of rules the router carries but aren't expected",
+    labelnames=["router"],
+    registry=fleet_registry,
+)
+rules_divergent = Gauge(
+    "rules_divergent",
+    "Number of expected rules the router carries with another action",
+    labelnames=["router"],
+    registry=fleet_registry,
+)
+top_rules_rate = Gauge(
+    "top_rules_rate",
+    "Decayed rate of the top rules of the fleet, bps for the bytes counters "
+    "and pps for the packets ones",
+    labelnames=["counter", "router", "filter", "vrf", "afi"],
+    registry=fleet_registry,
+)
+
 
 class CustomCounter(Counter):
     def set(self, value: float) -> None:
@@ -40,15 +91,7 @@ class CustomCounter(Counter):
 
 
 @dataclass
-class Router:
-    platform: str
-    ssh_host: str
-    ssh_port: int
-    ssh_username: str | None
-    ssh_password: str | None
-    ssh_kwargs: dict[str, Any]
-    parameters: dict[str, str]
-
+class Router(RouterConfig):
     collector_registry: CollectorRegistry = field(init=False)
 
     matched_packets: CustomCounter = field(init=False)
@@ -58,50 +101,295 @@ class Router:
     dropped_packets: CustomCounter = field(init=False)
     dropped_bytes: CustomCounter = field(init=False)
 
-    filters: set[str] = field(init=False)
+    duplicate_rules: Gauge = field(init=False)
+    shadowed_rules: Gauge = field(init=False)
+    overlapping_rules: Gauge = field(init=False)
+
+    # Labels of the counters of the rules of the last scrape, see `_labels`.
+    filters: set[tuple[str, str, str]] = field(init=False)
+
+    # Sorted labels of the rules of the last analysis, see `update_metrics`.
+    analyzed: list[tuple[str, str, str]] | None = field(init=False)
+
+    # Prefixes of the rules of the last scrape, for the lookups.
+    destination_prefixes: PrefixTrie[str] = field(init=False)
+    source_prefixes: PrefixTrie[str] = field(init=False)
 
     def __post_init__(self) -> None:
+        super().__post_init__()
+
         self.collector_registry = CollectorRegistry()
 
         self.matched_packets = CustomCounter(
             "matched_packets",
             "Number of matched packets",
-            labelnames=["filter"],
+            labelnames=["filter", "vrf", "afi"],
             registry=self.collector_registry,
         )
         self.matched_bytes = CustomCounter(
             "matched_bytes",
             "Number of matched bytes",
-            labelnames=["filter"],
+            labelnames=["filter", "vrf", "afi"],
             registry=self.collector_registry,
         )
         self.transmitted_packets = CustomCounter(
             "transmitted_packets",
             "Number of transmitted packets",
-            labelnames=["filter"],
+            labelnames=["filter", "vrf", "afi"],
             registry=self.collector_registry,
         )
         self.transmitted_bytes = CustomCounter(
             "transmitted_bytes",
             "Number of transmitted bytes",
-            labelnames=["filter"],
+            labelnames=["filter", "vrf", "afi"],
             registry=self.collector_registry,
         )
         self.dropped_packets = CustomCounter(
             "dropped_packets",
             "Number of dropped packets",
-            labelnames=["filter"],
+            labelnames=["filter", "vrf", "afi"],
             registry=self.collector_registry,
         )
         self.dropped_bytes = CustomCounter(
             "dropped_bytes",
             "Number of dropped bytes",
-            labelnames=["filter"],
+            labelnames=["filter", "vrf", "afi"],
+            registry=self.collector_registry,
+        )
+
+        self.duplicate_rules = Gauge(
+            "duplicate_rules",
+            "Number of rules with the same filter as another rule",
+            registry=self.collector_registry,
+        )
+        self.shadowed_rules = Gauge(
+            "shadowed_rules",
+            "Number of rules never matched because of a higher precedence rule",
+            registry=self.collector_registry,
+        )
+        self.overlapping_rules = Gauge(
+            "overlapping_rules",
+            "Number of pairs of rules partially matching the same packets",
             registry=self.collector_registry,
         )
 
         self.filters = set()
 
+        self.analyzed = None
+
+        self.destination_prefixes = PrefixTrie()
+        self.source_prefixes = PrefixTrie()
+
+
+def _labels(entry: FlowSpec) -> tuple[str, str, str]:
+    """Filter, VRF and address family labels of a rule."""
+
+    return (
+        entry.filter or entry.str_filter(),
+        entry.metadata.get("vrf", ""),
+        entry.metadata.get("afi", ""),
+    )
+
+
+def update_rules(router: Router, entries: list[FlowSpec]) -> None:
+    """Replace the rules of the router, only the prefixes of the added and
+    removed rules are updated."""
+
+    rules = {rule_key(entry): entry for entry in entries}
+
+    for filter in router.rules.keys() - rules.keys():
+        flow = router.rules.pop(filter)
+
+        if flow.destination_prefix is not None:
+            router.destination_prefixes.discard(flow.destination_prefix, filter)
+        if flow.source_prefix is not None:
+            router.source_prefixes.discard(flow.source_prefix, filter)
+
+    for filter in rules.keys() - router.rules.keys():
+        flow = rules[filter]
+
+        if flow.destination_prefix is not None:
+            router.destination_prefixes.add(flow.destination_prefix, filter)
+        if flow.source_prefix is not None:
+            router.source_prefixes.add(flow.source_prefix, filter)
+
+    router.rules = rules
+    router.scraped = True
+
+
+def feed_heavy_hitters(name: str, router: Router, entries: list[FlowSpec]) -> None:
+    """Add the counters increase since the last scrape of the router."""
+
+    for entry in entries:
+        if (previous := router.rules.get(rule_key(entry))) is None:
+            continue
+
+        for counter, heavy_hitters in app.state.heavy_hitters.items():
+            value = getattr(entry, counter)
+            previous_value = getattr(previous, counter)
+
+            if value is not None and previous_value is not None:
+                heavy_hitters.add(
+                    (name, *_labels(entry)),
+                    (value - previous_value) * (8 if counter.endswith("_bytes") else 1),
+                )
+
+
+@app.get("/top")
+async def top(counter: str = "dropped_bytes", n: int = 20) -> dict[str, Any]:
+    """Rules of every router with the highest rate of a counter, from the
+    heavy hitters, without storing the counters of every rule. At most
+    `top_capacity` rules are tracked, `n` is capped to it.
+
+    The heavy hitters are fed by `update_metrics` on every scrape: the worker
+    with `--prometheus` scrapes every router each `scrape_interval`, which is
+    the supported way to serve `/top`. The exporter on its own only scrapes a
+    router when Prometheus requests its metrics.
+    """
+
+    if counter not in app.state.heavy_hitters:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Counter '{counter}' not tracked, one of: "
+            + ", ".join(TOP_COUNTERS),
+        )
+
+    if n <= 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid number of rules '{n}', must be positive",
+        )
+
+    heavy_hitters = app.state.heavy_hitters[counter]
+
+    return {
+        "counter": counter,
+        "rules": [
+            {
+                "router": router,
+                "filter": filter,
+                "vrf": vrf,
+                "afi": afi,
+                "rate": rate,
+                "error": error,
+            }
+            for (router, filter, vrf, afi), rate, error in heavy_hitters.top(
+                min(n, heavy_hitters.capacity)
+            )
+        ],
+    }
+
+
+@app.get("/rules")
+async def lookup_rules(prefix: str) -> dict[str, Any]:
+    """Rules of every router whose destination or source prefix contains or is
+    contained in `prefix` (an address or a prefix), with their counters as of
+    the last scrape."""
+
+    try:
+        network = IPNetwork(prefix)
+    except (AddrFormatError, ValueError):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid prefix '{prefix}'",
+        ) from None
+
+    matches = []
+
+    for name, router in app.extra.items():
+        fields: dict[str, list[str]] = {}
+
+        for field_name, prefixes in (
+            ("destination_prefix", router.destination_prefixes),
+            ("source_prefix", router.source_prefixes),
+        ):
+            for _, filter in prefixes.overlapping(network):
+                fields.setdefault(filter, []).append(field_name)
+
+        for filter, matched in fields.items():
+            matches.append(
+                {
+                    "router": name,
+                    "matched": matched,
+                    "flow": router.rules[filter].to_dict(),
+                }
+            )
+
+    return {"prefix": str(network), "rules": matches}
+
+
+def _analyze(entries: list[FlowSpec]) -> tuple[int, int, int]:
+    """Number of duplicate, shadowed and overlapping rules."""
+
+    # The rules of different VRFs or address families never apply to the same
+    # packets, they're analyzed apart.
+    contexts: dict[tuple[str, str], list[FlowSpec]] = {}
+
+    for entry in entries:
+        contexts.setdefault(_labels(entry)[1:], []).append(entry)
+
+    analyses = [analyze(flows) for flows in contexts.values()]
+
+    return (
+        sum(len(analysis.duplicates) for analysis in analyses),
+        sum(len(analysis.shadowed) for analysis in analyses),
+        sum(len(analysis.overlapping) for analysis in analyses),
+    )
+
+
+async def update_metrics(name: str, router: Router, entries: list[FlowSpec]) -> None:
+    """Update the metrics of the router, and the fleet state, with a scrape."""
+
+    active_filters = {_labels(entry) for entry in entries}
+
+    for i in router.filters - active_filters:
+        router.matched_packets.remove(*i)
+        router.matched_bytes.remove(*i)
+
+        router.transmitted_packets.remove(*i)
+        router.transmitted_bytes.remove(*i)
+
+        router.dropped_packets.remove(*i)
+        router.dropped_bytes.remove(*i)
+
+    for entry in entries:
+        labels = _labels(entry)
+
+        if (matched_packets := entry.matched_packets) is not None:
+            router.matched_packets.labels(*labels).set(matched_packets)
+        if (matched_bytes := entry.matched_bytes) is not None:
+            router.matched_bytes.labels(*labels).set(matched_bytes)
+
+        if (transmitted_packets := entry.transmitted_packets) is not None:
+            router.transmitted_packets.labels(*labels).set(transmitted_packets)
+        if (transmitted_bytes := entry.transmitted_bytes) is not None:
+            router.transmitted_bytes.labels(*labels).set(transmitted_bytes)
+
+        if (dropped_packets := entry.dropped_packets) is not None:
+            router.dropped_packets.labels(*labels).set(dropped_packets)
+        if (dropped_bytes := entry.dropped_bytes) is not None:
+            router.dropped_bytes.labels(*labels).set(dropped_bytes)
+
+    router.filters = active_filters
+
+    feed_heavy_hitters(name, router, entries)
+    update_rules(router, entries)
+
+    # The analysis takes a while on large rule sets, it's only run again once
+    # the rules changed, and off the event loop.
+    analyzed = sorted(_labels(entry) for entry in entries)
+
+    if analyzed == router.analyzed:
+        return
+
+    router.analyzed = analyzed
+
+    duplicates, shadowed, overlapping = await asyncio.to_thread(_analyze, entries)
+
+    router.duplicate_rules.set(duplicates)
+    router.shadowed_rules.set(shadowed)
+    router.overlapping_rules.set(overlapping)
+
 
 @app.get("/metrics")
 async def metrics(target: str):
@@ -113,71 +401,72 @@ async def metrics(target: str):
 
     router: Router = app.extra[target]
 
-    if "connect_timeout" not in router.ssh_kwargs:
-        router.ssh_kwargs["connect_timeout"] = DEFAULT_SSH_CONNECT_TIMEOUT
-
-    async with asyncssh.connect(
-        host=router.ssh_host,
-        port=router.ssh_port,
-        username=router.ssh_username,
-        password=router.ssh_password,
-        known_hosts=None,
-        **router.ssh_kwargs,
-    ) as conn:
-        logger.debug("Connected to router", extra={"host": router.ssh_host})
-
-        entries = await parse_flow_spec(
-            platform=cast(Platform, router.platform),
-            connection=conn,
-            **router.parameters,
-        )
+    if app.state.scrape_on_request:
+        entries = await router.scrape()
 
         logger.debug(
             "Parsed flow spec", extra={"host": router.ssh_host, "entries": entries}
         )
 
-        active_filters = {entry.str_filter() for entry in entries}
-
-        for i in router.filters - active_filters:
-            router.matched_packets.labels(filter=i).remove()
-            router.matched_bytes.labels(filter=i).remove()
+        await update_metrics(target, router, entries)
 
-            router.transmitted_packets.labels(filter=i).remove()
-            router.transmitted_bytes.labels(filter=i).remove()
+    data = generate_latest(router.collector_registry)
 
-            router.dropped_packets.labels(filter=i).remove()
-            router.dropped_bytes.labels(filter=i).remove()
+    return Response(
+        content=data,
+        media_type=CONTENT_TYPE_LATEST,
+    )
 
-        for entry in entries:
-            filter = entry.str_filter()
 
-            if (matched_packets := entry.matched_packets) is not None:
-                router.matched_packets.labels(filter=filter).set(matched_packets)
-            if (matched_bytes := entry.matched_bytes) is not None:
-                router.matched_bytes.labels(filter=filter).set(matched_bytes)
+@app.get("/fleet/metrics")
+async def fleet_metrics():
+    rule_sets = {
+        name: list(router.rules.values())
+        for name, router in app.extra.items()
+        if router.scraped
+    }
 
-            if (transmitted_packets := entry.transmitted_packets) is not None:
-                router.transmitted_packets.labels(filter=filter).set(
-                    transmitted_packets
-                )
-            if (transmitted_bytes := entry.transmitted_bytes) is not None:
-                router.transmitted_bytes.labels(filter=filter).set(transmitted_bytes)
+    rules_missing.clear()
+    rules_extra.clear()
+    rules_divergent.clear()
+    top_rules_rate.clear()
 
-            if (dropped_packets := entry.dropped_packets) is not None:
-                router.dropped_packets.labels(filter=filter).set(dropped_packets)
-            if (dropped_bytes := entry.dropped_bytes) is not None:
-                router.dropped_bytes.labels(filter=filter).set(dropped_bytes)
+    for counter, heavy_hitters in app.state.heavy_hitters.items():
+        for (name, *labels), rate, _ in heavy_hitters.top(app.state.top_metrics):
+            top_rules_rate.labels(counter, name, *labels).set(rate)
 
-        router.filters.update(active_filters)
+    reference = app.state.reference_router
 
-    data = generate_latest(router.collector_registry)
+    # Nothing to compare against until the reference router is scraped.
+    if rule_sets and (reference is None or reference in rule_sets):
+        for name, router_diff in diff_rule_sets(rule_sets, reference).items():
+            rules_missing.labels(router=name).set(len(router_diff.missing))
+            rules_extra.labels(router=name).set(len(router_diff.extra))
+            rules_divergent.labels(router=name).set(len(router_diff.divergent))
 
     return Response(
-        content=data,
+        content=generate_latest(fleet_registry),
         media_type=CONTENT_TYPE_LATEST,
     )
 
 
+def configure(config: dict[str, Any]) -> None:
+    """Set up the routers and the fleet state from the config."""
+
+    app.extra = {router.name: router for router in load_routers(config, Router)}
+
+    app.state.reference_router = config.get("reference_router")
+
+    app.state.heavy_hitters = {
+        counter: HeavyHitters(
+            capacity=config.get("top_capacity", DEFAULT_CAPACITY),
+            half_life=config.get("top_half_life", DEFAULT_HALF_LIFE),
+        )
+        for counter in TOP_COUNTERS
+    }
+    app.state.top_metrics = config.get("top_metrics", DEFAULT_TOP_METRICS)
+
+
 if __name__ == "__main__":
     arg_parser = argparse.ArgumentParser()
     arg_parser.add_argument(
@@ -200,17 +489,6 @@ if __name__ == "__main__":
     with args.config as fp:
         config = tomllib.load(fp)
 
-    app.extra = {}
-
-    for router in config["routers"]:
-        app.extra[router["name"]] = Router(
-            platform=router["platform"],
-            ssh_host=router["ssh_host"],
-            ssh_port=router.get("ssh_port", DEFAULT_SSH_PORT),
-            ssh_username=router.get("ssh_username"),
-            ssh_password=router.get("ssh_password"),
-            ssh_kwargs=router.get("ssh_kwargs", {}),
-            parameters=router.get("parameters", {}),
-        )
+    configure(config)
 
     uvicorn.run(app)
@@ -1,12 +1,17 @@
+import hashlib
 import itertools
+import json
+import logging
 import math
+import operator
 from collections import UserList
 from dataclasses import dataclass, field
 from enum import IntEnum, StrEnum
-from typing import NamedTuple, Self
+from typing import Any, Callable, Iterable, NamedTuple, Self
 
-from dataclasses_json import config, dataclass_json
-from netaddr import IPNetwork
+from netaddr import IPAddress, IPNetwork
+
+logger = logging.getLogger(__name__)
 
 COMPONENTS = (
     "destination_prefix",
@@ -44,6 +49,9 @@ class ComponentType(IntEnum):
     PACKET_LENGTH = 10
     DSCP = 11
     FRAGMENT = 12
+    # RFC 8956, decoded but not represented in a `FlowSpec`, see
+    # `UnsupportedNLRIError`.
+    FLOW_LABEL = 13
 
     @classmethod
     def from_str(cls, value: str) -> "ComponentType":
@@ -78,21 +86,74 @@ class ComponentType(IntEnum):
                 return "dscp"
             case ComponentType.FRAGMENT:
                 return "fragment"
+            case ComponentType.FLOW_LABEL:
+                return "flow-label"
+
+
+_COMPONENT_TYPES = tuple((key, ComponentType.from_str(key)) for key in COMPONENTS)
+
+_COMPONENT_LABELS = tuple((key, str(type_)) for key, type_ in _COMPONENT_TYPES)
+
+_COMPONENT_KEYS = {type_: key for key, type_ in _COMPONENT_TYPES}
+
+_match_components = operator.attrgetter(*COMPONENTS)
 
 
-@dataclass_json
-@dataclass(eq=True)
+class UnsupportedNLRIError(ValueError):
+    """A valid NLRI that can't be represented as a `FlowSpec`: an IPv6 flow
+    label component or an IPv6 prefix with a non-zero offset.
+
+    `end` is the offset past the NLRI, the following NLRIs can still be
+    decoded from there.
+    """
+
+    def __init__(self, message: str, end: int) -> None:
+        super().__init__(message)
+
+        self.end = end
+
+
+@dataclass(frozen=True, slots=True, init=False)
 class NumericOp:
+    """Immutable, every combination is interned so equal operators are the
+    same object and rules can share them safely.
+
+    The fields are set once, by `__new__`, an `__init__` would set them again
+    on the shared instance with the arguments as given.
+    """
+
     and_: bool = False
     lt: bool = False
     gt: bool = False
     eq: bool = False
 
-    def set_and(self, value: bool) -> Self:
-        self.and_ = value
+    def __new__(
+        cls, and_: bool = False, lt: bool = False, gt: bool = False, eq: bool = False
+    ) -> Self:
+        key = (bool(and_), bool(lt), bool(gt), bool(eq))
+
+        if (op := _NUMERIC_OPS.get(key)) is None:
+            op = _NUMERIC_OPS[key] = object.__new__(cls)
+
+            for name, value in zip(("and_", "lt", "gt", "eq"), key):
+                object.__setattr__(op, name, value)
+
+        return op
+
+    def __reduce__(self) -> tuple:
+        return type(self), (self.and_, self.lt, self.gt, self.eq)
 
+    def __copy__(self) -> Self:
         return self
 
+    def __deepcopy__(self, memo: dict) -> Self:
+        return self
+
+    def set_and(self, value: bool) -> Self:
+        """Return the variant of this operator with the given `and` bit."""
+
+        return type(self)(value, self.lt, self.gt, self.eq)
+
     def __str__(self) -> str:
         s = ""
 
@@ -117,6 +178,11 @@ class NumericOp:
         return s
 
 
+_NUMERIC_OPS: dict[tuple[bool, bool, bool, bool], NumericOp] = {}
+
+for _key in itertools.product((False, True), repeat=4):
+    NumericOp(*_key)
+
 NumericOpFalse = NumericOp()
 
 NumericOpEq = NumericOp(eq=True)
@@ -134,18 +200,41 @@ NumericOpNe = NumericOp(gt=True, lt=True)
 NumericOpTrue = NumericOp(lt=True, gt=True, eq=True)
 
 
-@dataclass_json
-@dataclass(eq=True)
+@dataclass(frozen=True, slots=True, init=False)
 class BitmaskOp:
+    """Immutable and interned, like `NumericOp`."""
+
     and_: bool = False
     not_: bool = False
     match: bool = False
 
-    def set_and(self, value: bool) -> Self:
-        self.and_ = value
+    def __new__(
+        cls, and_: bool = False, not_: bool = False, match: bool = False
+    ) -> Self:
+        key = (bool(and_), bool(not_), bool(match))
+
+        if (op := _BITMASK_OPS.get(key)) is None:
+            op = _BITMASK_OPS[key] = object.__new__(cls)
+
+            for name, value in zip(("and_", "not_", "match"), key):
+                object.__setattr__(op, name, value)
 
+        return op
+
+    def __reduce__(self) -> tuple:
+        return type(self), (self.and_, self.not_, self.match)
+
+    def __copy__(self) -> Self:
         return self
 
+    def __deepcopy__(self, memo: dict) -> Self:
+        return self
+
+    def set_and(self, value: bool) -> Self:
+        """Return the variant of this operator with the given `and` bit."""
+
+        return type(self)(value, self.not_, self.match)
+
     def __str__(self) -> str:
         s = ""
 
@@ -158,14 +247,30 @@ class BitmaskOp:
         return s
 
 
-class NumericValues(UserList[tuple[NumericOp, int]]):
-    def __init__(self, *args: tuple[NumericOp, int]):
-        super().__init__(args)
+_BITMASK_OPS: dict[tuple[bool, bool, bool], BitmaskOp] = {}
+
+for _key in itertools.product((False, True), repeat=3):
+    BitmaskOp(*_key)
+
+del _key
+
+
+class NumericValues(tuple[tuple[NumericOp, int], ...]):
+    __slots__ = ()
+
+    def __new__(cls, *args: tuple[NumericOp, int]) -> Self:
+        return super().__new__(cls, args)
+
+    def __getnewargs__(self) -> tuple[tuple[NumericOp, int], ...]:
+        return tuple(self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(map(repr, self))})"
 
     def __str__(self) -> str:
         s = []
 
-        for op, value in self.data:
+        for op, value in self:
             if op.and_:
                 s += ["&", f"{op}{value}"]
             else:
@@ -176,8 +281,8 @@ class NumericValues(UserList[tuple[NumericOp, int]]):
     def __bytes__(self) -> bytes:
         result = bytearray()
 
-        for i, (op, value) in enumerate(self.data):
-            is_last = i == len(self.data) - 1
+        for i, (op, value) in enumerate(self):
+            is_last = i == len(self) - 1
             size = _get_bytes_size(value)
 
             op_byte = 0
@@ -208,15 +313,48 @@ class NumericValues(UserList[tuple[NumericOp, int]]):
 
         return bytes(result)
 
+    @classmethod
+    def decode(cls, data: bytes | memoryview, offset: int = 0) -> tuple[Self, int]:
+        """Decode an operator/value list, returns it with the offset past its end."""
+
+        items, offset = _decode_op_values(data, offset)
+
+        return cls(
+            *(
+                (
+                    NumericOp(
+                        and_=bool(op_byte & 0b01000000),
+                        lt=bool(op_byte & 0b00000100),
+                        gt=bool(op_byte & 0b00000010),
+                        eq=bool(op_byte & 0b00000001),
+                    ),
+                    value,
+                )
+                for op_byte, value in items
+            )
+        ), offset
+
+    @classmethod
+    def from_bytes(cls, data: bytes | memoryview) -> Self:
+        return cls.decode(data)[0]
+
+
+class BitmaskValues(tuple[tuple[BitmaskOp, int], ...]):
+    __slots__ = ()
 
-class BitmaskValues(UserList[tuple[BitmaskOp, int]]):
-    def __init__(self, *args: tuple[BitmaskOp, int]):
-        super().__init__(args)
+    def __new__(cls, *args: tuple[BitmaskOp, int]) -> Self:
+        return super().__new__(cls, args)
+
+    def __getnewargs__(self) -> tuple[tuple[BitmaskOp, int], ...]:
+        return tuple(self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(map(repr, self))})"
 
     def __str__(self) -> str:
         s = []
 
-        for op, value in self.data:
+        for op, value in self:
             if op.and_:
                 s += ["&", f"{op}0x{value:02x}"]
             else:
@@ -227,8 +365,8 @@ class BitmaskValues(UserList[tuple[BitmaskOp, int]]):
     def __bytes__(self) -> bytes:
         result = bytearray()
 
-        for i, (op, value) in enumerate(self.data):
-            is_last = i == len(self.data) - 1
+        for i, (op, value) in enumerate(self):
+            is_last = i == len(self) - 1
             size = _get_bytes_size(value)
 
             op_byte = 0
@@ -257,11 +395,95 @@ class BitmaskValues(UserList[tuple[BitmaskOp, int]]):
 
         return bytes(result)
 
+    @classmethod
+    def decode(cls, data: bytes | memoryview, offset: int = 0) -> tuple[Self, int]:
+        """Decode an operator/value list, returns it with the offset past its end."""
+
+        items, offset = _decode_op_values(data, offset)
+
+        return cls(
+            *(
+                (
+                    BitmaskOp(
+                        and_=bool(op_byte & 0b01000000),
+                        not_=bool(op_byte & 0b00000010),
+                        match=bool(op_byte & 0b00000001),
+                    ),
+                    value,
+                )
+                for op_byte, value in items
+            )
+        ), offset
+
+    @classmethod
+    def from_bytes(cls, data: bytes | memoryview) -> Self:
+        return cls.decode(data)[0]
+
+
+def _decode_op_values(
+    data: bytes | memoryview, offset: int
+) -> tuple[list[tuple[int, int]], int]:
+    items: list[tuple[int, int]] = []
+
+    try:
+        while True:
+            op_byte = data[offset]
+            size = 1 << ((op_byte >> 4) & 0b11)
+
+            if offset + 1 + size > len(data):
+                raise ValueError("Truncated operator value")
 
-def _str_encode(obj: object) -> str | None:
-    if obj is None:
+            items.append(
+                (op_byte, int.from_bytes(data[offset + 1 : offset + 1 + size]))
+            )
+            offset += 1 + size
+
+            if op_byte & 0b10000000:
+                return items, offset
+    except IndexError:
+        raise ValueError("Missing end of list operator")
+
+
+def _encode_prefix(value: IPNetwork | None) -> str | None:
+    if value is None:
+        return None
+    return str(value)
+
+
+def _decode_prefix(value: str | None) -> IPNetwork | None:
+    if value is None:
         return None
-    return str(obj)
+    return IPNetwork(value)
+
+
+def _encode_numeric_values(values: "NumericValues | None") -> list | None:
+    if values is None:
+        return None
+    return [
+        [{"and_": op.and_, "lt": op.lt, "gt": op.gt, "eq": op.eq}, value]
+        for op, value in values
+    ]
+
+
+def _decode_numeric_values(values: list | None) -> "NumericValues | None":
+    if values is None:
+        return None
+    return NumericValues(*((NumericOp(**op), value) for op, value in values))
+
+
+def _encode_bitmask_values(values: "BitmaskValues | None") -> list | None:
+    if values is None:
+        return None
+    return [
+        [{"and_": op.and_, "not_": op.not_, "match": op.match}, value]
+        for op, value in values
+    ]
+
+
+def _decode_bitmask_values(values: list | None) -> "BitmaskValues | None":
+    if values is None:
+        return None
+    return BitmaskValues(*((BitmaskOp(**op), value) for op, value in values))
 
 
 def _get_bytes_size(n: int) -> int:
@@ -279,79 +501,127 @@ def ipnetwork_to_bytes(net: IPNetwork) -> bytes:
     result = bytearray()
 
     result.extend(net.prefixlen.to_bytes())
-    result.extend(net.ip.packed[: math.ceil(net.prefixlen / 8)])
+
+    # IPv6 prefixes carry a pattern offset (RFC 8956), always zero here, the
+    # NLRIs with another offset aren't decoded.
+    if net.version == 6:
+        result.append(0)
+
+    result.extend(net.network.packed[: math.ceil(net.prefixlen / 8)])
 
     return bytes(result)
 
 
+def _decode_ipnetwork(
+    data: bytes | memoryview, offset: int, version: int
+) -> tuple[IPNetwork, int]:
+    width = 4 if version == 4 else 16
+
+    try:
+        prefixlen = data[offset]
+        offset += 1
+
+        if version == 6:
+            offset += 1
+    except IndexError:
+        raise ValueError("Truncated prefix")
+
+    if prefixlen > width * 8:
+        raise ValueError(f"Invalid prefix length: {prefixlen}")
+
+    size = math.ceil(prefixlen / 8)
+
+    if offset + size > len(data):
+        raise ValueError("Truncated prefix")
+
+    value = int.from_bytes(data[offset : offset + size]) << (8 * (width - size))
+
+    return IPNetwork((value, prefixlen), version).cidr, offset + size
+
+
+def _format_route_distinguisher(data: bytes | memoryview) -> str:
+    match int.from_bytes(data[:2]):
+        case 0:
+            return f"{int.from_bytes(data[2:4])}:{int.from_bytes(data[4:8])}"
+        case 1:
+            return (
+                f"{IPAddress(int.from_bytes(data[2:6]), 4)}:{int.from_bytes(data[6:8])}"
+            )
+        case 2:
+            return f"{int.from_bytes(data[2:6])}:{int.from_bytes(data[6:8])}"
+        case _:
+            return bytes(data).hex()
+
+
+def _encode_nlri_length(length: int) -> bytes:
+    if length < 0xF0:
+        return length.to_bytes(1)
+    if length <= 0xFFF:
+        return (0xF000 | length).to_bytes(2)
+
+    raise ValueError(f"NLRI too long: {length}")
+
+
+def _decode_nlri_length(data: bytes | memoryview, offset: int) -> tuple[int, int]:
+    try:
+        length = data[offset]
+
+        if length >= 0xF0:
+            return ((length & 0x0F) << 8) | data[offset + 1], offset + 2
+    except IndexError:
+        raise ValueError("Truncated NLRI length")
+
+    return length, offset + 1
+
+
 class NLRIComponent(NamedTuple):
     component_type: ComponentType
     op_value: bytes | IPNetwork
 
 
+def _component_sort_key(value: bytes | IPNetwork) -> tuple[int, int, int] | bytes:
+    if isinstance(value, IPNetwork):
+        # Prefixes either nest or are disjoint, ordering by the last address
+        # puts a more specific prefix before the ones containing it and keeps
+        # disjoint prefixes in address order.
+        return value.version, value.last, -value.prefixlen
+
+    # Interleave the bytes with zeros and end with a one, so when the common
+    # prefix is equal the longer value sorts first.
+    key = bytearray(2 * len(value) + 1)
+    key[1:-1:2] = value
+    key[-1] = 1
+
+    return bytes(key)
+
+
+# Sorts after every component, a rule with more components comes first.
+_SORT_KEY_END = (max(ComponentType) + 1,)
+
+
 class NLRI(UserList[NLRIComponent]):
+    def sort_key(self) -> tuple:
+        """Key in RFC 8955 (section 5.1) order, rules with higher precedence
+        sort first under plain tuple comparison."""
+
+        return (
+            *(
+                (comp.component_type, _component_sort_key(comp.op_value))
+                for comp in self
+            ),
+            _SORT_KEY_END,
+        )
+
     def __lt__(self, other):
-        for comp_a, comp_b in itertools.zip_longest(self, other):
-            if not comp_a:
-                return True
-            if not comp_b:
-                return False
-
-            comp_a: NLRIComponent
-            comp_b: NLRIComponent
-
-            if comp_a.component_type < comp_b.component_type:
-                return False
-            if comp_a.component_type > comp_b.component_type:
-                return True
-
-            if comp_a.component_type in (
-                ComponentType.DESTINATION_PREFIX,
-                ComponentType.SOURCE_PREFIX,
-            ):
-                assert isinstance(comp_a.op_value, IPNetwork)
-
-                if (
-                    comp_a.op_value in comp_b.op_value
-                    or comp_b.op_value in comp_a.op_value
-                ):
-                    if comp_a.op_value.prefixlen > comp_b.op_value.prefixlen:
-                        return False
-                    if comp_a.op_value.prefixlen < comp_b.op_value.prefixlen:
-                        return True
-                elif comp_a.op_value > comp_b.op_value:
-                    return True
-                elif comp_a.op_value < comp_b.op_value:
-                    return False
-            else:
-                if len(comp_a.op_value) == len(comp_b.op_value):
-                    if comp_a.op_value > comp_b.op_value:
-                        return True
-                    if comp_a.op_value < comp_b.op_value:
-                        return False
-                else:
-                    common = min(len(comp_a.op_value), len(comp_b.op_value))
-                    if comp_a.op_value[:common] > comp_b.op_value[:common]:
-                        return True
-                    elif comp_a.op_value[:common] < comp_b.op_value[:common]:
-                        return False
-                    elif len(comp_a.op_value) > len(comp_b.op_value):
-                        return False
-                    else:
-                        return True
-        return False
-
-
-@dataclass_json
+        # Lower precedence is "less than", the reverse of the sort key.
+        return self.sort_key() > other.sort_key()
+
+
 @dataclass
 class FlowSpec:
     raw: str = ""
-    destination_prefix: IPNetwork | None = field(
-        default=None, metadata=config(encoder=_str_encode)
-    )
-    source_prefix: IPNetwork | None = field(
-        default=None, metadata=config(encoder=_str_encode)
-    )
+    destination_prefix: IPNetwork | None = None
+    source_prefix: IPNetwork | None = None
     ip_protocol: NumericValues | None = None
     port: NumericValues | None = None
     destination_port: NumericValues | None = None
@@ -375,26 +645,68 @@ class FlowSpec:
 
     filter: str | None = None
 
+    # The canonical filter and its digest are computed on first use and kept
+    # on the instance along with the match components they were built from, so
+    # they are rebuilt only once one of those components is replaced.
+
+    def _cached[T](self, name: str, build: Callable[[], T]) -> T:
+        components = _match_components(self)
+
+        cached = self.__dict__.get(name)
+
+        if cached is not None and cached[0] == components:
+            return cached[1]
+
+        result = build()
+
+        self.__dict__[name] = (components, result)
+
+        return result
+
     def str_filter(self) -> str:
+        return self._cached("_str_filter", self._build_str_filter)
+
+    def _build_str_filter(self) -> str:
         s = []
 
-        for key in COMPONENTS:
+        for key, label in _COMPONENT_LABELS:
             value = getattr(self, key)
 
             if value is not None:
-                s.append(f"{ComponentType.from_str(key)}: {value}")
+                s.append(f"{label}: {value}")
 
         return ", ".join(s)
 
+    def sort_key(self) -> tuple:
+        """See `NLRI.sort_key`."""
+
+        return self._cached("_sort_key", lambda: self.to_nlri().sort_key())
+
+    def filter_digest(self) -> int:
+        """Stable 64-bit digest of the canonical filter, the same across
+        processes and hosts."""
+
+        filter = self.str_filter()
+
+        cached = self.__dict__.get("_filter_digest")
+
+        if cached is not None and cached[0] is filter:
+            return cached[1]
+
+        digest = hashlib.blake2b(filter.encode(), digest_size=8).digest()
+        result = int.from_bytes(digest)
+
+        self.__dict__["_filter_digest"] = (filter, result)
+
+        return result
+
     def to_nlri(self) -> NLRI:
         nlri = NLRI()
 
-        for key in COMPONENTS:
+        for key, component_type in _COMPONENT_TYPES:
             value = getattr(self, key)
 
             if value is not None:
-                component_type = ComponentType.from_str(key)
-
                 if isinstance(value, IPNetwork):
                     data = value.cidr
                 elif isinstance(value, (BitmaskValues, NumericValues)):
@@ -404,12 +716,236 @@ class FlowSpec:
 
         return nlri
 
+    def __bytes__(self) -> bytes:
+        """Encode as an RFC 8955/8956 NLRI, including the length header."""
+
+        body = bytearray()
+
+        for key, component_type in _COMPONENT_TYPES:
+            value = getattr(self, key)
+
+            if value is None:
+                continue
+
+            body.append(component_type)
+
+            if isinstance(value, IPNetwork):
+                body.extend(ipnetwork_to_bytes(value))
+            else:
+                body.extend(bytes(value))
+
+        return _encode_nlri_length(len(body)) + body
+
+    @classmethod
+    def decode(
+        cls,
+        data: bytes | memoryview,
+        offset: int = 0,
+        version: int = 4,
+        vpn: bool = False,
+    ) -> tuple[Self, int]:
+        """Decode one NLRI, returns it with the offset past its end.
+
+        The NLRI doesn't carry its address family, `version` tells how to read
+        the prefixes. With `vpn` (SAFI 134) the components follow a route
+        distinguisher, which is kept in the metadata. Raises
+        `UnsupportedNLRIError` for a valid NLRI that can't be represented.
+        """
+
+        length, offset = _decode_nlri_length(data, offset)
+
+        end = offset + length
+
+        if end > len(data):
+            raise ValueError("Truncated NLRI")
+
+        # Bound the components by the NLRI length without copying.
+        view = memoryview(data)[:end]
+
+        components: dict[str, Any] = {}
+
+        if vpn:
+            if offset + 8 > end:
+                raise ValueError("Truncated route distinguisher")
+
+            components["metadata"] = {
+                "route_distinguisher": _format_route_distinguisher(
+                    view[offset : offset + 8]
+                )
+            }
+            offset += 8
+        last_type = 0
+
+        while offset < end:
+            component_type = view[offset]
+            offset += 1
+
+            if component_type == ComponentType.FLOW_LABEL and version == 6:
+                raise UnsupportedNLRIError("Unsupported IPv6 flow label", end)
+
+            if (key := _COMPONENT_KEYS.get(component_type)) is None:
+                raise ValueError(f"Unknown component type: {component_type}")
+
+            if component_type <= last_type:
+                raise ValueError(f"Component out of order: {component_type}")
+
+            last_type = component_type
+
+            match component_type:
+                case ComponentType.DESTINATION_PREFIX | ComponentType.SOURCE_PREFIX:
+                    if version == 6 and offset + 1 < end and view[offset + 1]:
+                        raise UnsupportedNLRIError(
+                            f"Unsupported IPv6 prefix offset: {view[offset + 1]}",
+                            end,
+                        )
+
+                    components[key], offset = _decode_ipnetwork(view, offset, version)
+                case ComponentType.TCP_FLAGS | ComponentType.FRAGMENT:
+                    components[key], offset = BitmaskValues.decode(view, offset)
+                case _:
+                    components[key], offset = NumericValues.decode(view, offset)
+
+        return cls(**components), end
+
+    @classmethod
+    def from_bytes(cls, data: bytes | memoryview, version: int = 4) -> Self:
+        return cls.decode(data, version=version)[0]
+
+    # Hand written instead of `dataclass_json`, which introspects the fields on
+    # every call and is slower than the parsing itself for large outputs. The
+    # output and the methods signatures stay compatible.
+
+    def to_dict(self, encode_json: bool = False) -> dict[str, Any]:
+        return {
+            "raw": self.raw,
+            "destination_prefix": _encode_prefix(self.destination_prefix),
+            "source_prefix": _encode_prefix(self.source_prefix),
+            "ip_protocol": _encode_numeric_values(self.ip_protocol),
+            "port": _encode_numeric_values(self.port),
+            "destination_port": _encode_numeric_values(self.destination_port),
+            "source_port": _encode_numeric_values(self.source_port),
+            "icmp_type": _encode_numeric_values(self.icmp_type),
+            "icmp_code": _encode_numeric_values(self.icmp_code),
+            "tcp_flags": _encode_bitmask_values(self.tcp_flags),
+            "packet_length": _encode_numeric_values(self.packet_length),
+            "dscp": _encode_numeric_values(self.dscp),
+            "fragment": _encode_bitmask_values(self.fragment),
+            "action": None if self.action is None else self.action.value,
+            "rate_limit_bps": self.rate_limit_bps,
+            "matched_packets": self.matched_packets,
+            "matched_bytes": self.matched_bytes,
+            "transmitted_packets": self.transmitted_packets,
+            "transmitted_bytes": self.transmitted_bytes,
+            "dropped_packets": self.dropped_packets,
+            "dropped_bytes": self.dropped_bytes,
+            "metadata": dict(self.metadata),
+            "filter": self.filter,
+        }
+
+    def to_json(self, **kwargs: Any) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    @classmethod
+    def from_dict(cls, kvs: dict[str, Any], *, infer_missing: bool = False) -> Self:
+        return cls(
+            raw=kvs.get("raw", ""),
+            destination_prefix=_decode_prefix(kvs.get("destination_prefix")),
+            source_prefix=_decode_prefix(kvs.get("source_prefix")),
+            ip_protocol=_decode_numeric_values(kvs.get("ip_protocol")),
+            port=_decode_numeric_values(kvs.get("port")),
+            destination_port=_decode_numeric_values(kvs.get("destination_port")),
+            source_port=_decode_numeric_values(kvs.get("source_port")),
+            icmp_type=_decode_numeric_values(kvs.get("icmp_type")),
+            icmp_code=_decode_numeric_values(kvs.get("icmp_code")),
+            tcp_flags=_decode_bitmask_values(kvs.get("tcp_flags")),
+            packet_length=_decode_numeric_values(kvs.get("packet_length")),
+            dscp=_decode_numeric_values(kvs.get("dscp")),
+            fragment=_decode_bitmask_values(kvs.get("fragment")),
+            action=None if (action := kvs.get("action")) is None else Action(action),
+            rate_limit_bps=kvs.get("rate_limit_bps"),
+            matched_packets=kvs.get("matched_packets"),
+            matched_bytes=kvs.get("matched_bytes"),
+            transmitted_packets=kvs.get("transmitted_packets"),
+            transmitted_bytes=kvs.get("transmitted_bytes"),
+            dropped_packets=kvs.get("dropped_packets"),
+            dropped_bytes=kvs.get("dropped_bytes"),
+            metadata=dict(kvs.get("metadata") or {}),
+            filter=kvs.get("filter"),
+        )
+
+    @classmethod
+    def from_json(
+        cls, s: str | bytes | bytearray, *, infer_missing: bool = False, **kwargs: Any
+    ) -> Self:
+        return cls.from_dict(json.loads(s, **kwargs), infer_missing=infer_missing)
+
 
-@dataclass_json
 @dataclass
 class FlowSpecs:
     flows: list[FlowSpec]
 
+    def __bytes__(self) -> bytes:
+        return b"".join(bytes(flow) for flow in self.flows)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | memoryview, version: int = 4) -> Self:
+        """Decode a stream of concatenated NLRIs, the ones that can't be
+        represented are skipped with a warning."""
+
+        view = memoryview(data)
+
+        flows = []
+        offset = 0
+
+        while offset < len(view):
+            try:
+                flow, offset = FlowSpec.decode(view, offset, version)
+            except UnsupportedNLRIError as e:
+                logger.warning("Skipped NLRI: %s", e)
+                offset = e.end
+                continue
+
+            flows.append(flow)
+
+        return cls(flows=flows)
+
+    def to_dict(self, encode_json: bool = False) -> dict[str, Any]:
+        return {"flows": [flow.to_dict() for flow in self.flows]}
+
+    def to_json(self, **kwargs: Any) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    @classmethod
+    def from_dict(cls, kvs: dict[str, Any], *, infer_missing: bool = False) -> Self:
+        return cls(flows=[FlowSpec.from_dict(flow) for flow in kvs["flows"]])
+
+    @classmethod
+    def from_json(
+        cls, s: str | bytes | bytearray, *, infer_missing: bool = False, **kwargs: Any
+    ) -> Self:
+        return cls.from_dict(json.loads(s, **kwargs), infer_missing=infer_missing)
+
+
+def sort_flows(flows: Iterable[FlowSpec]) -> list[FlowSpec]:
+    """Return the rules in precedence order, the one that matches first first."""
+
+    return sorted(flows, key=FlowSpec.sort_key)
+
+
+def rule_key(flow: FlowSpec) -> str:
+    """Identity of a rule among the rules of a router, the filter qualified by
+    the VRF and address family it was scraped from, when given, since the same
+    filter can be in several of them."""
+
+    key = flow.filter or flow.str_filter()
+
+    if (vrf := flow.metadata.get("vrf")) is not None:
+        key = f"{key} vrf {vrf}"
+    if (afi := flow.metadata.get("afi")) is not None:
+        key = f"{key} afi {afi}"
+
+    return key
+
 
 __all__ = [
     "Action",
@@ -427,4 +963,8 @@ __all__ = [
     "NumericValues",
     "BitmaskValues",
     "FlowSpec",
+    "FlowSpecs",
+    "UnsupportedNLRIError",
+    "rule_key",
+    "sort_flows",
 ]
@@ -1,42 +1,361 @@
 import argparse
+import fnmatch
+import os
+import re
 import sys
-from typing import Callable
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
+
+from netaddr import AddrFormatError
 
 from flowspec_exporter.flowspec import FlowSpec, FlowSpecs
-from flowspec_exporter.routers.cisco_ios import parse_flows as cisco_ios_parse_flows
-from flowspec_exporter.routers.huawei_vrp import parse_flows as huawei_vrp_parse_flows
-from flowspec_exporter.routers.juniper_junos import (
-    parse_flows as juniper_junos_parse_flows,
+from flowspec_exporter.mrt import is_mrt_file, read_mrt
+from flowspec_exporter.parser import PARSERS, get_parser, is_parser, parser_names
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+# Binary MRT dumps, read from the file instead of going through `PARSERS`.
+MRT_PARSER = "mrt_parse_flows"
+
+# The built-in parsers, the installed ones are only looked up when a name
+# isn't one of these.
+PARSER_NAMES = (*PARSERS, MRT_PARSER)
+
+STDIN = "-"
+
+# Errors of a malformed or unreadable input, reported for the file.
+PARSE_ERRORS = (OSError, ValueError, AddrFormatError)
+
+# Files submitted to the pool ahead of the one being written, per worker.
+PENDING_FILES_PER_JOB = 2
+
+SNIFF_SIZE = 64 * 1024
+
+# Checked in order, the first pattern found in the head of the output wins.
+DETECT_PARSERS = (
+    (re.compile(r'^\s*\{\s*"firewall-information"'), "juniper_junos_json_parse_flows"),
+    (
+        re.compile(r"^\s*Flow\s*:.*$\s*Actions\s*:", re.MULTILINE),
+        "cisco_ios_parse_flows",
+    ),
+    (re.compile(r"ReIndex\s*:\s*\d+\s+Dissemination Rules:"), "huawei_vrp_parse_flows"),
+    (
+        re.compile(r"^Filter:.*$\s*(?:Counters|Policers):", re.MULTILINE),
+        "juniper_junos_parse_flows",
+    ),
 )
 
-PARSERS: dict[str, Callable[[str], list[FlowSpec]]] = {
-    "cisco_ios_parse_flows": cisco_ios_parse_flows,
-    "huawei_vrp_parse_flows": huawei_vrp_parse_flows,
-    "juniper_junos_parse_flows": juniper_junos_parse_flows,
-}
+
+def detect_parser(data: str) -> str | None:
+    head = data[:SNIFF_SIZE]
+
+    for pattern, parser in DETECT_PARSERS:
+        if pattern.search(head):
+            return parser
+
+    return None
+
+
+def _read(path: str) -> str:
+    if path == STDIN:
+        return sys.stdin.read()
+
+    with open(path) as fp:
+        return fp.read()
+
+
+def iter_file(
+    path: str,
+    parser_name: str | None = None,
+    data: str | None = None,
+    add_source: bool = False,
+) -> Iterator[FlowSpec]:
+    """The flows of a file, the MRT dumps are decoded as they are read."""
+
+    flows: Iterator[FlowSpec] | list[FlowSpec]
+
+    if parser_name == MRT_PARSER or (
+        parser_name is None and data is None and path != STDIN and is_mrt_file(path)
+    ):
+        if path == STDIN:
+            raise ValueError("MRT dumps can't be read from stdin")
+
+        flows = read_mrt(path)
+    else:
+        if data is None:
+            data = _read(path)
+
+        if parser_name is None and (parser_name := detect_parser(data)) is None:
+            raise ValueError(f"Unable to detect the platform of '{path}'")
+
+        flows = get_parser(parser_name)(data)
+
+    for flow in flows:
+        flow.filter = flow.str_filter()
+
+        if add_source and path != STDIN:
+            flow.metadata["source"] = path
+
+        yield flow
+
+
+def parse_file(
+    path: str,
+    parser_name: str | None = None,
+    data: str | None = None,
+    add_source: bool = False,
+) -> list[FlowSpec]:
+    return list(iter_file(path, parser_name, data, add_source))
+
+
+def _parse_file_ndjson(
+    path: str, parser_name: str | None, data: str | None = None
+) -> str:
+    # Runs in the pool workers, the flows are written to a temporary file as
+    # they are parsed and the parent process copies it to the output, so
+    # neither holds the flows of a whole file.
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(
+        "w", prefix="flowspec-", suffix=".ndjson", delete=False
+    ) as fp:
+        try:
+            for flow in iter_file(path, parser_name, data, add_source=True):
+                fp.write(flow.to_json(default=str) + "\n")  # type: ignore
+        except BaseException:
+            os.unlink(fp.name)
+            raise
+
+    return fp.name
+
+
+def _parse_file_binary(
+    path: str, parser_name: str | None, data: str | None = None
+) -> bytes:
+    # Runs in the pool workers, the flows are sent back to the parent process
+    # in the binary form, smaller than pickled.
+    from flowspec_exporter.serialization import dumps
+
+    return dumps(iter_file(path, parser_name, data, add_source=True))
+
+
+def _iter_paths(paths: list[str]) -> Iterator[str]:
+    for path in paths:
+        if path != STDIN and os.path.isdir(path):
+            yield from sorted(str(i) for i in Path(path).rglob("*") if i.is_file())
+        else:
+            yield path
+
+
+def _is_parser_name(name: str) -> bool:
+    return name == MRT_PARSER or is_parser(name)
+
+
+def _parser_name(value: str) -> str:
+    if not _is_parser_name(value):
+        raise argparse.ArgumentTypeError(
+            f"invalid choice: '{value}' (choose from "
+            + ", ".join((*parser_names(), MRT_PARSER))
+            + ")"
+        )
+
+    return value
+
+
+def _parse_platform_map(values: list[str]) -> list[tuple[str, str]]:
+    platform_map = []
+
+    for value in values:
+        pattern, sep, parser_name = value.rpartition("=")
+
+        if not sep or not _is_parser_name(parser_name):
+            raise argparse.ArgumentTypeError(
+                f"Invalid mapping '{value}', expected GLOB=PARSER with PARSER one of: "
+                + ", ".join((*parser_names(), MRT_PARSER))
+            )
+
+        platform_map.append((pattern, parser_name))
+
+    return platform_map
+
+
+def _select_parser(
+    path: str, parser_name: str | None, platform_map: list[tuple[str, str]]
+) -> str | None:
+    for pattern, mapped_parser_name in platform_map:
+        if fnmatch.fnmatch(path, pattern):
+            return mapped_parser_name
+
+    return parser_name
 
 
 def main() -> None:
     arg_parser = argparse.ArgumentParser()
     arg_parser.add_argument(
-        "file", nargs="?", type=argparse.FileType("r"), default=sys.stdin
+        "paths",
+        nargs="*",
+        default=[STDIN],
+        help="Files or directories with router outputs or MRT dumps, '-' for stdin",
+    )
+    arg_parser.add_argument(
+        "--parser",
+        type=_parser_name,
+        metavar="PARSER",
+        help="Parser to use, detected from the output when not given, one of "
+        + ", ".join(PARSER_NAMES)
+        + " or an installed one",
+    )
+    arg_parser.add_argument(
+        "--map",
+        action="append",
+        default=[],
+        metavar="GLOB=PARSER",
+        help="Parser to use for the paths matching GLOB",
+    )
+    arg_parser.add_argument(
+        "--format",
+        choices=["json", "ndjson"],
+        help="Output a single JSON document or one flow per line "
+        "(default: json for a single input, ndjson otherwise)",
+    )
+    arg_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes",
     )
-    arg_parser.add_argument("parser", choices=PARSERS.keys())
 
     args = arg_parser.parse_args()
 
-    data = args.file.read()
+    # Backward compatible with `main.py [file] parser`.
+    parser_name: str | None = args.parser
+    paths: list[str] = []
 
-    parser = PARSERS[args.parser]
+    for path in args.paths:
+        if path in PARSER_NAMES and not os.path.exists(path):
+            parser_name = path
+        else:
+            paths.append(path)
 
-    flows = parser(data)
+    paths = list(_iter_paths(paths or [STDIN]))
 
-    for flow in flows:
-        flow.filter = flow.str_filter()
+    try:
+        platform_map = _parse_platform_map(args.map)
+    except argparse.ArgumentTypeError as e:
+        arg_parser.error(str(e))
+
+    output_format = args.format or ("json" if len(paths) == 1 else "ndjson")
+
+    jobs = max(1, min(args.jobs, len(paths)))
+
+    if output_format == "json":
+        flows: list[FlowSpec] = []
+
+        if jobs == 1:
+            for path in paths:
+                try:
+                    flows.extend(
+                        parse_file(
+                            path,
+                            _select_parser(path, parser_name, platform_map),
+                            add_source=len(paths) > 1,
+                        )
+                    )
+                except PARSE_ERRORS as e:
+                    arg_parser.error(f"{path}: {e}")
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            from flowspec_exporter.serialization import loads
+
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = [
+                    (
+                        path,
+                        executor.submit(
+                            _parse_file_binary,
+                            path,
+                            _select_parser(path, parser_name, platform_map),
+                            sys.stdin.read() if path == STDIN else None,
+                        ),
+                    )
+                    for path in paths
+                ]
+
+                for path, future in futures:
+                    try:
+                        flows.extend(loads(future.result()))
+                    except PARSE_ERRORS as e:
+                        executor.shutdown(cancel_futures=True)
+                        arg_parser.error(f"{path}: {e}")
+
+        flowspecs = FlowSpecs(flows=flows)
+
+        print(flowspecs.to_json(indent=2, default=str))  # type: ignore
+
+        return
+
+    # Not needed for a single file, the default of the batch jobs.
+    import shutil
+    from concurrent.futures import ProcessPoolExecutor
+
+    failed = False
+
+    # A window of files in flight, written in order as they complete.
+    pending: deque[tuple[str, "Future[str]"]] = deque()
+    remaining = iter(paths)
+
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            while True:
+                for path in remaining:
+                    pending.append(
+                        (
+                            path,
+                            executor.submit(
+                                _parse_file_ndjson,
+                                path,
+                                _select_parser(path, parser_name, platform_map),
+                                # The workers can't read the stdin of the parent
+                                # process.
+                                sys.stdin.read() if path == STDIN else None,
+                            ),
+                        )
+                    )
+
+                    if len(pending) >= jobs * PENDING_FILES_PER_JOB:
+                        break
+
+                if not pending:
+                    break
+
+                path, future = pending.popleft()
+
+                try:
+                    output = future.result()
+                except Exception as e:
+                    # Whatever failed in the file, the other files are still output.
+                    print(f"{path}: {e}", file=sys.stderr)
+                    failed = True
+                    continue
+
+                try:
+                    with open(output) as fp:
+                        shutil.copyfileobj(fp, sys.stdout)
+                finally:
+                    os.unlink(output)
 
-    flowspecs = FlowSpecs(flows=flows)
+                sys.stdout.flush()
+    finally:
+        # The outputs left when interrupted.
+        for _, future in pending:
+            if future.done() and not future.cancelled() and not future.exception():
+                os.unlink(future.result())
 
-    print(flowspecs.to_json(indent=2, default=str))  # type: ignore
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,318 @@
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+from netaddr import IPNetwork
+
+from flowspec_exporter.flowspec import (
+    BitmaskOp,
+    BitmaskValues,
+    FlowSpec,
+    NumericOp,
+    NumericValues,
+)
+
+TCP = 6
+UDP = 17
+ICMP = 1
+ICMPV6 = 58
+
+type Mask = npt.NDArray[np.bool_]
+
+
+@dataclass
+class Packets:
+    """A batch of packets as columns, one array per header field.
+
+    IPv4 addresses are `uint32` arrays, IPv6 addresses `(n, 2)` arrays of
+    `uint64` with the high half first. The fields that aren't given are zero,
+    `fragment` uses the bits of the fragment component (0x01 don't fragment,
+    0x02 is a fragment, 0x04 first fragment, 0x08 last fragment).
+    """
+
+    destination: np.ndarray
+    source: np.ndarray
+    protocol: np.ndarray = field(default=None)  # type: ignore
+    source_port: np.ndarray = field(default=None)  # type: ignore
+    destination_port: np.ndarray = field(default=None)  # type: ignore
+    icmp_type: np.ndarray = field(default=None)  # type: ignore
+    icmp_code: np.ndarray = field(default=None)  # type: ignore
+    tcp_flags: np.ndarray = field(default=None)  # type: ignore
+    length: np.ndarray = field(default=None)  # type: ignore
+    dscp: np.ndarray = field(default=None)  # type: ignore
+    fragment: np.ndarray = field(default=None)  # type: ignore
+
+    def __post_init__(self) -> None:
+        self.destination = np.asarray(self.destination)
+
+        address_dtype = np.uint64 if self.destination.ndim == 2 else np.uint32
+
+        self.destination = self.destination.astype(address_dtype, copy=False)
+        self.source = np.asarray(self.source, address_dtype)
+
+        for name, dtype in (
+            ("protocol", np.uint8),
+            ("source_port", np.uint16),
+            ("destination_port", np.uint16),
+            ("icmp_type", np.uint8),
+            ("icmp_code", np.uint8),
+            ("tcp_flags", np.uint16),
+            ("length", np.uint16),
+            ("dscp", np.uint8),
+            ("fragment", np.uint8),
+        ):
+            if (value := getattr(self, name)) is None:
+                setattr(self, name, np.zeros(len(self), dtype))
+            else:
+                setattr(self, name, np.asarray(value, dtype))
+
+    def __len__(self) -> int:
+        return len(self.destination)
+
+    @property
+    def version(self) -> int:
+        return 6 if self.destination.ndim == 2 else 4
+
+
+class MatchResult(NamedTuple):
+    # Index of the first matching rule in the matcher's rules, -1 for none.
+    first_match: npt.NDArray[np.int32]
+    # Number of packets each rule matched first.
+    hits: npt.NDArray[np.int64]
+
+
+def _numeric_term(column: np.ndarray, op: NumericOp, value: int) -> Mask:
+    match (op.lt, op.gt, op.eq):
+        case (False, False, True):
+            return column == value
+        case (False, True, False):
+            return column > value
+        case (False, True, True):
+            return column >= value
+        case (True, False, False):
+            return column < value
+        case (True, False, True):
+            return column <= value
+        case (True, True, False):
+            return column != value
+        case (True, True, True):
+            return np.ones(len(column), np.bool_)
+        case _:
+            return np.zeros(len(column), np.bool_)
+
+
+def _bitmask_term(column: np.ndarray, op: BitmaskOp, value: int) -> Mask:
+    masked = column & value
+
+    result = masked == value if op.match else masked != 0
+
+    return ~result if op.not_ else result
+
+
+def _evaluate(
+    column: np.ndarray, values: NumericValues | BitmaskValues, bitmask: bool
+) -> Mask:
+    # RFC 8955 section 4.2.1.1, AND binds tighter than OR: the terms are
+    # grouped by the and bit and the groups are ORed.
+
+    term = _bitmask_term if bitmask else _numeric_term
+
+    result: Mask | None = None
+    group: Mask | None = None
+
+    for op, value in values:
+        mask = term(column, op, value)
+
+        if op.and_ and group is not None:
+            group &= mask
+        else:
+            if group is not None:
+                result = group if result is None else result | group
+            group = mask
+
+    if group is not None:
+        result = group if result is None else result | group
+
+    if result is None:
+        return np.zeros(len(column), np.bool_)
+
+    return result
+
+
+def _prefix_halves(prefix: IPNetwork) -> tuple[int, int, int, int]:
+    """Network and mask split in two 64-bit halves (the high one is 0 for IPv4)."""
+
+    network = int(prefix.network)
+    mask = int(prefix.netmask)
+
+    if prefix.version == 4:
+        return 0, network, 0, mask
+
+    return network >> 64, network & (2**64 - 1), mask >> 64, mask & (2**64 - 1)
+
+
+def _prefix_mask(column: np.ndarray, prefix: IPNetwork) -> Mask:
+    network_high, network_low, mask_high, mask_low = _prefix_halves(prefix)
+
+    if column.ndim == 1:
+        return (column & np.uint32(mask_low)) == np.uint32(network_low)
+
+    return ((column[:, 0] & np.uint64(mask_high)) == np.uint64(network_high)) & (
+        (column[:, 1] & np.uint64(mask_low)) == np.uint64(network_low)
+    )
+
+
+def _prefix_range(prefix: IPNetwork) -> tuple[int, int]:
+    """Range of the sort key (the address, or its high half for IPv6)."""
+
+    first, last = int(prefix.first), int(prefix.last)
+
+    if prefix.version == 6:
+        return first >> 64, last >> 64
+
+    return first, last
+
+
+class RuleMatcher:
+    """Match packet batches against FlowSpec rules with NumPy.
+
+    The rules are evaluated in RFC 8955 precedence order and every packet is
+    counted for the first rule it matches, like the routers do. Rules with a
+    destination (or source) prefix are only evaluated on the packets in that
+    prefix, found by binary search over the packets sorted once per batch.
+    """
+
+    def __init__(self, flows: list[FlowSpec]) -> None:
+        self.flows = flows
+
+        self._order = sorted(range(len(flows)), key=lambda i: flows[i].sort_key())
+
+        # The prefix each rule is looked up by, as a range of the sorted keys
+        # of the packets, resolved for all the rules at once per batch.
+        self._lookup: list[tuple[str, int] | None] = [None] * len(flows)
+
+        firsts = np.zeros(len(flows), np.uint64)
+        lasts = np.zeros(len(flows), np.uint64)
+
+        for i, flow in enumerate(flows):
+            if flow.destination_prefix is not None:
+                name, prefix = "destination", flow.destination_prefix
+            elif flow.source_prefix is not None:
+                name, prefix = "source", flow.source_prefix
+            else:
+                continue
+
+            self._lookup[i] = (name, prefix.version)
+            firsts[i], lasts[i] = _prefix_range(prefix)
+
+        self._firsts = firsts
+        self._lasts = lasts
+
+    def _rule_mask(self, flow: FlowSpec, packets: Packets, index: np.ndarray) -> Mask:
+        mask = np.ones(len(index), np.bool_)
+
+        protocol = packets.protocol[index]
+
+        if flow.destination_prefix is not None:
+            mask &= _prefix_mask(packets.destination[index], flow.destination_prefix)
+        if flow.source_prefix is not None:
+            mask &= _prefix_mask(packets.source[index], flow.source_prefix)
+
+        if flow.ip_protocol is not None:
+            mask &= _evaluate(protocol, flow.ip_protocol, False)
+
+        if (
+            flow.port is not None
+            or flow.destination_port is not None
+            or flow.source_port is not None
+        ):
+            mask &= (protocol == TCP) | (protocol == UDP)
+
+            if flow.port is not None:
+                mask &= _evaluate(
+                    packets.source_port[index], flow.port, False
+                ) | _evaluate(packets.destination_port[index], flow.port, False)
+            if flow.destination_port is not None:
+                mask &= _evaluate(
+                    packets.destination_port[index], flow.destination_port, False
+                )
+            if flow.source_port is not None:
+                mask &= _evaluate(packets.source_port[index], flow.source_port, False)
+
+        if flow.icmp_type is not None or flow.icmp_code is not None:
+            mask &= protocol == (ICMP if packets.version == 4 else ICMPV6)
+
+            if flow.icmp_type is not None:
+                mask &= _evaluate(packets.icmp_type[index], flow.icmp_type, False)
+            if flow.icmp_code is not None:
+                mask &= _evaluate(packets.icmp_code[index], flow.icmp_code, False)
+
+        if flow.tcp_flags is not None:
+            mask &= protocol == TCP
+            mask &= _evaluate(packets.tcp_flags[index], flow.tcp_flags, True)
+
+        if flow.packet_length is not None:
+            mask &= _evaluate(packets.length[index], flow.packet_length, False)
+        if flow.dscp is not None:
+            mask &= _evaluate(packets.dscp[index], flow.dscp, False)
+        if flow.fragment is not None:
+            mask &= _evaluate(packets.fragment[index], flow.fragment, True)
+
+        return mask
+
+    def match(self, packets: Packets) -> MatchResult:
+        count = len(packets)
+
+        first_match = np.full(count, -1, np.int32)
+        hits = np.zeros(len(self.flows), np.int64)
+
+        unmatched = np.ones(count, np.bool_)
+        all_packets = np.arange(count)
+
+        # Sorted keys of the addresses, to find the packets in a prefix.
+        ranges: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+        for name in ("destination", "source"):
+            column = getattr(packets, name)
+            key = (column if column.ndim == 1 else column[:, 0]).astype(np.uint64)
+            order = np.argsort(key, kind="stable")
+            key = key[order]
+
+            ranges[name] = (
+                order,
+                np.searchsorted(key, self._firsts, side="left"),
+                np.searchsorted(key, self._lasts, side="right"),
+            )
+
+        for i in self._order:
+            if (lookup := self._lookup[i]) is not None:
+                name, version = lookup
+
+                if version != packets.version:
+                    continue
+
+                order, starts, stops = ranges[name]
+                index = order[starts[i] : stops[i]]
+            else:
+                index = all_packets
+
+            index = index[unmatched[index]]
+
+            if not len(index):
+                continue
+
+            matched = index[self._rule_mask(self.flows[i], packets, index)]
+
+            first_match[matched] = i
+            unmatched[matched] = False
+            hits[i] = len(matched)
+
+        return MatchResult(first_match, hits)
+
+
+__all__ = [
+    "MatchResult",
+    "Packets",
+    "RuleMatcher",
+]
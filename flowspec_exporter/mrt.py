@@ -0,0 +1,289 @@
+import bz2
+import copy
+import gzip
+import logging
+import mmap
+import os
+import struct
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterator
+
+from netaddr import IPAddress
+
+from flowspec_exporter.bgp import (
+    AFI_IPV4,
+    AFI_IPV6,
+    ATTR_EXTENDED_COMMUNITIES,
+    SAFI_FLOWSPEC_VPN,
+    apply_actions,
+    is_flowspec,
+    parse_attributes,
+    parse_update,
+)
+from flowspec_exporter.flowspec import FlowSpec, UnsupportedNLRIError
+
+logger = logging.getLogger(__name__)
+
+# RFC 6396 record types and subtypes.
+
+TABLE_DUMP_V2 = 13
+BGP4MP = 16
+BGP4MP_ET = 17
+
+PEER_INDEX_TABLE = 1
+RIB_GENERIC = 6
+RIB_GENERIC_ADDPATH = 12
+
+BGP4MP_MESSAGE = 1
+BGP4MP_MESSAGE_AS4 = 4
+BGP4MP_MESSAGE_LOCAL = 6
+BGP4MP_MESSAGE_AS4_LOCAL = 7
+BGP4MP_MESSAGE_ADDPATH = 8
+BGP4MP_MESSAGE_AS4_ADDPATH = 9
+BGP4MP_MESSAGE_LOCAL_ADDPATH = 10
+BGP4MP_MESSAGE_AS4_LOCAL_ADDPATH = 11
+
+BGP4MP_AS4_SUBTYPES = frozenset(
+    (
+        BGP4MP_MESSAGE_AS4,
+        BGP4MP_MESSAGE_AS4_LOCAL,
+        BGP4MP_MESSAGE_AS4_ADDPATH,
+        BGP4MP_MESSAGE_AS4_LOCAL_ADDPATH,
+    )
+)
+
+BGP4MP_ADDPATH_SUBTYPES = frozenset(
+    (
+        BGP4MP_MESSAGE_ADDPATH,
+        BGP4MP_MESSAGE_AS4_ADDPATH,
+        BGP4MP_MESSAGE_LOCAL_ADDPATH,
+        BGP4MP_MESSAGE_AS4_LOCAL_ADDPATH,
+    )
+)
+
+BGP4MP_SUBTYPES = (
+    BGP4MP_AS4_SUBTYPES
+    | BGP4MP_ADDPATH_SUBTYPES
+    | {
+        BGP4MP_MESSAGE,
+        BGP4MP_MESSAGE_LOCAL,
+    }
+)
+
+MRT_HEADER = struct.Struct("!IHHI")
+
+GZIP_MAGIC = b"\x1f\x8b"
+BZ2_MAGIC = b"BZh"
+
+
+def _open(path: str) -> BinaryIO:
+    with open(path, "rb") as fp:
+        magic = fp.read(3)
+
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, "rb")  # type: ignore
+    if magic.startswith(BZ2_MAGIC):
+        return bz2.open(path, "rb")  # type: ignore
+
+    return open(path, "rb")
+
+
+def is_mrt_file(path: str) -> bool:
+    """Sniff the first record header, compressed files are looked into."""
+
+    try:
+        with _open(path) as fp:
+            header = fp.read(MRT_HEADER.size)
+    except (OSError, EOFError):
+        return False
+
+    if len(header) < MRT_HEADER.size:
+        return False
+
+    _, type_, subtype, _ = MRT_HEADER.unpack(header)
+
+    return type_ in (TABLE_DUMP_V2, BGP4MP, BGP4MP_ET) and subtype < 64
+
+
+def _iter_records(path: str) -> Iterator[tuple[int, int, int, memoryview]]:
+    fp = _open(path)
+
+    if not isinstance(fp, (gzip.GzipFile, bz2.BZ2File)):
+        # Plain files are mapped and the records are views into the map, the
+        # map is released with the last of them.
+        with fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                return
+
+            view = memoryview(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+
+        offset = 0
+
+        while offset + MRT_HEADER.size <= len(view):
+            timestamp, type_, subtype, length = MRT_HEADER.unpack_from(view, offset)
+            offset += MRT_HEADER.size
+
+            if offset + length > len(view):
+                logger.error("Truncated MRT record in %s at %d", path, offset)
+                return
+
+            yield timestamp, type_, subtype, view[offset : offset + length]
+
+            offset += length
+
+        return
+
+    # Compressed files can't be mapped, they are read a record at a time
+    # through the decompressor buffer.
+    with fp:
+        while header := fp.read(MRT_HEADER.size):
+            if len(header) < MRT_HEADER.size:
+                logger.error("Truncated MRT header in %s", path)
+                return
+
+            timestamp, type_, subtype, length = MRT_HEADER.unpack(header)
+
+            if len(body := fp.read(length)) < length:
+                logger.error("Truncated MRT record in %s", path)
+                return
+
+            yield timestamp, type_, subtype, memoryview(body)
+
+
+def _ip_address(data: memoryview) -> str:
+    return str(IPAddress(int.from_bytes(data), 4 if len(data) == 4 else 6))
+
+
+def _metadata(timestamp: int) -> dict[str, str]:
+    return {"timestamp": datetime.fromtimestamp(timestamp, timezone.utc).isoformat()}
+
+
+def _parse_peer_index_table(data: memoryview) -> list[str]:
+    peers: list[str] = []
+
+    (view_name_length,) = struct.unpack_from("!H", data, 4)
+    offset = 6 + view_name_length
+
+    (count,) = struct.unpack_from("!H", data, offset)
+    offset += 2
+
+    for _ in range(count):
+        peer_type = data[offset]
+        offset += 5
+
+        size = 16 if peer_type & 0x01 else 4
+        peers.append(_ip_address(data[offset : offset + size]))
+        offset += size
+
+        offset += 4 if peer_type & 0x02 else 2
+
+    return peers
+
+
+def _parse_rib_generic(
+    data: memoryview, addpath: bool, peers: list[str], timestamp: int
+) -> Iterator[FlowSpec]:
+    afi, safi = struct.unpack_from("!HB", data, 4)
+
+    if not is_flowspec(afi, safi):
+        return
+
+    metadata = _metadata(timestamp)
+
+    try:
+        template, offset = FlowSpec.decode(
+            data, 7, 4 if afi == AFI_IPV4 else 6, vpn=safi == SAFI_FLOWSPEC_VPN
+        )
+    except UnsupportedNLRIError as e:
+        logger.warning("Skipped RIB entry: %s", e)
+        return
+
+    (count,) = struct.unpack_from("!H", data, offset)
+    offset += 2
+
+    for _ in range(count):
+        (peer_index,) = struct.unpack_from("!H", data, offset)
+        offset += 6
+
+        if addpath:
+            offset += 4
+
+        (attributes_length,) = struct.unpack_from("!H", data, offset)
+        offset += 2
+
+        attributes = parse_attributes(data[offset : offset + attributes_length])
+        offset += attributes_length
+
+        flowspec = copy.copy(template)
+        flowspec.metadata = {**template.metadata, **metadata}
+
+        if peer_index < len(peers):
+            flowspec.metadata["peer"] = peers[peer_index]
+
+        apply_actions(flowspec, attributes.get(ATTR_EXTENDED_COMMUNITIES))
+
+        yield flowspec
+
+
+def _parse_bgp4mp(
+    data: memoryview, subtype: int, withdrawals: bool, timestamp: int
+) -> Iterator[FlowSpec]:
+    as_size = 4 if subtype in BGP4MP_AS4_SUBTYPES else 2
+
+    offset = 2 * as_size + 2
+
+    (afi,) = struct.unpack_from("!H", data, offset)
+    offset += 2
+
+    ip_size = 16 if afi == AFI_IPV6 else 4
+    peer = _ip_address(data[offset : offset + ip_size])
+    offset += 2 * ip_size
+
+    announced, withdrawn = parse_update(
+        data[offset:], subtype in BGP4MP_ADDPATH_SUBTYPES
+    )
+
+    for flowspec in announced:
+        flowspec.metadata.update(_metadata(timestamp), peer=peer)
+
+        yield flowspec
+
+    if withdrawals:
+        for flowspec in withdrawn:
+            flowspec.metadata.update(_metadata(timestamp), peer=peer, withdrawn="true")
+
+            yield flowspec
+
+
+def read_mrt(path: str, withdrawals: bool = False) -> Iterator[FlowSpec]:
+    """Stream the FlowSpec rules of an MRT (RFC 6396) file.
+
+    Handles `TABLE_DUMP_V2` RIB dumps and `BGP4MP` update messages, plain or
+    compressed with gzip or bz2. With `withdrawals`, withdrawn rules of
+    `BGP4MP` updates are included with the `withdrawn` metadata set.
+    """
+
+    peers: list[str] = []
+
+    for timestamp, type_, subtype, data in _iter_records(path):
+        try:
+            if type_ == TABLE_DUMP_V2:
+                if subtype == PEER_INDEX_TABLE:
+                    peers = _parse_peer_index_table(data)
+                elif subtype in (RIB_GENERIC, RIB_GENERIC_ADDPATH):
+                    yield from _parse_rib_generic(
+                        data, subtype == RIB_GENERIC_ADDPATH, peers, timestamp
+                    )
+            elif type_ == BGP4MP and subtype in BGP4MP_SUBTYPES:
+                yield from _parse_bgp4mp(data, subtype, withdrawals, timestamp)
+            elif type_ == BGP4MP_ET and subtype in BGP4MP_SUBTYPES:
+                # Extended timestamp, the microseconds come first.
+                yield from _parse_bgp4mp(data[4:], subtype, withdrawals, timestamp)
+        except (ValueError, IndexError, struct.error) as e:
+            logger.error("Invalid MRT record in %s: %s", path, e)
+
+
+__all__ = [
+    "is_mrt_file",
+    "read_mrt",
+]
@@ -1,28 +1,133 @@
-from typing import Literal
-
-from asyncssh import SSHClientConnection
+import functools
+import importlib
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
 
+from flowspec_exporter.cache import ParseCache
 from flowspec_exporter.flowspec import FlowSpec
-from flowspec_exporter.routers.cisco_ios import parse_flow_spec_cisco_ios
-from flowspec_exporter.routers.huawei_vrp import parse_flow_spec_huawei_vrp
-from flowspec_exporter.routers.juniper_junos import parse_flow_spec_juniper_junos
 
-type Platform = Literal["cisco_ios", "juniper_junos", "huawei_vrp"]
+if TYPE_CHECKING:
+    from importlib.metadata import EntryPoint
+
+    from asyncssh import SSHClientConnection
+
+# A built-in platform or one registered by another package, see `PLATFORMS_GROUP`.
+type Platform = str
+
+type ScrapeFunction = Callable[..., Awaitable[list[FlowSpec]]]
+
+type ParseFunction = Callable[..., list[FlowSpec]]
+
+# The modules of the platforms are only imported once a router (or an output)
+# of the platform has to be parsed, as "module:attribute".
+
+PLATFORMS = {
+    "cisco_ios": "flowspec_exporter.routers.cisco_ios:parse_flow_spec_cisco_ios",
+    "juniper_junos": (
+        "flowspec_exporter.routers.juniper_junos:parse_flow_spec_juniper_junos"
+    ),
+    "huawei_vrp": "flowspec_exporter.routers.huawei_vrp:parse_flow_spec_huawei_vrp",
+}
+
+PARSERS = {
+    "cisco_ios_parse_flows": "flowspec_exporter.routers.cisco_ios:parse_flows",
+    "huawei_vrp_parse_flows": "flowspec_exporter.routers.huawei_vrp:parse_flows",
+    "juniper_junos_parse_flows": "flowspec_exporter.routers.juniper_junos:parse_flows",
+    "juniper_junos_json_parse_flows": (
+        "flowspec_exporter.routers.juniper_junos:parse_flows_json"
+    ),
+}
+
+# Entry point groups of the third-party platforms, the scrape functions take
+# `(connection, cache, **parameters)` and the parse functions `(output, cache)`
+# like the built-in ones, e.g. in the `pyproject.toml` of a package:
+#
+#   [project.entry-points."flowspec_exporter.platforms"]
+#   arista_eos = "flowspec_arista.eos:parse_flow_spec"
+#
+#   [project.entry-points."flowspec_exporter.parsers"]
+#   arista_eos_parse_flows = "flowspec_arista.eos:parse_flows"
+
+PLATFORMS_GROUP = "flowspec_exporter.platforms"
+
+PARSERS_GROUP = "flowspec_exporter.parsers"
+
+
+@functools.cache
+def _entry_points(group: str) -> dict[str, "EntryPoint"]:
+    # Scanning the installed packages takes a while, only done for a name
+    # that isn't built-in.
+    from importlib.metadata import entry_points
+
+    return {entry_point.name: entry_point for entry_point in entry_points(group=group)}
+
+
+def _load(builtins: dict[str, str], group: str, name: str) -> Any:
+    if (target := builtins.get(name)) is not None:
+        module, _, attribute = target.partition(":")
+
+        return getattr(importlib.import_module(module), attribute)
 
-PLATFORMS = ["cisco_ios", "juniper_junos", "huawei_vrp"]
+    if (entry_point := _entry_points(group).get(name)) is not None:
+        return entry_point.load()
+
+    return None
+
+
+@functools.cache
+def get_platform(platform: Platform) -> ScrapeFunction:
+    if (function := _load(PLATFORMS, PLATFORMS_GROUP, platform)) is None:
+        raise ValueError(f"Unsupported platform: {platform}")
+
+    return function
+
+
+@functools.cache
+def get_parser(name: str) -> ParseFunction:
+    if (function := _load(PARSERS, PARSERS_GROUP, name)) is None:
+        raise ValueError(f"Unsupported parser: {name}")
+
+    return function
+
+
+def platform_names() -> list[str]:
+    """Names of the built-in and installed platforms."""
+
+    return [
+        *PLATFORMS,
+        *(name for name in _entry_points(PLATFORMS_GROUP) if name not in PLATFORMS),
+    ]
+
+
+def parser_names() -> list[str]:
+    """Names of the built-in and installed parsers."""
+
+    return [
+        *PARSERS,
+        *(name for name in _entry_points(PARSERS_GROUP) if name not in PARSERS),
+    ]
+
+
+def is_parser(name: str) -> bool:
+    return name in PARSERS or name in _entry_points(PARSERS_GROUP)
 
 
 async def parse_flow_spec(
     platform: Platform,
-    connection: SSHClientConnection,
+    connection: "SSHClientConnection",
+    cache: ParseCache | None = None,
     **kwargs,
 ) -> list[FlowSpec]:
-    match platform:
-        case "cisco_ios":
-            return await parse_flow_spec_cisco_ios(connection, **kwargs)
-        case "juniper_junos":
-            return await parse_flow_spec_juniper_junos(connection, **kwargs)
-        case "huawei_vrp":
-            return await parse_flow_spec_huawei_vrp(connection, **kwargs)
-        case _:
-            raise ValueError(f"Unsupported platform: {platform}")
+    return await get_platform(platform)(connection, cache, **kwargs)
+
+
+__all__ = [
+    "PARSERS",
+    "PLATFORMS",
+    "Platform",
+    "get_parser",
+    "get_platform",
+    "is_parser",
+    "parse_flow_spec",
+    "parser_names",
+    "platform_names",
+]
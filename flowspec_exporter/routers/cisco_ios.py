@@ -1,10 +1,10 @@
 import logging
 import re
-from typing import NotRequired, TypedDict, Unpack
+from typing import TYPE_CHECKING, NotRequired, TypedDict, Unpack
 
-from asyncssh import SSHClientConnection
 from netaddr import IPNetwork
 
+from flowspec_exporter.cache import ParseCache, parse_rule
 from flowspec_exporter.flowspec import (
     Action,
     BitmaskOp,
@@ -20,6 +20,11 @@ from flowspec_exporter.flowspec import (
     NumericValues,
 )
 
+# Only for the annotations, asyncssh is slow to import and isn't needed to
+# parse outputs offline.
+if TYPE_CHECKING:
+    from asyncssh import SSHClientConnection
+
 logger = logging.getLogger(__name__)
 
 
@@ -58,7 +63,8 @@ def _parse_prefix(value: str) -> IPNetwork | None:
 
 
 def _parse_numeric_values(value: str) -> NumericValues:
-    values, set_and = NumericValues(), False
+    values: list[tuple[NumericOp, int]] = []
+    set_and = False
 
     for i in RE_FIND_NUMERIC_VALUES.finditer(value):
         numeric_op: NumericOp
@@ -84,11 +90,12 @@ def _parse_numeric_values(value: str) -> NumericValues:
 
         set_and = i.group("and_or") == "&"
 
-    return values
+    return NumericValues(*values)
 
 
 def _parse_bitmask_values(value: str) -> BitmaskValues:
-    values, set_and = BitmaskValues(), False
+    values: list[tuple[BitmaskOp, int]] = []
+    set_and = False
 
     for i in RE_FIND_BITMASK_VALUES.finditer(value):
         not_ = i.group("not") is not None
@@ -119,53 +126,57 @@ def _parse_bitmask_values(value: str) -> BitmaskValues:
 
         set_and = i.group("and_or") == "&"
 
-    return values
+    return BitmaskValues(*values)
+
+
+def _parse_rule(raw: str) -> FlowSpec:
+    flowspec = FlowSpec(raw=raw)
+
+    logger.debug("Parsing flowspec: %s", raw)
+
+    for key, value in RE_FIND_COMPONENTS.findall(raw):
+        key: str
+        value: str
+
+        key, value = key.strip(), value.strip()
+
+        match key:
+            case "Dest":
+                flowspec.destination_prefix = _parse_prefix(value)
+            case "Source":
+                flowspec.source_prefix = _parse_prefix(value)
+            case "Proto":
+                flowspec.ip_protocol = _parse_numeric_values(value)
+            case "Port":
+                flowspec.port = _parse_numeric_values(value)
+            case "DPort":
+                flowspec.destination_port = _parse_numeric_values(value)
+            case "SPort":
+                flowspec.source_port = _parse_numeric_values(value)
+            case "Length":
+                flowspec.packet_length = _parse_numeric_values(value)
+            case "ICMPCode":
+                flowspec.icmp_code = _parse_numeric_values(value)
+            case "ICMPType":
+                flowspec.icmp_type = _parse_numeric_values(value)
+            case "TCPFlags":
+                flowspec.tcp_flags = _parse_bitmask_values(value)
+            case "Frag":
+                flowspec.fragment = _parse_bitmask_values(value)
+            case _:
+                logger.error("Unknown key: %s", key)
+                continue
+
+    return flowspec
 
 
-def parse_flows(data: str) -> list[FlowSpec]:
+def parse_flows(data: str, cache: ParseCache | None = None) -> list[FlowSpec]:
     flowspecs: list[FlowSpec] = []
 
     for match in RE_FIND_FLOWS.finditer(data):
-        flowspec = FlowSpec()
-
         raw = match.group("raw").strip()
 
-        flowspec.raw = raw
-
-        logger.debug("Parsing flowspec: %s", raw)
-
-        for key, value in RE_FIND_COMPONENTS.findall(raw):
-            key: str
-            value: str
-
-            key, value = key.strip(), value.strip()
-
-            match key:
-                case "Dest":
-                    flowspec.destination_prefix = _parse_prefix(value)
-                case "Source":
-                    flowspec.source_prefix = _parse_prefix(value)
-                case "Proto":
-                    flowspec.ip_protocol = _parse_numeric_values(value)
-                case "Port":
-                    flowspec.port = _parse_numeric_values(value)
-                case "DPort":
-                    flowspec.destination_port = _parse_numeric_values(value)
-                case "SPort":
-                    flowspec.source_port = _parse_numeric_values(value)
-                case "Length":
-                    flowspec.packet_length = _parse_numeric_values(value)
-                case "ICMPCode":
-                    flowspec.icmp_code = _parse_numeric_values(value)
-                case "ICMPType":
-                    flowspec.icmp_type = _parse_numeric_values(value)
-                case "TCPFlags":
-                    flowspec.tcp_flags = _parse_bitmask_values(value)
-                case "Frag":
-                    flowspec.fragment = _parse_bitmask_values(value)
-                case _:
-                    logger.error("Unknown key: %s", key)
-                    continue
+        flowspec = parse_rule(raw, _parse_rule, cache)
 
         flowspec.matched_bytes = int(match.group("matched_bytes"))
         flowspec.matched_packets = int(match.group("matched_packets"))
@@ -211,10 +222,12 @@ def parse_flows(data: str) -> list[FlowSpec]:
 
 class FlowSpecCiscoIosKwargs(TypedDict):
     vrf: NotRequired[str]
+    ip_version: NotRequired[str]
 
 
 async def parse_flow_spec_cisco_ios(
-    connection: SSHClientConnection,
+    connection: "SSHClientConnection",
+    cache: ParseCache | None = None,
     **kwargs: Unpack[FlowSpecCiscoIosKwargs],
 ) -> list[FlowSpec]:
     vrf = kwargs.get("vrf", DEFAULT_VRF)
@@ -228,4 +241,10 @@ async def parse_flow_spec_cisco_ios(
     output = str(result.stdout)
     logger.info("Command output", extra={"output": output})
 
-    return parse_flows(output)
+    flowspecs = parse_flows(output, cache)
+
+    for flowspec in flowspecs:
+        flowspec.metadata["vrf"] = vrf
+        flowspec.metadata["afi"] = ip_version
+
+    return flowspecs
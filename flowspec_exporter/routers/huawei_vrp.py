@@ -1,10 +1,12 @@
+import itertools
 import logging
 import re
-from typing import TypedDict, Unpack
+from collections import deque
+from typing import TYPE_CHECKING, NotRequired, TypedDict, Unpack
 
-from asyncssh import SSHClientConnection, SSHReader
 from netaddr import IPNetwork
 
+from flowspec_exporter.cache import ParseCache, parse_rule
 from flowspec_exporter.flowspec import (
     BitmaskOp,
     BitmaskValues,
@@ -19,6 +21,9 @@ from flowspec_exporter.flowspec import (
     NumericValues,
 )
 
+if TYPE_CHECKING:
+    from asyncssh import SSHClientConnection, SSHReader, SSHWriter
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,10 +43,16 @@ RE_FIND_RULES = re.compile(
 )
 
 
+DEFAULT_PIPELINE_WINDOW = 32
+
 COMMAND_DISPLAY_STATISTICS = (
     "display flowspec vpnv4 vpn-instance {vpn_instance} statistics {re_index} | no-more"
 )
 
+RE_ECHOED_STATISTICS_COMMAND = re.compile(r"statistics\s+(?P<re_index>\d+)")
+
+RE_STATISTICS_RE_INDEX = re.compile(r"ReIndex\s*:\s*(?P<re_index>\d+)")
+
 RE_FIND_STATISTICS = re.compile(
     r"(?P<key>Matched|Passed|Dropped)\s+(?P<packets_pps>\d+)\s+(?P<bytes_bps>\d+)"
 )
@@ -58,6 +69,7 @@ RE_FIND_BITMASK_VALUES = re.compile(
 
 class FlowSpecHuaweiVrpKwargs(TypedDict):
     vpn_instance: str
+    pipeline_window: NotRequired[int]
 
 
 class FlowStatistic(TypedDict):
@@ -74,7 +86,8 @@ def _parse_prefix(value: str) -> IPNetwork:
 
 
 def _parse_numeric_values(value: str) -> NumericValues:
-    values, set_and = NumericValues(), False
+    values: list[tuple[NumericOp, int]] = []
+    set_and = False
 
     for i in RE_FIND_NUMERIC_VALUES.finditer(value):
         numeric_op: NumericOp
@@ -100,11 +113,12 @@ def _parse_numeric_values(value: str) -> NumericValues:
 
         set_and = i.group("and_or") == "and"
 
-    return values
+    return NumericValues(*values)
 
 
 def _parse_bitmask_values(value: str) -> BitmaskValues:
-    values, set_and = BitmaskValues(), False
+    values: list[tuple[BitmaskOp, int]] = []
+    set_and = False
 
     for i in RE_FIND_BITMASK_VALUES.finditer(value):
         not_ = i.group("not") is not None
@@ -137,54 +151,60 @@ def _parse_bitmask_values(value: str) -> BitmaskValues:
 
         set_and = i.group("and_or") == "and"
 
-    return values
+    return BitmaskValues(*values)
 
 
-async def _read_until_shell_prompt(stdout: SSHReader) -> str:
+async def _read_until_shell_prompt(stdout: "SSHReader") -> str:
     return re.sub(r"<.*?>$", "", await stdout.readuntil(RE_SHELL_PROMPT)).strip()
 
 
-def parse_flows(output: str) -> list[FlowSpec]:
+def _parse_rule(raw: str) -> FlowSpec:
+    flowspec = FlowSpec(raw=raw)
+
+    for key, value in RE_FIND_RULES.findall(raw):
+        key: str
+        value: str
+
+        key, value = key.strip(), value.strip()
+
+        match key:
+            case "Destination IP":
+                flowspec.destination_prefix = _parse_prefix(value)
+            case "Source IP":
+                flowspec.source_prefix = _parse_prefix(value)
+            case "Protocol":
+                flowspec.ip_protocol = _parse_numeric_values(value)
+            case "Port":
+                flowspec.port = _parse_numeric_values(value)
+            case "Src. Port":
+                flowspec.port = _parse_numeric_values(value)
+            case "Dest. Port":
+                flowspec.destination_port = _parse_numeric_values(value)
+            case "ICMP Type":
+                flowspec.icmp_type = _parse_numeric_values(value)
+            case "ICMP Code":
+                flowspec.icmp_code = _parse_numeric_values(value)
+            case "TCP-flags":
+                flowspec.tcp_flags = _parse_bitmask_values(value)
+            case "FragmentType":
+                flowspec.fragment = _parse_bitmask_values(value)
+            case "Packet-Length":
+                flowspec.packet_length = _parse_numeric_values(value)
+            case _:
+                logger.error("Unknown key: %s", key)
+                continue
+
+    return flowspec
+
+
+def parse_flows(output: str, cache: ParseCache | None = None) -> list[FlowSpec]:
     flowspecs: list[FlowSpec] = []
 
     for re_index, dissemination_rules in RE_FIND_FLOWS.findall(output):
         logger.debug("ReIndex: %s", re_index)
         logger.debug("Dissemination Rules: %s", dissemination_rules)
 
-        flowspec = FlowSpec(raw=dissemination_rules)
-
-        for key, value in RE_FIND_RULES.findall(dissemination_rules):
-            key: str
-            value: str
-
-            key, value = key.strip(), value.strip()
-
-            match key:
-                case "Destination IP":
-                    flowspec.destination_prefix = _parse_prefix(value)
-                case "Source IP":
-                    flowspec.source_prefix = _parse_prefix(value)
-                case "Protocol":
-                    flowspec.ip_protocol = _parse_numeric_values(value)
-                case "Port":
-                    flowspec.port = _parse_numeric_values(value)
-                case "Src. Port":
-                    flowspec.port = _parse_numeric_values(value)
-                case "Dest. Port":
-                    flowspec.destination_port = _parse_numeric_values(value)
-                case "ICMP Type":
-                    flowspec.icmp_type = _parse_numeric_values(value)
-                case "ICMP Code":
-                    flowspec.icmp_code = _parse_numeric_values(value)
-                case "TCP-flags":
-                    flowspec.tcp_flags = _parse_bitmask_values(value)
-                case "FragmentType":
-                    flowspec.fragment = _parse_bitmask_values(value)
-                case "Packet-Length":
-                    flowspec.packet_length = _parse_numeric_values(value)
-                case _:
-                    logger.error("Unknown key: %s", key)
-                    continue
+        flowspec = parse_rule(dissemination_rules, _parse_rule, cache)
 
         flowspec.metadata["re_index"] = re_index
 
@@ -216,8 +236,83 @@ def parse_flow_statistics(output: str) -> FlowStatistic:
     }
 
 
+def _statistics_re_index(output: str) -> str | None:
+    """ReIndex of the rule of a statistics output, as printed in the output,
+    which doesn't depend on when the device echoes the commands."""
+
+    if (match := RE_STATISTICS_RE_INDEX.search(output)) is not None:
+        return match.group("re_index")
+
+    return _echoed_re_index(output)
+
+
+def _echoed_re_index(output: str) -> str | None:
+    """ReIndex of the command echoed right before the statistics of an output.
+
+    The echoes of several pending commands can come in a single output, the
+    last one before the statistics is the command they answer.
+    """
+
+    statistics = RE_FIND_STATISTICS.search(output)
+
+    echoes = RE_ECHOED_STATISTICS_COMMAND.findall(
+        output, 0, len(output) if statistics is None else statistics.start()
+    )
+
+    return echoes[-1] if echoes else None
+
+
+async def _collect_flow_statistics(
+    writer: "SSHWriter",
+    stdout: "SSHReader",
+    vpn_instance: str,
+    re_indexes: list[str],
+    window: int,
+) -> dict[str, FlowStatistic]:
+    # Keep up to `window` statistics commands in flight instead of waiting for
+    # the prompt after each one, so the scrape time is bound by the bandwidth
+    # and not by the number of round trips.
+    statistics: dict[str, FlowStatistic] = {}
+
+    pending: deque[str] = deque()
+    re_indexes_iter = iter(re_indexes)
+
+    def send(re_index: str) -> None:
+        command = COMMAND_DISPLAY_STATISTICS.format(
+            vpn_instance=vpn_instance, re_index=re_index
+        )
+
+        logger.info("Sending command", extra={"command": command})
+        writer.write(f"{command}\n")
+
+        pending.append(re_index)
+
+    for re_index in itertools.islice(re_indexes_iter, max(window, 1)):
+        send(re_index)
+
+    while pending:
+        expected_re_index = pending.popleft()
+
+        output = await _read_until_shell_prompt(stdout)
+        logger.info("Command output", extra={"output": output})
+
+        # The output tells which rule it belongs to, fallback to the echoed
+        # command and then to the order in which the commands were sent.
+        if (re_index := _statistics_re_index(output)) is None:
+            re_index = expected_re_index
+
+        statistics[re_index] = parse_flow_statistics(output)
+        logger.debug("Statistics: %s", statistics[re_index])
+
+        if (next_re_index := next(re_indexes_iter, None)) is not None:
+            send(next_re_index)
+
+    return statistics
+
+
 async def parse_flow_spec_huawei_vrp(
-    connection: SSHClientConnection,
+    connection: "SSHClientConnection",
+    cache: ParseCache | None = None,
     **kwargs: Unpack[FlowSpecHuaweiVrpKwargs],
 ) -> list[FlowSpec]:
     writer, stdout, _ = await connection.open_session()
@@ -233,33 +328,32 @@ async def parse_flow_spec_huawei_vrp(
     output = await _read_until_shell_prompt(stdout)
     logger.info("Command output", extra={"output": output})
 
-    flowspecs: list[FlowSpec] = parse_flows(output)
-
-    for flowspec in flowspecs:
-        re_index = flowspec.metadata.get("re_index")
+    flowspecs: list[FlowSpec] = parse_flows(output, cache)
 
-        command = COMMAND_DISPLAY_STATISTICS.format(
-            vpn_instance=kwargs["vpn_instance"], re_index=re_index
-        )
+    statistics = await _collect_flow_statistics(
+        writer,
+        stdout,
+        vpn_instance=kwargs["vpn_instance"],
+        re_indexes=[flowspec.metadata["re_index"] for flowspec in flowspecs],
+        window=int(kwargs.get("pipeline_window", DEFAULT_PIPELINE_WINDOW)),
+    )
 
-        logger.info("Sending command", extra={"command": command})
-        writer.write(f"{command}\n")
+    for flowspec in flowspecs:
+        flowspec.metadata["vrf"] = kwargs["vpn_instance"]
 
-        output = await _read_until_shell_prompt(stdout)
-        logger.info("Command output", extra={"output": output})
+        re_index = flowspec.metadata["re_index"]
 
-        statistics = parse_flow_statistics(output)
-        logger.debug("Statistics: %s", statistics)
+        if (flow_statistics := statistics.get(re_index)) is None:
+            logger.error("Missing statistics for ReIndex: %s", re_index)
+            continue
 
-        flowspec.matched_packets = statistics["matched_packets"]
-        flowspec.matched_bytes = statistics["matched_bytes"]
-        flowspec.transmitted_packets = statistics["passed_packets"]
-        flowspec.transmitted_bytes = statistics["passed_bytes"]
-        flowspec.dropped_packets = statistics["dropped_packets"]
-        flowspec.dropped_bytes = statistics["dropped_bytes"]
+        flowspec.matched_packets = flow_statistics["matched_packets"]
+        flowspec.matched_bytes = flow_statistics["matched_bytes"]
+        flowspec.transmitted_packets = flow_statistics["passed_packets"]
+        flowspec.transmitted_bytes = flow_statistics["passed_bytes"]
+        flowspec.dropped_packets = flow_statistics["dropped_packets"]
+        flowspec.dropped_bytes = flow_statistics["dropped_bytes"]
 
         logger.debug("Parsed FlowSpec: %s", flowspec)
 
-        flowspecs.append(flowspec)
-
     return flowspecs
@@ -1,10 +1,10 @@
 import logging
 import re
-from typing import NotRequired, TypedDict, Unpack
+from typing import TYPE_CHECKING, Any, BinaryIO, Literal, NotRequired, TypedDict, Unpack
 
-from asyncssh import SSHClientConnection
 from netaddr import IPNetwork
 
+from flowspec_exporter.cache import ParseCache, parse_rule
 from flowspec_exporter.flowspec import (
     Action,
     BitmaskOp,
@@ -17,13 +17,31 @@ from flowspec_exporter.flowspec import (
     NumericValues,
 )
 
+if TYPE_CHECKING:
+    from asyncssh import SSHClientConnection, SSHReader
+
 logger = logging.getLogger(__name__)
 
 
 DEFAULT_FILTER_NAME = "__flowspec_default_inet__"
 
+DEFAULT_OUTPUT_FORMAT = "text"
+
 COMMAND_SHOW_FIREWALL_FILTER = "show firewall filter {filter_name}"
 
+COMMAND_SHOW_FIREWALL_FILTER_JSON = (
+    "show firewall filter {filter_name} | display json | no-more"
+)
+
+JSON_COUNTER_PREFIX_SUFFIXES = (".counter.item", ".policer.item")
+
+JSON_COUNTER_FIELDS = {
+    "counter-name": "raw",
+    "policer-name": "raw",
+    "byte-count": "bytes",
+    "packet-count": "packets",
+}
+
 RE_FIND_COUNTERS_AND_POLICERS = re.compile(
     r"^(?P<raw>[^\s]+)\s+(?P<bytes>\d+)\s+(?P<packets>\d+)$", re.MULTILINE
 )
@@ -52,7 +70,8 @@ def _parse_prefix(value: str) -> IPNetwork | None:
 
 
 def _parse_numeric_values(value: str) -> NumericValues:
-    values, set_and = NumericValues(), False
+    values: list[tuple[NumericOp, int]] = []
+    set_and = False
 
     for i in RE_FIND_NUMERIC_VALUES.finditer(value):
         numeric_op: NumericOp
@@ -75,11 +94,12 @@ def _parse_numeric_values(value: str) -> NumericValues:
 
         set_and = i.group("and_or") == "&"
 
-    return values
+    return NumericValues(*values)
 
 
 def _parse_bitmask_values(value: str) -> BitmaskValues:
-    values, set_and = BitmaskValues(), False
+    values: list[tuple[BitmaskOp, int]] = []
+    set_and = False
 
     for i in RE_FIND_BITMASK_VALUES.finditer(value):
         not_ = i.group("not") is not None
@@ -92,119 +112,214 @@ def _parse_bitmask_values(value: str) -> BitmaskValues:
 
         set_and = i.group("and_or") == "&"
 
-    return values
+    return BitmaskValues(*values)
+
+
+def _parse_rule(raw: str) -> FlowSpec | None:
+    flowspec = FlowSpec(raw=raw)
+
+    match = RE_FIND_RATE_LIMIT_DST_SRC.match(raw)
+    if not match:
+        logger.error("Failed to parse rate limit, dst, src from: %s", raw)
+        return None
+
+    flowspec.destination_prefix = _parse_prefix(match.group("dst"))
+    flowspec.source_prefix = _parse_prefix(match.group("src"))
+
+    rate_limit, rate_limit_factor = (
+        match.group("rate_limit"),
+        match.group("rate_limit_factor"),
+    )
+    if rate_limit and rate_limit_factor:
+        rate_limit: str
+        rate_limit_factor: str
+
+        flowspec.action = Action.RATE_LIMIT
+
+        match rate_limit_factor:
+            case "K":
+                factor = 1_000
+            case "M":
+                factor = 1_000_000
+            case "G":
+                factor = 1_000_000_000
+            case _:
+                logger.error("Invalid rate limit factor: %s", rate_limit_factor)
+                return None
+
+        flowspec.rate_limit_bps = int(rate_limit) * factor
+
+    for key, value in RE_FIND_COMPONENTS.findall(raw):
+        key: str
+        value: str
+
+        key, value = key, value.strip(",")  # Remove trailing comma from value
+
+        match key:
+            case "proto":
+                flowspec.ip_protocol = _parse_numeric_values(value)
+            case "port":
+                flowspec.port = _parse_numeric_values(value)
+            case "dstport":
+                flowspec.destination_port = _parse_numeric_values(value)
+            case "srcport":
+                flowspec.source_port = _parse_numeric_values(value)
+            case "icmp-type":
+                flowspec.icmp_type = _parse_numeric_values(value)
+            case "icmp-code":
+                flowspec.icmp_code = _parse_numeric_values(value)
+            case "tcp-flag":
+                flowspec.tcp_flags = _parse_bitmask_values(value)
+            case "len":
+                flowspec.packet_length = _parse_numeric_values(value)
+            case "dscp":
+                flowspec.dscp = _parse_numeric_values(value)
+            case "frag":
+                flowspec.fragment = _parse_bitmask_values(value)
+
+    return flowspec
+
+
+def _parse_counter(
+    raw: str, bytes: str, packets: str, cache: ParseCache | None
+) -> FlowSpec | None:
+    logger.debug("Parsing flowspec: %s, bytes: %s, packets: %s", raw, bytes, packets)
+
+    flowspec = parse_rule(raw, _parse_rule, cache)
+    if flowspec is None:
+        return None
+
+    flowspec.matched_bytes = int(bytes)
+    flowspec.matched_packets = int(packets)
+
+    if flowspec.action == Action.RATE_LIMIT:
+        flowspec.dropped_bytes = flowspec.matched_bytes
+        flowspec.dropped_packets = flowspec.matched_packets
+
+    return flowspec
+
+
+def _merge_counter(flowspecs: dict[str, FlowSpec], flowspec: FlowSpec) -> None:
+    # Juniper returns counters and policers, the rate limit is the policer.
+    # If the policer is present, the corresponding counter is the transmitted one (accept traffic)
+
+    flowspec_key = flowspec.filter or flowspec.str_filter()
+
+    if flowspec_item := flowspecs.get(flowspec_key):
+        if flowspec.action == Action.RATE_LIMIT:
+            flowspec.transmitted_bytes = flowspec_item.matched_bytes
+            flowspec.transmitted_packets = flowspec_item.matched_packets
 
+            flowspec.matched_bytes += flowspec.transmitted_bytes  # type: ignore
+            flowspec.matched_packets += flowspec.transmitted_packets  # type: ignore
 
-def parse_flows(output: str) -> list[FlowSpec]:
-    flowspecs: list[FlowSpec] = []
+    flowspecs[flowspec_key] = flowspec
+
+
+def parse_flows(output: str, cache: ParseCache | None = None) -> list[FlowSpec]:
+    flowspecs: dict[str, FlowSpec] = {}
 
     for raw, bytes, packets in RE_FIND_COUNTERS_AND_POLICERS.findall(output):
-        logger.debug(
-            "Parsing flowspec: %s, bytes: %s, packets: %s", raw, bytes, packets
+        if (flowspec := _parse_counter(raw, bytes, packets, cache)) is not None:
+            _merge_counter(flowspecs, flowspec)
+
+    return list(flowspecs.values())
+
+
+def _decode_json_event(
+    counter: dict[str, str], prefix: str, event: str, value: Any
+) -> tuple[str, str, str] | None:
+    # Every value in the JSON output is wrapped as `"byte-count": [{"data": "0"}]`,
+    # so the field name is the third to last part of the prefix.
+
+    if event == "end_map" and prefix.endswith(JSON_COUNTER_PREFIX_SUFFIXES):
+        raw, byte_count, packet_count = (
+            counter.get("raw"),
+            counter.get("bytes"),
+            counter.get("packets"),
         )
+        counter.clear()
 
-        flowspec = FlowSpec()
+        if raw is None or byte_count is None or packet_count is None:
+            logger.error("Incomplete counter: %s", raw)
+            return None
 
-        flowspec.raw = raw
+        return raw, byte_count, packet_count
 
-        flowspec.matched_bytes = int(bytes)
-        flowspec.matched_packets = int(packets)
+    if event in ("string", "number"):
+        parts = prefix.rsplit(".", 3)
 
-        match = RE_FIND_RATE_LIMIT_DST_SRC.match(raw)
-        if not match:
-            logger.error("Failed to parse rate limit, dst, src from: %s", raw)
-            continue
+        if (
+            len(parts) == 4
+            and parts[2:] == ["item", "data"]
+            and parts[1] in JSON_COUNTER_FIELDS
+        ):
+            counter[JSON_COUNTER_FIELDS[parts[1]]] = str(value)
 
-        flowspec.destination_prefix = _parse_prefix(match.group("dst"))
-        flowspec.source_prefix = _parse_prefix(match.group("src"))
+    return None
 
-        rate_limit, rate_limit_factor = (
-            match.group("rate_limit"),
-            match.group("rate_limit_factor"),
-        )
-        if rate_limit and rate_limit_factor:
-            rate_limit: str
-            rate_limit_factor: str
-
-            flowspec.action = Action.RATE_LIMIT
-
-            match rate_limit_factor:
-                case "K":
-                    factor = 1_000
-                case "M":
-                    factor = 1_000_000
-                case "G":
-                    factor = 1_000_000_000
-                case _:
-                    logger.error("Invalid rate limit factor: %s", rate_limit_factor)
-                    continue
-
-            flowspec.rate_limit_bps = int(rate_limit) * factor
-
-            flowspec.dropped_bytes = flowspec.matched_bytes
-            flowspec.dropped_packets = flowspec.matched_packets
-
-        for key, value in RE_FIND_COMPONENTS.findall(raw):
-            key: str
-            value: str
-
-            key, value = key, value.strip(",")  # Remove trailing comma from value
-
-            match key:
-                case "proto":
-                    flowspec.ip_protocol = _parse_numeric_values(value)
-                case "port":
-                    flowspec.port = _parse_numeric_values(value)
-                case "dstport":
-                    flowspec.destination_port = _parse_numeric_values(value)
-                case "srcport":
-                    flowspec.source_port = _parse_numeric_values(value)
-                case "icmp-type":
-                    flowspec.icmp_type = _parse_numeric_values(value)
-                case "icmp-code":
-                    flowspec.icmp_code = _parse_numeric_values(value)
-                case "tcp-flag":
-                    flowspec.tcp_flags = _parse_bitmask_values(value)
-                case "len":
-                    flowspec.packet_length = _parse_numeric_values(value)
-                case "dscp":
-                    flowspec.dscp = _parse_numeric_values(value)
-                case "frag":
-                    flowspec.fragment = _parse_bitmask_values(value)
-
-        flowspecs.append(flowspec)
 
-    # Juniper returns counters and policers, the rate limit is the policer.
-    # If the policer is present, the corresponding counter is the transmitted one (accept traffic)
+def parse_flows_json(
+    output: bytes | str | BinaryIO, cache: ParseCache | None = None
+) -> list[FlowSpec]:
+    import ijson
 
-    flowspecs_dict: dict[str, FlowSpec] = {}
+    flowspecs: dict[str, FlowSpec] = {}
+    counter: dict[str, str] = {}
 
-    for flow_spec in flowspecs:
-        flow_spec_key = flow_spec.str_filter()
+    for prefix, event, value in ijson.parse(output):
+        entry = _decode_json_event(counter, prefix, event, value)
+        if entry is None:
+            continue
+
+        if (flowspec := _parse_counter(*entry, cache)) is not None:
+            _merge_counter(flowspecs, flowspec)
+
+    return list(flowspecs.values())
 
-        if flow_spec_item := flowspecs_dict.get(flow_spec_key):
-            if flow_spec.action == Action.RATE_LIMIT:
-                flow_spec.transmitted_bytes = flow_spec_item.matched_bytes
-                flow_spec.transmitted_packets = flow_spec_item.matched_packets
 
-                flow_spec.matched_bytes += flow_spec.transmitted_bytes  # type: ignore
-                flow_spec.matched_packets += flow_spec.transmitted_packets  # type: ignore
+async def _parse_flows_json_async(
+    stdout: "SSHReader[bytes]", cache: ParseCache | None = None
+) -> list[FlowSpec]:
+    import ijson
+
+    flowspecs: dict[str, FlowSpec] = {}
+    counter: dict[str, str] = {}
 
-        flowspecs_dict[flow_spec_key] = flow_spec
+    async for prefix, event, value in ijson.parse_async(stdout):
+        entry = _decode_json_event(counter, prefix, event, value)
+        if entry is None:
+            continue
 
-    return list(flowspecs_dict.values())
+        if (flowspec := _parse_counter(*entry, cache)) is not None:
+            _merge_counter(flowspecs, flowspec)
+
+    return list(flowspecs.values())
 
 
 class FlowSpecJuniperJunosKwargs(TypedDict):
     filter_name: NotRequired[str]
+    output_format: NotRequired[Literal["text", "json"]]
 
 
 async def parse_flow_spec_juniper_junos(
-    connection: SSHClientConnection,
+    connection: "SSHClientConnection",
+    cache: ParseCache | None = None,
     **kwargs: Unpack[FlowSpecJuniperJunosKwargs],
 ) -> list[FlowSpec]:
     filter_name = kwargs.get("filter_name", DEFAULT_FILTER_NAME)
 
+    if kwargs.get("output_format", DEFAULT_OUTPUT_FORMAT) == "json":
+        command = COMMAND_SHOW_FIREWALL_FILTER_JSON.format(filter_name=filter_name)
+
+        logger.info("Sending command", extra={"command": command})
+        async with connection.create_process(command, encoding=None) as process:
+            flowspecs = await _parse_flows_json_async(process.stdout, cache)
+
+            await process.wait(check=True)
+
+        return flowspecs
+
     command = COMMAND_SHOW_FIREWALL_FILTER.format(filter_name=filter_name)
 
     logger.info("Sending command", extra={"command": command})
@@ -213,4 +328,4 @@ async def parse_flow_spec_juniper_junos(
     output = str(result.stdout)
     logger.info("Command output", extra={"output": output})
 
-    return parse_flows(output)
+    return parse_flows(output, cache)
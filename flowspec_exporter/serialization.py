@@ -0,0 +1,213 @@
+from typing import Iterable
+
+from netaddr import IPNetwork
+
+from flowspec_exporter.flowspec import (
+    Action,
+    BitmaskValues,
+    FlowSpec,
+    NumericValues,
+)
+
+MAGIC = b"FSB\x01"
+
+ACTIONS = list(Action)
+
+# Optional fields, in the order of their bit in the presence mask.
+PREFIX_FIELDS = ("destination_prefix", "source_prefix")
+
+NUMERIC_FIELDS = (
+    "ip_protocol",
+    "port",
+    "destination_port",
+    "source_port",
+    "icmp_type",
+    "icmp_code",
+    "packet_length",
+    "dscp",
+)
+
+BITMASK_FIELDS = ("tcp_flags", "fragment")
+
+INT_FIELDS = (
+    "rate_limit_bps",
+    "matched_packets",
+    "matched_bytes",
+    "transmitted_packets",
+    "transmitted_bytes",
+    "dropped_packets",
+    "dropped_bytes",
+)
+
+FIELDS = (
+    *PREFIX_FIELDS,
+    *NUMERIC_FIELDS,
+    *BITMASK_FIELDS,
+    "action",
+    *INT_FIELDS,
+    "filter",
+)
+
+
+def _write_varint(buf: bytearray, n: int) -> None:
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _read_varint(data: memoryview, offset: int) -> tuple[int, int]:
+    n = shift = 0
+
+    while True:
+        byte = data[offset]
+        offset += 1
+
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, offset
+
+        shift += 7
+
+
+def _write_bytes(buf: bytearray, value: bytes) -> None:
+    _write_varint(buf, len(value))
+    buf.extend(value)
+
+
+def _read_bytes(data: memoryview, offset: int) -> tuple[memoryview, int]:
+    size, offset = _read_varint(data, offset)
+
+    if offset + size > len(data):
+        raise ValueError("Truncated field")
+
+    return data[offset : offset + size], offset + size
+
+
+def _encode_flowspec(buf: bytearray, flow: FlowSpec) -> None:
+    presence = 0
+    for i, name in enumerate(FIELDS):
+        if getattr(flow, name) is not None:
+            presence |= 1 << i
+
+    _write_bytes(buf, flow.raw.encode())
+    _write_varint(buf, presence)
+
+    for name in PREFIX_FIELDS:
+        if (prefix := getattr(flow, name)) is not None:
+            buf.append(prefix.version)
+            buf.append(prefix.prefixlen)
+            buf.extend(prefix.ip.packed)
+
+    for name in NUMERIC_FIELDS + BITMASK_FIELDS:
+        if (values := getattr(flow, name)) is not None:
+            _write_bytes(buf, bytes(values))
+
+    if flow.action is not None:
+        buf.append(ACTIONS.index(flow.action))
+
+    for name in INT_FIELDS:
+        if (value := getattr(flow, name)) is not None:
+            # zigzag, Juniper reports negative rate limits on overflow
+            _write_varint(buf, value << 1 if value >= 0 else (-value << 1) - 1)
+
+    if flow.filter is not None:
+        _write_bytes(buf, flow.filter.encode())
+
+    _write_varint(buf, len(flow.metadata))
+    for key, value in flow.metadata.items():
+        _write_bytes(buf, key.encode())
+        _write_bytes(buf, value.encode())
+
+
+def _decode_flowspec(data: memoryview, offset: int) -> tuple[FlowSpec, int]:
+    raw, offset = _read_bytes(data, offset)
+    presence, offset = _read_varint(data, offset)
+
+    flow = FlowSpec(raw=str(raw, "utf-8"))
+
+    bit = 1
+
+    for name in PREFIX_FIELDS:
+        if presence & bit:
+            version, prefixlen = data[offset], data[offset + 1]
+            size = 4 if version == 4 else 16
+
+            ip = int.from_bytes(data[offset + 2 : offset + 2 + size])
+            setattr(flow, name, IPNetwork((ip, prefixlen), version=version))
+
+            offset += 2 + size
+        bit <<= 1
+
+    for name in NUMERIC_FIELDS:
+        if presence & bit:
+            values, offset = _read_bytes(data, offset)
+            setattr(
+                flow,
+                name,
+                NumericValues.from_bytes(values) if values else NumericValues(),
+            )
+        bit <<= 1
+
+    for name in BITMASK_FIELDS:
+        if presence & bit:
+            values, offset = _read_bytes(data, offset)
+            setattr(
+                flow,
+                name,
+                BitmaskValues.from_bytes(values) if values else BitmaskValues(),
+            )
+        bit <<= 1
+
+    if presence & bit:
+        flow.action = ACTIONS[data[offset]]
+        offset += 1
+    bit <<= 1
+
+    for name in INT_FIELDS:
+        if presence & bit:
+            value, offset = _read_varint(data, offset)
+            setattr(flow, name, value >> 1 if not value & 1 else -((value + 1) >> 1))
+        bit <<= 1
+
+    if presence & bit:
+        filter, offset = _read_bytes(data, offset)
+        flow.filter = str(filter, "utf-8")
+
+    count, offset = _read_varint(data, offset)
+    for _ in range(count):
+        key, offset = _read_bytes(data, offset)
+        value, offset = _read_bytes(data, offset)
+        flow.metadata[str(key, "utf-8")] = str(value, "utf-8")
+
+    return flow, offset
+
+
+def dumps(flows: Iterable[FlowSpec]) -> bytes:
+    """Encode flows in a compact binary form, decoded back with `loads()`."""
+
+    buf = bytearray(MAGIC)
+
+    for flow in flows:
+        _encode_flowspec(buf, flow)
+
+    return bytes(buf)
+
+
+def loads(data: bytes | bytearray | memoryview) -> list[FlowSpec]:
+    view = memoryview(data)
+
+    if view[: len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary FlowSpec stream")
+
+    flows: list[FlowSpec] = []
+    offset = len(MAGIC)
+
+    try:
+        while offset < len(view):
+            flow, offset = _decode_flowspec(view, offset)
+            flows.append(flow)
+    except IndexError:
+        raise ValueError("Truncated binary FlowSpec stream")
+
+    return flows
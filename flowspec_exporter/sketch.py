@@ -0,0 +1,132 @@
+import heapq
+import itertools
+import math
+import time
+from typing import Callable, Hashable, NamedTuple
+
+DEFAULT_CAPACITY = 1000
+
+DEFAULT_HALF_LIFE = 60.0
+
+# Largest exponent of the weights before the counts are scaled back, well
+# below the float overflow at ~709.
+MAX_EXPONENT = 300.0
+
+
+class HeavyHitter[K](NamedTuple):
+    key: K
+    # Decayed sum per second, an overestimate by at most `error`.
+    rate: float
+    error: float
+
+
+class HeavyHitters[K: Hashable]:
+    """Top keys by exponentially decayed sum, in bounded memory.
+
+    Space-Saving over at most `capacity` keys: a new key replaces the one with
+    the lowest count and inherits it as its error, so every key with a share
+    of the total above 1/capacity is kept. The sums decay with `half_life`,
+    divided by the mean life they are rates per second.
+
+    The decay is applied forward, the values are weighted by their time
+    rather than the counts decayed over time, so an update only touches its
+    own key. A heap with stale entries skipped on eviction finds the lowest
+    count.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        half_life: float = DEFAULT_HALF_LIFE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.half_life = half_life
+        self.clock = clock
+
+        self._decay = math.log(2) / half_life
+        self._landmark = clock()
+
+        self._counts: dict[K, float] = {}
+        self._errors: dict[K, float] = {}
+
+        self._heap: list[tuple[float, int, K]] = []
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def _rescale(self, now: float) -> None:
+        factor = math.exp(-self._decay * (now - self._landmark))
+
+        self._landmark = now
+
+        for key in self._counts:
+            self._counts[key] *= factor
+            self._errors[key] *= factor
+
+        self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [
+            (count, next(self._sequence), key) for key, count in self._counts.items()
+        ]
+        heapq.heapify(self._heap)
+
+    def _push(self, key: K, count: float) -> None:
+        self._counts[key] = count
+
+        heapq.heappush(self._heap, (count, next(self._sequence), key))
+
+        if len(self._heap) > 4 * self.capacity + 16:
+            self._rebuild_heap()
+
+    def add(self, key: K, value: float, now: float | None = None) -> None:
+        if value <= 0:
+            return
+
+        if now is None:
+            now = self.clock()
+
+        if self._decay * (now - self._landmark) > MAX_EXPONENT:
+            self._rescale(now)
+
+        weight = value * math.exp(self._decay * (now - self._landmark))
+
+        if (count := self._counts.get(key)) is not None:
+            self._push(key, count + weight)
+        elif len(self._counts) < self.capacity:
+            self._errors[key] = 0.0
+            self._push(key, weight)
+        else:
+            while True:
+                count, _, evicted = heapq.heappop(self._heap)
+
+                if self._counts.get(evicted) == count:
+                    break
+
+            del self._counts[evicted]
+            del self._errors[evicted]
+
+            self._errors[key] = count
+            self._push(key, count + weight)
+
+    def top(self, n: int, now: float | None = None) -> list[HeavyHitter[K]]:
+        if now is None:
+            now = self.clock()
+
+        # Back to the decayed sums at `now`, then to rates.
+        scale = self._decay * math.exp(-self._decay * (now - self._landmark))
+
+        return [
+            HeavyHitter(key, count * scale, self._errors[key] * scale)
+            for key, count in heapq.nlargest(
+                n, self._counts.items(), key=lambda item: item[1]
+            )
+        ]
+
+
+__all__ = [
+    "HeavyHitter",
+    "HeavyHitters",
+]
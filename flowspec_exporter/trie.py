@@ -0,0 +1,123 @@
+from typing import Iterator
+
+from netaddr import IPNetwork
+
+_WIDTHS = {4: 32, 6: 128}
+
+
+class _Node[T]:
+    __slots__ = ("children", "prefix", "values")
+
+    def __init__(self) -> None:
+        self.children: list[_Node[T] | None] = [None, None]
+        self.prefix: IPNetwork | None = None
+        self.values: set[T] = set()
+
+
+def _bits(prefix: IPNetwork) -> Iterator[int]:
+    width = _WIDTHS[prefix.version]
+    network = int(prefix.network)
+
+    for i in range(prefix.prefixlen):
+        yield (network >> (width - 1 - i)) & 1
+
+
+class PrefixTrie[T]:
+    """Binary trie of IPv4 and IPv6 prefixes, each holding a set of values.
+
+    A lookup walks at most one node per bit of the prefix, so finding the
+    prefixes covering an address doesn't depend on the number of prefixes.
+    Nodes left without values are pruned on `discard`.
+    """
+
+    def __init__(self) -> None:
+        self._roots: dict[int, _Node[T]] = {4: _Node(), 6: _Node()}
+
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, prefix: IPNetwork, value: T) -> None:
+        node = self._roots[prefix.version]
+
+        for bit in _bits(prefix):
+            if (child := node.children[bit]) is None:
+                child = node.children[bit] = _Node()
+
+            node = child
+
+        if value not in node.values:
+            node.prefix = prefix.cidr
+            node.values.add(value)
+
+            self._size += 1
+
+    def discard(self, prefix: IPNetwork, value: T) -> None:
+        path: list[tuple[_Node[T], int]] = []
+
+        node = self._roots[prefix.version]
+
+        for bit in _bits(prefix):
+            if (child := node.children[bit]) is None:
+                return
+
+            path.append((node, bit))
+            node = child
+
+        if value not in node.values:
+            return
+
+        node.values.remove(value)
+
+        self._size -= 1
+
+        # Drop the branch up to the first node still in use.
+        while path and not node.values and node.children == [None, None]:
+            node, bit = path.pop()
+            node.children[bit] = None
+
+    def covering(self, prefix: IPNetwork) -> Iterator[tuple[IPNetwork, T]]:
+        """Values of the prefixes containing `prefix`, including itself."""
+
+        node: _Node[T] | None = self._roots[prefix.version]
+        bits = _bits(prefix)
+
+        while node is not None:
+            for value in node.values:
+                yield node.prefix, value  # type: ignore
+
+            if (bit := next(bits, None)) is None:
+                return
+
+            node = node.children[bit]
+
+    def covered(self, prefix: IPNetwork) -> Iterator[tuple[IPNetwork, T]]:
+        """Values of the prefixes contained in `prefix`, excluding itself."""
+
+        node: _Node[T] | None = self._roots[prefix.version]
+
+        for bit in _bits(prefix):
+            if (node := node.children[bit]) is None:  # type: ignore
+                return
+
+        stack = [child for child in node.children if child is not None]  # type: ignore
+
+        while stack:
+            node = stack.pop()
+
+            for value in node.values:
+                yield node.prefix, value  # type: ignore
+
+            stack.extend(child for child in node.children if child is not None)
+
+    def overlapping(self, prefix: IPNetwork) -> Iterator[tuple[IPNetwork, T]]:
+        """Values of the prefixes containing or contained in `prefix`."""
+
+        yield from self.covering(prefix)
+        yield from self.covered(prefix)
+
+
+__all__ = [
+    "PrefixTrie",
+]
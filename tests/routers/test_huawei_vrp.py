@@ -0,0 +1,115 @@
+import asyncio
+
+from flowspec_exporter.routers.huawei_vrp import (
+    _collect_flow_statistics,
+    _echoed_re_index,
+    _statistics_re_index,
+)
+
+PROMPT = "<HUAWEI>"
+
+
+def _echo(re_index: int) -> str:
+    return f"display flowspec vpnv4 vpn-instance blue statistics {re_index} | no-more\n"
+
+
+def _statistics(re_index: int, packets: int) -> str:
+    return (
+        f" ReIndex: {re_index}\n"
+        " Dissemination Rules:\n"
+        "   Destination IP : 192.0.2.0/24\n"
+        "\n"
+        " Item          Packets          Bytes        Pps        Bps\n"
+        f" Matched  {packets:>14} {packets * 100:>14}          0          0\n"
+        f" Passed   {0:>14} {0:>14}          0          0\n"
+        f" Dropped  {packets:>14} {packets * 100:>14}          0          0\n"
+    )
+
+
+class FakeReader:
+    def __init__(self, chunks: list[str]) -> None:
+        self.chunks = chunks
+
+    async def readuntil(self, separator) -> str:
+        return self.chunks.pop(0)
+
+
+class FakeWriter:
+    def __init__(self) -> None:
+        self.written: list[str] = []
+
+    def write(self, data: str) -> None:
+        self.written.append(data)
+
+
+def test_echoed_re_index():
+    assert _echoed_re_index(_echo(7) + _statistics(7, 1)) == "7"
+
+
+def test_echoed_re_index_of_several_echoes():
+    # The pending commands echoed together, the statistics answer the last.
+    output = _echo(2) + _echo(3) + _statistics(3, 1) + _echo(4)
+
+    assert _echoed_re_index(output) == "3"
+
+
+def test_echoed_re_index_without_echo():
+    assert _echoed_re_index(_statistics(7, 1)) is None
+
+
+def test_collect_flow_statistics_with_several_echoes():
+    writer = FakeWriter()
+    reader = FakeReader(
+        [
+            _echo(1) + _statistics(1, 10) + PROMPT,
+            _echo(2) + _echo(3) + _statistics(3, 30) + PROMPT,
+            _echo(2) + _statistics(2, 20) + PROMPT,
+        ]
+    )
+
+    statistics = asyncio.run(
+        _collect_flow_statistics(
+            writer, reader, vpn_instance="blue", re_indexes=["1", "2", "3"], window=2
+        )
+    )
+
+    assert writer.written == [_echo(1), _echo(2), _echo(3)]
+    assert {
+        re_index: flow_statistics["matched_packets"]
+        for re_index, flow_statistics in statistics.items()
+    } == {"1": 10, "2": 20, "3": 30}
+    assert statistics["3"]["dropped_bytes"] == 3000
+
+
+def test_statistics_re_index_from_the_output():
+    output = _echo(2) + _statistics(3, 1)
+
+    assert _statistics_re_index(output) == "3"
+
+
+def test_statistics_re_index_falls_back_to_the_echo():
+    output = _echo(2) + " Item  Packets  Bytes  Pps  Bps\n Matched  1  100  0  0\n"
+
+    assert _statistics_re_index(output) == "2"
+
+
+def test_collect_flow_statistics_with_late_echoes():
+    # Every echo comes after the output of its command.
+    writer = FakeWriter()
+    reader = FakeReader(
+        [
+            _statistics(2, 20) + _echo(1) + PROMPT,
+            _statistics(1, 10) + _echo(2) + PROMPT,
+        ]
+    )
+
+    statistics = asyncio.run(
+        _collect_flow_statistics(
+            writer, reader, vpn_instance="blue", re_indexes=["1", "2"], window=2
+        )
+    )
+
+    assert {
+        re_index: flow_statistics["matched_packets"]
+        for re_index, flow_statistics in statistics.items()
+    } == {"1": 10, "2": 20}
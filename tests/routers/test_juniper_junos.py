@@ -0,0 +1,55 @@
+from flowspec_exporter.cache import ParseCache
+from flowspec_exporter.flowspec import Action
+from flowspec_exporter.routers.juniper_junos import parse_flows, parse_flows_json
+from tests.routers import DIR
+
+# `show firewall filter __flowspec_default_inet__` of the same rules, as text
+# and with `| display json`.
+TEXT_OUTPUT = DIR / "juniper_junos_show_firewall_filter.txt"
+
+JSON_OUTPUT = DIR / "juniper_junos_show_firewall_filter.json"
+
+
+def _flows(flows) -> dict:
+    return {flow.str_filter(): flow.to_dict() for flow in flows}
+
+
+def test_parse_flows():
+    flows = {flow.raw: flow for flow in parse_flows(TEXT_OUTPUT.read_text())}
+
+    assert len(flows) == 4
+
+    flow = flows["192.0.2.1,*,proto=17,dstport=53"]
+    assert flow.str_filter() == (
+        "destination-prefix: 192.0.2.1/32, ip-protocol: =17, destination-port: =53"
+    )
+    assert (flow.action, flow.matched_bytes, flow.matched_packets) == (None, 1000, 10)
+
+    # The policer, with the counter as the transmitted traffic.
+    flow = flows["10000K_198.51.100.0/24,*,proto=6,dstport>=80&<=90,=443"]
+    assert str(flow.destination_port) == ">=80&<=90 =443"
+    assert (flow.action, flow.rate_limit_bps) == (Action.RATE_LIMIT, 10_000_000)
+    assert (flow.matched_bytes, flow.transmitted_bytes, flow.dropped_bytes) == (
+        25000,
+        5000,
+        20000,
+    )
+
+
+def test_parse_flows_json_matches_the_text():
+    text = parse_flows(TEXT_OUTPUT.read_text())
+
+    assert _flows(parse_flows_json(JSON_OUTPUT.read_bytes())) == _flows(text)
+
+    with JSON_OUTPUT.open("rb") as fp:
+        assert _flows(parse_flows_json(fp)) == _flows(text)
+
+
+def test_parse_flows_json_with_cache():
+    cache = ParseCache()
+
+    first = parse_flows_json(JSON_OUTPUT.read_bytes(), cache)
+    second = parse_flows_json(JSON_OUTPUT.read_bytes(), cache)
+
+    assert _flows(first) == _flows(second)
+    assert cache.hits == 6
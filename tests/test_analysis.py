@@ -0,0 +1,315 @@
+import itertools
+import random
+
+import pytest
+from netaddr import IPAddress, IPNetwork
+
+from flowspec_exporter.analysis import analyze
+from flowspec_exporter.exporter import _analyze
+from flowspec_exporter.flowspec import (
+    FlowSpec,
+    NumericOp,
+    NumericOpEq,
+    NumericOpGte,
+    NumericOpLte,
+    NumericValues,
+)
+
+PREFIXES = [
+    None,
+    "192.0.2.0/24",
+    "192.0.2.0/25",
+    "192.0.2.128/25",
+    "192.0.2.0/26",
+    "192.0.2.1/32",
+    "198.51.100.0/24",
+    "2001:db8::/32",
+    "2001:db8::1/128",
+]
+
+# One address in each part of the address space the prefixes split it in, a
+# rule matches all of a part or none of it.
+ADDRESSES = [
+    IPAddress(address)
+    for address in (
+        "192.0.2.1",
+        "192.0.2.2",
+        "192.0.2.64",
+        "192.0.2.200",
+        "198.51.100.1",
+        "203.0.113.1",
+        "2001:db8::1",
+        "2001:db8::2",
+        "2001:db9::1",
+    )
+]
+
+PROTOCOLS = [None, 1, 6, 17]
+
+PORTS = [
+    None,
+    NumericValues((NumericOpEq, 80)),
+    NumericValues((NumericOpEq, 443)),
+    # The ranges touch at 90.
+    NumericValues((NumericOpGte, 80), (NumericOpLte.set_and(True), 90)),
+    NumericValues((NumericOpGte, 90), (NumericOpLte.set_and(True), 443)),
+    NumericValues((NumericOp(gt=True), 90)),
+    NumericValues((NumericOpLte, 90), (NumericOpEq, 443)),
+    # Sorts before the narrower ranges, which it can shadow.
+    NumericValues((NumericOpGte, 0), (NumericOpLte.set_and(True), 1024)),
+    # Matches nothing.
+    NumericValues((NumericOpGte, 443), (NumericOpLte.set_and(True), 80)),
+]
+
+# Like the addresses, a value in each part the operands split the ports in.
+PORT_VALUES = [0, 79, 80, 85, 90, 91, 200, 443, 444, 1024, 1025]
+
+
+def _matches(values: NumericValues | None, value: int) -> bool:
+    if values is None:
+        return True
+
+    groups: list[bool] = []
+
+    for op, operand in values:
+        term = (
+            (op.lt and value < operand)
+            or (op.gt and value > operand)
+            or (op.eq and value == operand)
+        )
+
+        if op.and_ and groups:
+            groups[-1] = groups[-1] and term
+        else:
+            groups.append(term)
+
+    return any(groups)
+
+
+def _packets(flow: FlowSpec) -> frozenset[tuple]:
+    """Every packet of the universe the rule matches, one by one."""
+
+    packets = set()
+
+    for address, protocol, destination_port, source_port in itertools.product(
+        ADDRESSES, (1, 6, 17, 58), PORT_VALUES, PORT_VALUES
+    ):
+        if flow.destination_prefix is not None and (
+            address.version != flow.destination_prefix.version
+            or address not in flow.destination_prefix
+        ):
+            continue
+
+        if flow.ip_protocol is not None and not _matches(flow.ip_protocol, protocol):
+            continue
+
+        if flow.destination_port is not None or flow.source_port is not None:
+            if protocol not in (6, 17):
+                continue
+            if not _matches(flow.destination_port, destination_port):
+                continue
+            if not _matches(flow.source_port, source_port):
+                continue
+
+        packets.add((address, protocol, destination_port, source_port))
+
+    return frozenset(packets)
+
+
+def _brute_force(
+    flows: list[FlowSpec],
+) -> tuple[set[tuple[str, str]], set[tuple[str, str]], set[frozenset[str]]]:
+    """Duplicates, shadowed and overlapping rules, comparing the packets of
+    every pair of rules."""
+
+    duplicates = set()
+    rules: list[tuple[str, frozenset]] = []
+    filters: set[str] = set()
+
+    for flow in sorted(flows, key=FlowSpec.sort_key):
+        filter = flow.str_filter()
+
+        if filter in filters:
+            duplicates.add((filter, filter))
+        else:
+            filters.add(filter)
+            rules.append((filter, _packets(flow)))
+
+    shadowed = set()
+    overlapping = set()
+
+    for i, (filter, packets) in enumerate(rules):
+        if not packets:
+            continue
+
+        for other, other_packets in rules[:i]:
+            if packets <= other_packets:
+                # By the first rule of higher precedence.
+                shadowed.add((filter, other))
+                break
+
+        for other, other_packets in rules[:i]:
+            if (
+                packets & other_packets
+                and not packets <= other_packets
+                and not other_packets <= packets
+            ):
+                overlapping.add(frozenset((filter, other)))
+
+    return duplicates, shadowed, overlapping
+
+
+def _flow(rnd: random.Random) -> FlowSpec:
+    prefix = rnd.choice(PREFIXES)
+
+    return FlowSpec(
+        destination_prefix=None if prefix is None else IPNetwork(prefix),
+        ip_protocol=(
+            None
+            if (protocol := rnd.choice(PROTOCOLS)) is None
+            else NumericValues((NumericOpEq, protocol))
+        ),
+        destination_port=rnd.choice(PORTS),
+        source_port=rnd.choice(PORTS[:3]),
+    )
+
+
+@pytest.mark.parametrize(
+    "seed, count",
+    # Above `INDEX_THRESHOLD` rules of a prefix, they're looked up in the
+    # interval indexes.
+    [(seed, 16) for seed in range(100)] + [(seed, 80) for seed in range(10)],
+)
+def test_analyze_matches_brute_force(seed, count):
+    rnd = random.Random(seed)
+
+    pool = [_flow(rnd) for _ in range(count * 3 // 4)]
+    # Some rules are there twice.
+    flows = [rnd.choice(pool) for _ in range(count)]
+
+    analysis = analyze(flows)
+
+    duplicates, shadowed, overlapping = _brute_force(flows)
+
+    assert {(a.str_filter(), b.str_filter()) for a, b in analysis.duplicates} == (
+        duplicates
+    )
+    assert {(a.str_filter(), b.str_filter()) for a, b in analysis.shadowed} == shadowed
+
+    pairs = [
+        frozenset((a.str_filter(), b.str_filter())) for a, b in analysis.overlapping
+    ]
+
+    # Each pair is reported once.
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == overlapping
+
+
+def _port_range(low: int, high: int) -> NumericValues:
+    return NumericValues((NumericOpGte, low), (NumericOpLte.set_and(True), high))
+
+
+def test_touching_port_ranges():
+    def flow(ports: NumericValues) -> FlowSpec:
+        return FlowSpec(
+            destination_prefix=IPNetwork("192.0.2.0/24"), destination_port=ports
+        )
+
+    low, high, apart = (
+        flow(_port_range(80, 90)),
+        flow(_port_range(90, 443)),
+        flow(_port_range(91, 443)),
+    )
+
+    analysis = analyze([low, high])
+    assert [(a.str_filter(), b.str_filter()) for a, b in analysis.overlapping] == [
+        (high.str_filter(), low.str_filter())
+    ]
+
+    analysis = analyze([low, apart])
+    assert analysis.overlapping == analysis.shadowed == []
+
+
+def test_shadowed_by_higher_precedence_only():
+    broad = FlowSpec(destination_prefix=IPNetwork("192.0.2.0/24"))
+    narrow = FlowSpec(
+        destination_prefix=IPNetwork("192.0.2.1/32"),
+        ip_protocol=NumericValues((NumericOpEq, 6)),
+        destination_port=NumericValues((NumericOpEq, 80)),
+    )
+    tcp = FlowSpec(
+        destination_prefix=IPNetwork("192.0.2.0/24"),
+        ip_protocol=NumericValues((NumericOpEq, 6)),
+    )
+    http = FlowSpec(
+        destination_prefix=IPNetwork("192.0.2.0/24"),
+        ip_protocol=NumericValues((NumericOpEq, 6)),
+        destination_port=NumericValues((NumericOpEq, 80)),
+    )
+
+    # The rules matching fewer packets all have a higher precedence than the
+    # rules containing them, whatever the order they're given in.
+    for flows in itertools.permutations([broad, narrow, tcp, http]):
+        analysis = analyze(flows)
+
+        assert analysis.shadowed == analysis.overlapping == []
+
+    # Same prefix and protocol, the wider port range sorts first and matches
+    # every packet of the other.
+    web = FlowSpec(
+        destination_prefix=IPNetwork("192.0.2.0/24"),
+        ip_protocol=NumericValues((NumericOpEq, 6)),
+        destination_port=_port_range(0, 1024),
+    )
+    ports = FlowSpec(
+        destination_prefix=IPNetwork("192.0.2.0/24"),
+        ip_protocol=NumericValues((NumericOpEq, 6)),
+        destination_port=_port_range(80, 90),
+    )
+
+    assert sorted([ports, web], key=FlowSpec.sort_key) == [web, ports]
+
+    for flows in ([ports, web], [web, ports]):
+        assert analyze(flows).shadowed == [(ports, web)]
+
+
+def test_other_address_family():
+    ipv4 = FlowSpec(destination_prefix=IPNetwork("0.0.0.0/0"))
+    ipv6 = FlowSpec(destination_prefix=IPNetwork("::/0"))
+
+    analysis = analyze([ipv4, ipv6])
+
+    assert analysis.duplicates == analysis.shadowed == analysis.overlapping == []
+
+
+@pytest.mark.parametrize(
+    "metadata, expected",
+    [
+        # Same prefix, different VRFs or address families.
+        ([{"vrf": "blue"}, {"vrf": "red"}], (0, 0, 0)),
+        ([{"afi": "ipv4"}, {"afi": "ipv6"}], (0, 0, 0)),
+        ([{"vrf": "blue"}, {"vrf": "blue"}], (1, 1, 0)),
+        ([{}, {}], (1, 1, 0)),
+    ],
+)
+def test_analyze_by_context(metadata, expected):
+    def flow(ports: NumericValues, metadata: dict[str, str]) -> FlowSpec:
+        return FlowSpec(
+            destination_prefix=IPNetwork("192.0.2.0/24"),
+            ip_protocol=NumericValues((NumericOpEq, 6)),
+            destination_port=ports,
+            metadata=metadata,
+        )
+
+    first, second = metadata
+
+    flows = [
+        flow(_port_range(0, 1024), first),
+        # Shadowed by the first rule in the same context only.
+        flow(_port_range(80, 90), second),
+        # Duplicate in the same context only.
+        flow(NumericValues((NumericOpEq, 2000)), first),
+        flow(NumericValues((NumericOpEq, 2000)), second),
+    ]
+
+    assert _analyze(flows) == expected
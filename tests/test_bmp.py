@@ -0,0 +1,200 @@
+import asyncio
+import struct
+from typing import Callable
+
+from benchmarks.bmp import router_messages, send
+from benchmarks.generators import (
+    BMP_PEER,
+    _flowspec,
+    bmp_peer_down,
+    bmp_route_monitoring,
+    generate_rules,
+)
+from flowspec_exporter.bmp import BMPServer
+from flowspec_exporter.flowspec import Action, FlowSpec
+
+# Route distinguisher 65000:1 of the VRF peer, it has the same address as the
+# peer of the global instance.
+DISTINGUISHER = struct.pack("!HHI", 0, 65000, 1)
+
+RULES = generate_rules(3)
+
+FILTERS = [_flowspec(rule).str_filter() for rule in RULES]
+
+
+async def _until(predicate: Callable[[], bool]) -> None:
+    async with asyncio.timeout(5):
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+
+def _table(server: BMPServer, router: str) -> set[tuple[str, str, str]]:
+    table = server.tables.get(router)
+
+    if table is None:
+        return set()
+
+    return {
+        (
+            flowspec.metadata["peer"],
+            flowspec.metadata.get("peer_distinguisher", ""),
+            flowspec.filter,
+        )
+        for flowspec in table.flows()
+    }
+
+
+def test_sessions():
+    changes: list[tuple[str, str, str, str]] = []
+
+    def on_change(event: str, flowspec: FlowSpec) -> None:
+        changes.append(
+            (
+                event,
+                flowspec.metadata["router"],
+                flowspec.metadata.get("peer_distinguisher", ""),
+                flowspec.filter,
+            )
+        )
+
+    async def run() -> None:
+        bmp_server = BMPServer(on_change)
+
+        server = await bmp_server.start("127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+
+        peer = str(BMP_PEER)
+
+        messages = router_messages(0, RULES) + b"".join(
+            [
+                bmp_route_monitoring(RULES[0], withdraw=True),
+                # The same peer address in a VRF doesn't replace the rules of
+                # the global peer, and only the VRF peer goes down.
+                bmp_route_monitoring(RULES[1], distinguisher=DISTINGUISHER),
+                bmp_route_monitoring(RULES[2], distinguisher=DISTINGUISHER),
+                bmp_peer_down(distinguisher=DISTINGUISHER),
+            ]
+        )
+
+        session = asyncio.create_task(send(host, port, messages, 1))
+
+        await _until(lambda: len(changes) == 8)
+
+        assert changes == [
+            *(("announce", "router-0", "", filter) for filter in FILTERS),
+            ("withdraw", "router-0", "", FILTERS[0]),
+            ("announce", "router-0", "65000:1", FILTERS[1]),
+            ("announce", "router-0", "65000:1", FILTERS[2]),
+            ("withdraw", "router-0", "65000:1", FILTERS[1]),
+            ("withdraw", "router-0", "65000:1", FILTERS[2]),
+        ]
+        assert _table(bmp_server, "router-0") == {
+            (peer, "", FILTERS[1]),
+            (peer, "", FILTERS[2]),
+        }
+
+        # The rules are scraped for their counters only.
+        scraped = _flowspec(RULES[1])
+        scraped.filter = FILTERS[1]
+        scraped.matched_bytes = 1000
+        scraped.metadata["vrf"] = "blue"
+
+        rules = {
+            (flowspec.filter, flowspec.matched_bytes, flowspec.metadata.get("vrf"))
+            for flowspec in bmp_server.rules("router-0", [scraped])
+        }
+        assert rules == {(FILTERS[1], 1000, "blue"), (FILTERS[2], None, None)}
+        assert bmp_server.rules("router-1", [scraped]) == [scraped]
+
+        # The session ending withdraws the rules left.
+        await session
+        await _until(lambda: not bmp_server.tables)
+
+        assert sorted(changes[8:]) == [
+            ("withdraw", "router-0", "", filter) for filter in sorted(FILTERS[1:])
+        ]
+        assert bmp_server.tables == {}
+
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(run())
+
+
+def test_replaced_session():
+    changes: list[tuple[str, str]] = []
+
+    def on_change(event: str, flowspec: FlowSpec) -> None:
+        changes.append((event, flowspec.filter))
+
+    async def run() -> None:
+        bmp_server = BMPServer(on_change)
+
+        server = await bmp_server.start("127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+
+        first = asyncio.create_task(send(host, port, router_messages(0, RULES), 1))
+
+        await _until(lambda: len(_table(bmp_server, "router-0")) == 3)
+
+        table = bmp_server.tables["router-0"]
+        assert {flowspec.action for flowspec in table.flows()} == {
+            rule.action for rule in RULES
+        }
+
+        second = asyncio.create_task(send(host, port, router_messages(0, RULES[:1]), 1))
+
+        await _until(lambda: len(_table(bmp_server, "router-0")) == 1)
+
+        # The rules of the replaced session are withdrawn once.
+        assert sorted(changes[3:]) == sorted(
+            [("withdraw", filter) for filter in FILTERS] + [("announce", FILTERS[0])]
+        )
+
+        await first
+
+        # The first session ending doesn't touch the table of the second one.
+        assert _table(bmp_server, "router-0") == {(str(BMP_PEER), "", FILTERS[0])}
+
+        await second
+        await _until(lambda: not bmp_server.tables)
+
+        assert changes[-1] == ("withdraw", FILTERS[0])
+        assert bmp_server.tables == {}
+
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(run())
+
+
+def test_actions():
+    async def run() -> dict[str, FlowSpec]:
+        bmp_server = BMPServer()
+
+        server = await bmp_server.start("127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+
+        session = asyncio.create_task(send(host, port, router_messages(0, RULES), 1))
+
+        await _until(lambda: len(_table(bmp_server, "router-0")) == 3)
+
+        flows = {
+            flowspec.filter: flowspec
+            for flowspec in bmp_server.tables["router-0"].flows()
+        }
+
+        await session
+
+        server.close()
+        await server.wait_closed()
+
+        return flows
+
+    flows = asyncio.run(run())
+
+    for rule, filter in zip(RULES, FILTERS):
+        assert flows[filter].action == rule.action
+
+        if rule.action == Action.RATE_LIMIT:
+            assert flows[filter].rate_limit_bps == rule.rate_limit_bps
@@ -0,0 +1,90 @@
+from netaddr import IPNetwork
+
+from flowspec_exporter.cache import ParseCache, parse_rule
+from flowspec_exporter.flowspec import FlowSpec
+
+
+class Parser:
+    """Parse function counting its calls, `None` for the invalid rules."""
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    def __call__(self, raw: str) -> FlowSpec | None:
+        self.calls.append(raw)
+
+        if raw == "invalid":
+            return None
+
+        return FlowSpec(
+            raw=raw, destination_prefix=IPNetwork(raw), metadata={"source": "parsed"}
+        )
+
+
+def test_hit_and_miss():
+    cache = ParseCache()
+    parse = Parser()
+
+    first = cache.get("192.0.2.0/24", parse)
+    second = cache.get("192.0.2.0/24", parse)
+
+    assert parse.calls == ["192.0.2.0/24"]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first is not second
+    assert first.filter == second.filter == "destination-prefix: 192.0.2.0/24"
+
+
+def test_invalid_rule_is_cached():
+    cache = ParseCache()
+    parse = Parser()
+
+    assert cache.get("invalid", parse) is None
+    assert cache.get("invalid", parse) is None
+    assert parse.calls == ["invalid"]
+
+
+def test_hit_returns_a_copy():
+    cache = ParseCache()
+    parse = Parser()
+
+    first = cache.get("192.0.2.0/24", parse)
+    first.metadata["vrf"] = "blue"
+    first.matched_packets = 10
+
+    second = cache.get("192.0.2.0/24", parse)
+    second.metadata["vrf"] = "red"
+
+    third = cache.get("192.0.2.0/24", parse)
+
+    assert first.metadata == {"source": "parsed", "vrf": "blue"}
+    assert second.metadata == {"source": "parsed", "vrf": "red"}
+    assert third.metadata == {"source": "parsed"}
+    assert third.matched_packets is None
+
+
+def test_evicts_the_least_recently_used():
+    cache = ParseCache(maxsize=2)
+    parse = Parser()
+
+    cache.get("192.0.2.0/24", parse)
+    cache.get("198.51.100.0/24", parse)
+    # Used again, so the other one is evicted first.
+    cache.get("192.0.2.0/24", parse)
+    cache.get("203.0.113.0/24", parse)
+
+    assert len(cache) == 2
+
+    cache.get("192.0.2.0/24", parse)
+    assert parse.calls.count("192.0.2.0/24") == 1
+
+    cache.get("198.51.100.0/24", parse)
+    assert parse.calls.count("198.51.100.0/24") == 2
+
+
+def test_parse_rule_without_cache():
+    parse = Parser()
+
+    parse_rule("192.0.2.0/24", parse)
+    parse_rule("192.0.2.0/24", parse)
+
+    assert len(parse.calls) == 2
@@ -0,0 +1,27 @@
+from flowspec_exporter.config import Router
+
+
+def _router(**parameters) -> Router:
+    return Router(
+        name="edge1", platform="cisco_ios", ssh_host="edge1", parameters=parameters
+    )
+
+
+def test_fan_out():
+    router = _router(vrf=["default", "customers"], ip_version=["ipv4", "ipv6"], n=5)
+
+    # Every combination of the lists, with the other parameters as they are.
+    assert router.fan_out() == [
+        {"vrf": "default", "ip_version": "ipv4", "n": 5},
+        {"vrf": "default", "ip_version": "ipv6", "n": 5},
+        {"vrf": "customers", "ip_version": "ipv4", "n": 5},
+        {"vrf": "customers", "ip_version": "ipv6", "n": 5},
+    ]
+
+
+def test_fan_out_without_lists():
+    assert _router(vrf="default").fan_out() == [{"vrf": "default"}]
+    assert _router().fan_out() == [{}]
+
+    # An empty list runs nothing.
+    assert _router(vrf=[]).fan_out() == []
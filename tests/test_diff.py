@@ -0,0 +1,186 @@
+import pytest
+from netaddr import IPNetwork
+
+from flowspec_exporter.diff import diff_rule_sets
+from flowspec_exporter.flowspec import (
+    Action,
+    BitmaskOp,
+    BitmaskValues,
+    FlowSpec,
+    NumericOpEq,
+    NumericValues,
+)
+
+
+def _flow(
+    prefix: str,
+    action: Action | None = Action.DISCARD,
+    rate_limit_bps: int | None = None,
+    **metadata: str,
+) -> FlowSpec:
+    return FlowSpec(
+        destination_prefix=IPNetwork(prefix),
+        action=action,
+        rate_limit_bps=rate_limit_bps,
+        metadata=metadata,
+    )
+
+
+def _rule_sets() -> dict[str, list[FlowSpec]]:
+    return {
+        "edge1": [
+            _flow("192.0.2.1/32"),
+            _flow("192.0.2.2/32", Action.RATE_LIMIT, 1_000_000),
+            _flow("192.0.2.3/32"),
+        ],
+        # Missing the third rule.
+        "edge2": [
+            _flow("192.0.2.1/32"),
+            _flow("192.0.2.2/32", Action.RATE_LIMIT, 1_000_000),
+        ],
+        # Another action for the first rule, and an extra rule.
+        "edge3": [
+            _flow("192.0.2.1/32", Action.RATE_LIMIT, 1_000_000),
+            _flow("192.0.2.2/32", Action.RATE_LIMIT, 1_000_000),
+            _flow("192.0.2.3/32"),
+            _flow("192.0.2.4/32"),
+        ],
+    }
+
+
+def _summary(diffs) -> dict[str, tuple[list[str], list[str], list[str]]]:
+    def prefixes(flows: list[FlowSpec]) -> list[str]:
+        return [str(flow.destination_prefix) for flow in flows]
+
+    return {
+        router: (
+            prefixes(diff.missing),
+            prefixes(diff.extra),
+            prefixes([flow for flow, _ in diff.divergent]),
+        )
+        for router, diff in diffs.items()
+    }
+
+
+def test_reference():
+    diffs = diff_rule_sets(_rule_sets(), "edge1")
+
+    assert _summary(diffs) == {
+        "edge1": ([], [], []),
+        "edge2": (["192.0.2.3/32"], [], []),
+        "edge3": ([], ["192.0.2.4/32"], ["192.0.2.1/32"]),
+    }
+
+    flow, expected = diffs["edge3"].divergent[0]
+    assert (flow.action, expected.action) == (Action.RATE_LIMIT, Action.DISCARD)
+
+
+def test_reference_with_the_modified_rule():
+    # The other routers diverge from the reference instead.
+    assert _summary(diff_rule_sets(_rule_sets(), "edge3")) == {
+        "edge1": (["192.0.2.4/32"], [], ["192.0.2.1/32"]),
+        "edge2": (["192.0.2.3/32", "192.0.2.4/32"], [], ["192.0.2.1/32"]),
+        "edge3": ([], [], []),
+    }
+
+
+def test_unknown_reference():
+    with pytest.raises(ValueError, match="Unknown reference router 'edge4'"):
+        diff_rule_sets(_rule_sets(), "edge4")
+
+
+def test_majority():
+    diffs = diff_rule_sets(_rule_sets())
+
+    # The rules of at least two routers are expected, with the action of
+    # most of them.
+    assert _summary(diffs) == {
+        "edge1": ([], [], []),
+        "edge2": (["192.0.2.3/32"], [], []),
+        "edge3": ([], ["192.0.2.4/32"], ["192.0.2.1/32"]),
+    }
+
+    assert diffs["edge3"].to_dict()["divergent"] == [
+        {
+            "filter": "destination-prefix: 192.0.2.1/32",
+            "action": Action.RATE_LIMIT,
+            "rate_limit_bps": 1_000_000,
+            "expected_action": Action.DISCARD,
+            "expected_rate_limit_bps": None,
+        }
+    ]
+
+
+def test_majority_ties():
+    rule_sets = {
+        "edge1": [_flow("192.0.2.1/32"), _flow("192.0.2.2/32")],
+        "edge2": [
+            _flow("192.0.2.1/32", Action.RATE_LIMIT, 1_000_000),
+            _flow("192.0.2.2/32"),
+        ],
+        # The action isn't known, it counts as carrying the rule only.
+        "edge3": [_flow("192.0.2.1/32", None)],
+        "edge4": [],
+    }
+
+    diffs = diff_rule_sets(rule_sets)
+
+    # Carried by three routers out of four, the actions are tied, the first
+    # router's one is expected. Carried by half of the routers only, not
+    # expected.
+    assert _summary(diffs) == {
+        "edge1": ([], ["192.0.2.2/32"], []),
+        "edge2": ([], ["192.0.2.2/32"], ["192.0.2.1/32"]),
+        "edge3": ([], [], []),
+        "edge4": (["192.0.2.1/32"], [], []),
+    }
+
+    assert diffs["edge4"].missing[0].action == Action.DISCARD
+
+
+def test_rate_only_change():
+    rule_sets = {
+        "edge1": [_flow("192.0.2.1/32", Action.RATE_LIMIT, 1_000_000)],
+        "edge2": [_flow("192.0.2.1/32", Action.RATE_LIMIT, 2_000_000)],
+    }
+
+    assert _summary(diff_rule_sets(rule_sets, "edge1"))["edge2"] == (
+        [],
+        [],
+        ["192.0.2.1/32"],
+    )
+
+
+def test_same_rule_written_differently():
+    # `0x10` and `=0x10` match the same TCP flags.
+    rule_sets = {
+        "edge1": [
+            FlowSpec(
+                destination_prefix=IPNetwork("192.0.2.1/32"),
+                ip_protocol=NumericValues((NumericOpEq, 6)),
+                tcp_flags=BitmaskValues((BitmaskOp(), 0x10)),
+            )
+        ],
+        "edge2": [
+            FlowSpec(
+                destination_prefix=IPNetwork("192.0.2.1/32"),
+                ip_protocol=NumericValues((NumericOpEq, 6)),
+                tcp_flags=BitmaskValues((BitmaskOp(match=True), 0x10)),
+            )
+        ],
+    }
+
+    assert _summary(diff_rule_sets(rule_sets, "edge1"))["edge2"] == ([], [], [])
+
+
+def test_other_vrf():
+    rule_sets = {
+        "edge1": [_flow("192.0.2.1/32", vrf="blue")],
+        "edge2": [_flow("192.0.2.1/32", vrf="red")],
+    }
+
+    assert _summary(diff_rule_sets(rule_sets, "edge1"))["edge2"] == (
+        ["192.0.2.1/32"],
+        ["192.0.2.1/32"],
+        [],
+    )
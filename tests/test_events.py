@@ -0,0 +1,226 @@
+import asyncio
+import functools
+import json
+from datetime import datetime, timezone
+
+import httpx
+from netaddr import IPNetwork
+
+from flowspec_exporter import events
+from flowspec_exporter.events import RuleEvent, WebhookOutput, diff_rules
+from flowspec_exporter.flowspec import Action, FlowSpec, rule_key
+
+TIMESTAMP = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _flow(
+    prefix: str,
+    action: Action | None = Action.DISCARD,
+    rate_limit_bps: int | None = None,
+    **metadata: str,
+) -> FlowSpec:
+    flow = FlowSpec(
+        destination_prefix=IPNetwork(prefix),
+        action=action,
+        rate_limit_bps=rate_limit_bps,
+        metadata=metadata,
+    )
+    flow.filter = flow.str_filter()
+
+    return flow
+
+
+def _rules(*flows: FlowSpec) -> dict[str, FlowSpec]:
+    return {rule_key(flow): flow for flow in flows}
+
+
+def _events(events: list[RuleEvent]) -> list[tuple[str, str, str | None]]:
+    return sorted(
+        (event.type, event.filter, event.flow.metadata.get("vrf")) for event in events
+    )
+
+
+def test_diff_rules():
+    kept = _flow("192.0.2.1/32")
+    removed = _flow("192.0.2.2/32")
+    added = _flow("192.0.2.3/32")
+
+    result = diff_rules("edge1", TIMESTAMP, _rules(kept, removed), _rules(kept, added))
+
+    assert _events(result) == [
+        ("add", added.filter, None),
+        ("remove", removed.filter, None),
+    ]
+    assert {event.router for event in result} == {"edge1"}
+
+
+def test_diff_rules_modify():
+    action = _flow("192.0.2.1/32", Action.DISCARD)
+    rate = _flow("192.0.2.2/32", Action.RATE_LIMIT, 1_000_000)
+    counters = _flow("192.0.2.3/32")
+
+    previous = _rules(action, rate, counters)
+
+    # Only the action, only the rate, and only the counters.
+    action_changed = _flow("192.0.2.1/32", Action.ACCEPT)
+    rate_changed = _flow("192.0.2.2/32", Action.RATE_LIMIT, 2_000_000)
+    counters_changed = _flow("192.0.2.3/32")
+    counters_changed.matched_packets = 10
+
+    result = diff_rules(
+        "edge1",
+        TIMESTAMP,
+        previous,
+        _rules(action_changed, rate_changed, counters_changed),
+    )
+
+    assert _events(result) == [
+        ("modify", action.filter, None),
+        ("modify", rate.filter, None),
+    ]
+
+    by_filter = {event.filter: event.to_dict() for event in result}
+
+    assert by_filter[action.filter]["action"] == Action.ACCEPT
+    assert by_filter[action.filter]["previous_action"] == Action.DISCARD
+    assert by_filter[rate.filter]["rate_limit_bps"] == 2_000_000
+    assert by_filter[rate.filter]["previous_rate_limit_bps"] == 1_000_000
+
+
+def test_diff_rules_vrfs():
+    # The same filter moved from a VRF to another.
+    blue = _flow("192.0.2.1/32", vrf="blue")
+    red = _flow("192.0.2.1/32", vrf="red")
+
+    assert _events(diff_rules("edge1", TIMESTAMP, _rules(blue), _rules(red))) == [
+        ("add", red.filter, "red"),
+        ("remove", blue.filter, "blue"),
+    ]
+
+
+def _event(i: int) -> RuleEvent:
+    flow = _flow(f"192.0.2.{i}/32")
+
+    return RuleEvent("add", "edge1", TIMESTAMP, flow.filter, flow)
+
+
+def _prefixes(batch: list[dict]) -> list[str]:
+    return [event["flow"]["destination_prefix"] for event in batch]
+
+
+class Webhook:
+    """Handler of a mock transport, failing the first `failures` requests."""
+
+    def __init__(self, failures: int = 0) -> None:
+        self.failures = failures
+        self.batches: list[list[str]] = []
+
+        # Set to hold the requests until it's set.
+        self.release: asyncio.Event | None = None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.release is not None:
+            await self.release.wait()
+
+        if self.failures:
+            self.failures -= 1
+
+            return httpx.Response(503)
+
+        self.batches.append(_prefixes(json.loads(request.content)))
+
+        return httpx.Response(200)
+
+
+def _output(webhook: Webhook, batch_size: int = 2) -> WebhookOutput:
+    # Not opened, the events are only sent by `flush`.
+    output = WebhookOutput("http://webhook.test/events", batch_size=batch_size)
+    output._client = httpx.AsyncClient(transport=httpx.MockTransport(webhook))
+
+    return output
+
+
+def test_webhook_failure_keeps_the_batch():
+    webhook = Webhook(failures=1)
+
+    async def run() -> list[str]:
+        output = _output(webhook)
+
+        await output.emit([_event(i) for i in range(1, 4)])
+
+        # The first batch fails, it's back in front of the others.
+        await output.flush()
+
+        pending = _prefixes(output._pending)
+
+        await output.emit([_event(4)])
+        await output.flush()
+
+        return pending
+
+    pending = asyncio.run(run())
+
+    assert pending == ["192.0.2.1/32", "192.0.2.2/32", "192.0.2.3/32"]
+    assert webhook.batches == [
+        ["192.0.2.1/32", "192.0.2.2/32"],
+        ["192.0.2.3/32", "192.0.2.4/32"],
+    ]
+
+
+def test_webhook_failure_while_emitting():
+    webhook = Webhook(failures=1)
+
+    async def run() -> list[str]:
+        output = _output(webhook)
+        webhook.release = asyncio.Event()
+
+        await output.emit([_event(1), _event(2)])
+
+        flush = asyncio.create_task(output.flush())
+        await asyncio.sleep(0.01)
+
+        # Emitted while the first batch is being sent.
+        await output.emit([_event(3)])
+
+        webhook.release.set()
+        await flush
+
+        return _prefixes(output._pending)
+
+    assert asyncio.run(run()) == ["192.0.2.1/32", "192.0.2.2/32", "192.0.2.3/32"]
+
+
+def test_webhook_drops_the_oldest(monkeypatch, caplog):
+    monkeypatch.setattr(events, "MAX_PENDING_EVENTS", 3)
+
+    async def run() -> list[str]:
+        output = _output(Webhook(), batch_size=10)
+
+        await output.emit([_event(i) for i in range(1, 3)])
+        await output.emit([_event(i) for i in range(3, 6)])
+
+        return _prefixes(output._pending)
+
+    assert asyncio.run(run()) == ["192.0.2.3/32", "192.0.2.4/32", "192.0.2.5/32"]
+    assert "Dropped rule events" in caplog.text
+
+
+def test_webhook_close_flushes(monkeypatch):
+    webhook = Webhook()
+
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(webhook)),
+    )
+
+    async def run() -> None:
+        output = WebhookOutput("http://webhook.test/events", flush_interval=60)
+
+        await output.open()
+        await output.emit([_event(1)])
+        await output.close()
+
+    asyncio.run(run())
+
+    assert webhook.batches == [["192.0.2.1/32"]]
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+from netaddr import IPNetwork
+from prometheus_client import generate_latest
+from prometheus_client.parser import text_string_to_metric_families
+
+from flowspec_exporter import exporter
+from flowspec_exporter.flowspec import FlowSpec
+from flowspec_exporter.sketch import HeavyHitters
+
+
+def _flow(prefix: str, matched_packets: int, **metadata: str) -> FlowSpec:
+    flow = FlowSpec(
+        destination_prefix=IPNetwork(prefix),
+        matched_packets=matched_packets,
+        matched_bytes=matched_packets * 100,
+        metadata=metadata,
+    )
+    flow.filter = flow.str_filter()
+
+    return flow
+
+
+def _samples(router: exporter.Router) -> dict[tuple[str, str, str, str], float]:
+    """Values of the counters of the rules in the `/metrics` output, by name,
+    filter, VRF and address family."""
+
+    text = generate_latest(router.collector_registry).decode()
+
+    return {
+        (
+            sample.name,
+            sample.labels["filter"],
+            sample.labels["vrf"],
+            sample.labels["afi"],
+        ): sample.value
+        for family in text_string_to_metric_families(text)
+        for sample in family.samples
+        if sample.name.endswith("_total")
+    }
+
+
+def _gauges(router: exporter.Router) -> dict[str, float]:
+    text = generate_latest(router.collector_registry).decode()
+
+    return {
+        sample.name: sample.value
+        for family in text_string_to_metric_families(text)
+        for sample in family.samples
+        if sample.name.endswith("_rules")
+    }
+
+
+@pytest.fixture(autouse=True)
+def heavy_hitters(monkeypatch):
+    # Shared by the routers, fresh ones for every test.
+    monkeypatch.setattr(
+        exporter.app.state,
+        "heavy_hitters",
+        {counter: HeavyHitters() for counter in exporter.TOP_COUNTERS},
+    )
+
+
+def test_update_metrics():
+    router = exporter.Router(name="edge1", platform="cisco_ios", ssh_host="edge1")
+
+    first = [
+        _flow("192.0.2.1/32", 10, vrf="blue"),
+        _flow("192.0.2.1/32", 20, vrf="red"),
+        _flow("192.0.2.2/32", 30),
+    ]
+
+    asyncio.run(exporter.update_metrics("edge1", router, first))
+
+    assert _samples(router) == {
+        (name, filter, vrf, ""): value
+        for filter, vrf, packets in (
+            ("destination-prefix: 192.0.2.1/32", "blue", 10),
+            ("destination-prefix: 192.0.2.1/32", "red", 20),
+            ("destination-prefix: 192.0.2.2/32", "", 30),
+        )
+        for name, value in (
+            ("matched_packets_total", packets),
+            ("matched_bytes_total", packets * 100),
+        )
+    }
+
+    # The same filter in two VRFs isn't a duplicate.
+    assert _gauges(router) == {
+        "duplicate_rules": 0,
+        "shadowed_rules": 0,
+        "overlapping_rules": 0,
+    }
+
+    # The rule in the red VRF and the second rule are gone, a third is added.
+    second = [
+        _flow("192.0.2.1/32", 15, vrf="blue"),
+        _flow("192.0.2.3/32", 5),
+    ]
+
+    asyncio.run(exporter.update_metrics("edge1", router, second))
+
+    assert _samples(router) == {
+        (name, filter, vrf, ""): value
+        for filter, vrf, packets in (
+            ("destination-prefix: 192.0.2.1/32", "blue", 15),
+            ("destination-prefix: 192.0.2.3/32", "", 5),
+        )
+        for name, value in (
+            ("matched_packets_total", packets),
+            ("matched_bytes_total", packets * 100),
+        )
+    }
+
+    assert set(router.rules) == {
+        "destination-prefix: 192.0.2.1/32 vrf blue",
+        "destination-prefix: 192.0.2.3/32",
+    }
+
+    # Only the rule in both scrapes has an increase.
+    top = exporter.app.state.heavy_hitters["matched_packets"].top(10)
+
+    assert [key for key, _, _ in top] == [
+        ("edge1", "destination-prefix: 192.0.2.1/32", "blue", "")
+    ]
+
+
+def test_update_metrics_counter_reset():
+    router = exporter.Router(name="edge1", platform="cisco_ios", ssh_host="edge1")
+
+    for matched_packets in (10, 3):
+        asyncio.run(
+            exporter.update_metrics(
+                "edge1", router, [_flow("192.0.2.1/32", matched_packets)]
+            )
+        )
+
+    # Cleared on the router, the counter follows it.
+    assert (
+        _samples(router)[
+            ("matched_packets_total", "destination-prefix: 192.0.2.1/32", "", "")
+        ]
+        == 3
+    )
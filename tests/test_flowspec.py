@@ -0,0 +1,167 @@
+import logging
+
+import pytest
+from netaddr import IPNetwork
+
+from flowspec_exporter.bgp import AFI_IPV6, SAFI_FLOWSPEC, decode_nlris
+from flowspec_exporter.flowspec import (
+    BitmaskOp,
+    BitmaskValues,
+    ComponentType,
+    FlowSpec,
+    FlowSpecs,
+    NumericOp,
+    NumericOpEq,
+    NumericOpGte,
+    NumericOpLte,
+    NumericValues,
+    UnsupportedNLRIError,
+    rule_key,
+)
+
+FLOWS = [
+    FlowSpec(
+        destination_prefix=IPNetwork("192.0.2.0/24"),
+        source_prefix=IPNetwork("198.51.100.7/32"),
+        ip_protocol=NumericValues((NumericOpEq, 6), (NumericOpEq, 17)),
+        destination_port=NumericValues(
+            (NumericOpGte, 1024), (NumericOpLte.set_and(True), 65535)
+        ),
+        tcp_flags=BitmaskValues((BitmaskOp(match=True), 0x02)),
+        packet_length=NumericValues((NumericOpGte, 1400)),
+    ),
+    FlowSpec(destination_prefix=IPNetwork("0.0.0.0/0")),
+    FlowSpec(
+        source_prefix=IPNetwork("203.0.113.128/25"),
+        fragment=BitmaskValues((BitmaskOp(not_=True, match=True), 0x01)),
+        dscp=NumericValues((NumericOpEq, 46)),
+    ),
+]
+
+FLOWS_IPV6 = [
+    FlowSpec(
+        destination_prefix=IPNetwork("2001:db8::/32"),
+        source_prefix=IPNetwork("2001:db8:1::1/128"),
+        ip_protocol=NumericValues((NumericOpEq, 58)),
+        icmp_type=NumericValues((NumericOpEq, 128)),
+    ),
+    FlowSpec(destination_prefix=IPNetwork("2001:db8:ffff::/48")),
+]
+
+
+def _components(flow: FlowSpec) -> str:
+    return flow.str_filter()
+
+
+def _nlri(body: bytes) -> bytes:
+    return len(body).to_bytes() + body
+
+
+# destination-prefix 2001:db8::/32 with an offset of 8 bits.
+PREFIX_WITH_OFFSET = _nlri(bytes([ComponentType.DESTINATION_PREFIX, 32, 8, 0xB8]))
+
+# destination-prefix 2001:db8::/32 and flow-label =1234.
+FLOW_LABEL = _nlri(
+    bytes([ComponentType.DESTINATION_PREFIX, 32, 0, 0x20, 0x01, 0x0D, 0xB8])
+    + bytes([ComponentType.FLOW_LABEL, 0x91])
+    + (1234).to_bytes(2)
+)
+
+
+@pytest.mark.parametrize("flow", FLOWS, ids=_components)
+def test_round_trip_ipv4(flow):
+    decoded, end = FlowSpec.decode(bytes(flow))
+
+    assert end == len(bytes(flow))
+    assert decoded.str_filter() == flow.str_filter()
+    assert bytes(decoded) == bytes(flow)
+
+
+@pytest.mark.parametrize("flow", FLOWS_IPV6, ids=_components)
+def test_round_trip_ipv6(flow):
+    decoded = FlowSpec.from_bytes(bytes(flow), version=6)
+
+    assert decoded.str_filter() == flow.str_filter()
+    assert bytes(decoded) == bytes(flow)
+
+
+def test_round_trip_stream():
+    decoded = FlowSpecs.from_bytes(bytes(FlowSpecs(flows=FLOWS)))
+
+    assert [flow.str_filter() for flow in decoded.flows] == [
+        flow.str_filter() for flow in FLOWS
+    ]
+
+
+@pytest.mark.parametrize("nlri", [PREFIX_WITH_OFFSET, FLOW_LABEL])
+def test_decode_unsupported(nlri):
+    with pytest.raises(UnsupportedNLRIError) as e:
+        FlowSpec.decode(b"\x00" + nlri, 1, version=6)
+
+    assert e.value.end == len(nlri) + 1
+
+
+@pytest.mark.parametrize("nlri", [PREFIX_WITH_OFFSET, FLOW_LABEL])
+def test_skip_unsupported(nlri, caplog):
+    first, last = (bytes(flow) for flow in FLOWS_IPV6)
+
+    with caplog.at_level(logging.WARNING):
+        decoded = FlowSpecs.from_bytes(first + nlri + last, version=6)
+
+    assert [flow.str_filter() for flow in decoded.flows] == [
+        flow.str_filter() for flow in FLOWS_IPV6
+    ]
+    assert "Skipped NLRI" in caplog.text
+
+    decoded_nlris = decode_nlris(
+        memoryview(first + nlri + last), AFI_IPV6, SAFI_FLOWSPEC
+    )
+
+    assert len(list(decoded_nlris)) == 2
+
+
+def test_flow_label_is_unknown_for_ipv4():
+    with pytest.raises(ValueError, match="Unknown component type"):
+        FlowSpec.from_bytes(
+            _nlri(bytes([ComponentType.FLOW_LABEL, 0x81, 1])), version=4
+        )
+
+
+def test_interned_ops_keep_their_fields():
+    op = NumericOp(and_=True)
+
+    assert NumericOp(and_=1) is op
+    assert op.and_ is True
+
+    bitmask_op = BitmaskOp(match=True)
+
+    assert BitmaskOp(match=2) is bitmask_op
+    assert bitmask_op.match is True
+
+
+def test_rule_key():
+    flow = FlowSpec(destination_prefix=IPNetwork("192.0.2.0/24"))
+
+    keys = {
+        rule_key(
+            FlowSpec(destination_prefix=flow.destination_prefix, metadata=metadata)
+        )
+        for metadata in (
+            {},
+            {"vrf": "blue"},
+            {"vrf": "red"},
+            {"vrf": "blue", "afi": "ipv4"},
+            # The default VRF of a platform naming it.
+            {"vrf": ""},
+        )
+    }
+
+    # The same filter in another VRF or address family is another rule.
+    assert len(keys) == 5
+    assert rule_key(flow) == "destination-prefix: 192.0.2.0/24"
+
+    # The filter as scraped, when known.
+    flow.filter = "flowspec-rule-1"
+    flow.metadata["vrf"] = "blue"
+
+    assert rule_key(flow) == "flowspec-rule-1 vrf blue"
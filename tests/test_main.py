@@ -0,0 +1,81 @@
+import json
+import subprocess
+import sys
+
+from flowspec_exporter.main import _select_parser, detect_parser
+from tests import DIR
+
+JUNIPER_JUNOS_OUTPUT = DIR / "routers" / "juniper_junos_show_firewall_filter.txt"
+
+JUNIPER_JUNOS_JSON_OUTPUT = DIR / "routers" / "juniper_junos_show_firewall_filter.json"
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", "flowspec_exporter.main", *args],
+        capture_output=True,
+        text=True,
+        cwd=DIR.parent,
+    )
+
+
+def test_detect_parser():
+    assert detect_parser(JUNIPER_JUNOS_OUTPUT.read_text()) == (
+        "juniper_junos_parse_flows"
+    )
+    assert detect_parser(JUNIPER_JUNOS_JSON_OUTPUT.read_text()) == (
+        "juniper_junos_json_parse_flows"
+    )
+    assert detect_parser("garbage") is None
+
+
+def test_select_parser():
+    platform_map = [("*.log", "cisco_ios_parse_flows")]
+
+    assert _select_parser("edge1.log", None, platform_map) == "cisco_ios_parse_flows"
+    assert _select_parser("edge1.txt", None, platform_map) is None
+    assert _select_parser("edge1.txt", "huawei_vrp_parse_flows", platform_map) == (
+        "huawei_vrp_parse_flows"
+    )
+
+
+def test_batch_reports_the_failing_file(tmp_path):
+    invalid = tmp_path / "invalid.txt"
+    invalid.write_text("garbage\n")
+
+    result = _run(str(JUNIPER_JUNOS_OUTPUT), str(invalid), "--jobs", "2")
+
+    flows = [json.loads(line) for line in result.stdout.splitlines()]
+
+    assert result.returncode != 0
+    assert len(flows) == 4
+    assert {flow["metadata"]["source"] for flow in flows} == {str(JUNIPER_JUNOS_OUTPUT)}
+    assert f"{invalid}: Unable to detect the platform" in result.stderr
+
+
+def test_batch_with_map(tmp_path):
+    output = tmp_path / "edge1.log"
+    output.write_text(JUNIPER_JUNOS_OUTPUT.read_text())
+
+    result = _run(
+        str(output),
+        str(JUNIPER_JUNOS_JSON_OUTPUT),
+        "--jobs",
+        "2",
+        "--map",
+        "*.log=juniper_junos_parse_flows",
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert len(result.stdout.splitlines()) == 8
+
+
+def test_json_in_parallel(tmp_path):
+    paths = [str(JUNIPER_JUNOS_OUTPUT), str(JUNIPER_JUNOS_JSON_OUTPUT)]
+
+    serial = _run(*paths, "--format", "json", "--jobs", "1")
+    parallel = _run(*paths, "--format", "json", "--jobs", "2")
+
+    assert serial.returncode == parallel.returncode == 0
+    assert len(json.loads(parallel.stdout)["flows"]) == 8
+    assert parallel.stdout == serial.stdout
@@ -0,0 +1,289 @@
+import numpy as np
+import pytest
+from netaddr import IPAddress, IPNetwork
+
+from flowspec_exporter.flowspec import (
+    BitmaskOp,
+    BitmaskValues,
+    FlowSpec,
+    NumericOp,
+    NumericOpEq,
+    NumericOpGte,
+    NumericOpLte,
+    NumericValues,
+)
+from flowspec_exporter.matching import Packets, RuleMatcher, _evaluate
+
+# >=80&<=90 =443
+HTTP_PORTS = NumericValues(
+    (NumericOpGte, 80), (NumericOpLte.set_and(True), 90), (NumericOpEq, 443)
+)
+
+PORTS = np.array([0, 22, 79, 80, 85, 90, 91, 442, 443, 444, 65535])
+
+
+def _reference_values(value: int, values, bitmask: bool) -> bool:
+    """RFC 8955 section 4.2.1, one value at a time: the terms joined by the
+    and bit are ANDed, the groups are ORed."""
+
+    groups: list[bool] = []
+
+    for op, operand in values:
+        if bitmask:
+            term = (
+                value & operand == operand if op.match else value & operand != 0
+            ) != op.not_
+        else:
+            term = (
+                (op.lt and value < operand)
+                or (op.gt and value > operand)
+                or (op.eq and value == operand)
+            )
+
+        if op.and_ and groups:
+            groups[-1] = groups[-1] and term
+        else:
+            groups.append(term)
+
+    return any(groups)
+
+
+def _reference_match(flow: FlowSpec, packet: dict, version: int) -> bool:
+    def values(name: str, field: str, bitmask: bool = False) -> bool:
+        return _reference_values(packet[field], getattr(flow, name), bitmask)
+
+    for name in ("destination_prefix", "source_prefix"):
+        prefix = getattr(flow, name)
+        address = packet[name.split("_")[0]]
+
+        if prefix is not None and (
+            prefix.version != version or IPAddress(address, version) not in prefix
+        ):
+            return False
+
+    protocol = packet["protocol"]
+
+    if flow.ip_protocol is not None and not values("ip_protocol", "protocol"):
+        return False
+
+    if (
+        flow.port is not None
+        or flow.destination_port is not None
+        or flow.source_port is not None
+    ):
+        if protocol not in (6, 17):
+            return False
+        if flow.port is not None and not (
+            values("port", "source_port") or values("port", "destination_port")
+        ):
+            return False
+        if flow.destination_port is not None and not values(
+            "destination_port", "destination_port"
+        ):
+            return False
+        if flow.source_port is not None and not values("source_port", "source_port"):
+            return False
+
+    if flow.icmp_type is not None:
+        if protocol != (1 if version == 4 else 58):
+            return False
+        if not values("icmp_type", "icmp_type"):
+            return False
+
+    if flow.tcp_flags is not None and (
+        protocol != 6 or not values("tcp_flags", "tcp_flags", True)
+    ):
+        return False
+
+    if flow.packet_length is not None and not values("packet_length", "length"):
+        return False
+
+    return flow.fragment is None or values("fragment", "fragment", True)
+
+
+def _reference_first_match(flows: list[FlowSpec], packet: dict, version: int) -> int:
+    for i in sorted(range(len(flows)), key=lambda i: flows[i].sort_key()):
+        if _reference_match(flows[i], packet, version):
+            return i
+
+    return -1
+
+
+def _packets(rnd: np.random.Generator, count: int, prefixes: list[str]) -> dict:
+    """Addresses in and around the prefixes, with the header fields drawn from
+    the values around the operands of the rules."""
+
+    addresses = [
+        int(IPNetwork(prefix).first) + offset
+        for prefix in prefixes
+        for offset in (0, 1, 15, 16, 255, 256)
+    ]
+
+    return {
+        "destination": rnd.choice(addresses, count),
+        "source": rnd.choice(addresses, count),
+        "protocol": rnd.choice([1, 6, 17, 58], count),
+        "source_port": rnd.choice(PORTS, count),
+        "destination_port": rnd.choice(PORTS, count),
+        "icmp_type": rnd.choice([0, 3, 8], count),
+        "tcp_flags": rnd.choice([0x00, 0x02, 0x10, 0x12], count),
+        "length": rnd.choice([64, 512, 1500], count),
+        "fragment": rnd.choice([0x00, 0x01, 0x02], count),
+    }
+
+
+RULES_V4 = [
+    FlowSpec(
+        destination_prefix=IPNetwork("192.0.2.0/24"),
+        destination_port=HTTP_PORTS,
+    ),
+    # Nested in the first one, so evaluated before it.
+    FlowSpec(
+        destination_prefix=IPNetwork("192.0.2.0/28"),
+        ip_protocol=NumericValues((NumericOpEq, 6)),
+    ),
+    FlowSpec(destination_prefix=IPNetwork("192.0.2.1/32")),
+    FlowSpec(
+        destination_prefix=IPNetwork("192.0.2.0/24"),
+        source_prefix=IPNetwork("198.51.100.0/24"),
+        tcp_flags=BitmaskValues(
+            (BitmaskOp(match=True), 0x02), (BitmaskOp(and_=True, not_=True), 0x10)
+        ),
+    ),
+    FlowSpec(
+        source_prefix=IPNetwork("198.51.100.0/24"),
+        icmp_type=NumericValues((NumericOpEq, 8)),
+    ),
+    FlowSpec(
+        port=NumericValues((NumericOp(lt=True), 80), (NumericOp(gt=True), 443)),
+        packet_length=NumericValues((NumericOpGte, 512)),
+    ),
+    FlowSpec(fragment=BitmaskValues((BitmaskOp(match=True), 0x02))),
+    # Nothing is sent there.
+    FlowSpec(destination_prefix=IPNetwork("203.0.113.0/24")),
+]
+
+RULES_V6 = [
+    FlowSpec(
+        destination_prefix=IPNetwork("2001:db8::/32"),
+        source_port=HTTP_PORTS,
+    ),
+    FlowSpec(destination_prefix=IPNetwork("2001:db8::/64")),
+    FlowSpec(
+        source_prefix=IPNetwork("2001:db8:1::/48"),
+        icmp_type=NumericValues((NumericOpEq, 8)),
+    ),
+    # An IPv4 rule never matches IPv6 packets.
+    FlowSpec(destination_prefix=IPNetwork("0.0.0.0/0")),
+]
+
+
+@pytest.mark.parametrize(
+    "values, bitmask",
+    [
+        (HTTP_PORTS, False),
+        (NumericValues((NumericOp(lt=True, gt=True), 443)), False),
+        (NumericValues((NumericOp(), 80), (NumericOpEq, 22)), False),
+        (NumericValues((NumericOp(lt=True, gt=True, eq=True), 0)), False),
+        (NumericValues(), False),
+        (
+            BitmaskValues((BitmaskOp(match=True), 0x12), (BitmaskOp(not_=True), 0x04)),
+            True,
+        ),
+        (BitmaskValues((BitmaskOp(match=True, not_=True), 0x06)), True),
+    ],
+    ids=str,
+)
+def test_evaluate(values, bitmask):
+    column = np.arange(2**16, dtype=np.uint16)
+
+    expected = [_reference_values(value, values, bitmask) for value in range(2**16)]
+
+    assert _evaluate(column, values, bitmask).tolist() == expected
+
+
+def test_evaluate_http_ports():
+    mask = _evaluate(PORTS.astype(np.uint16), HTTP_PORTS, False)
+
+    assert PORTS[mask].tolist() == [80, 85, 90, 443]
+
+
+def test_match_ipv4():
+    columns = _packets(
+        np.random.default_rng(0),
+        5000,
+        ["192.0.2.0/24", "198.51.100.0/24", "192.0.2.0/28"],
+    )
+
+    result = RuleMatcher(RULES_V4).match(Packets(**columns))
+
+    expected = [
+        _reference_first_match(
+            RULES_V4, {name: int(column[i]) for name, column in columns.items()}, 4
+        )
+        for i in range(5000)
+    ]
+
+    assert result.first_match.tolist() == expected
+    assert result.hits.tolist() == [expected.count(i) for i in range(len(RULES_V4))]
+    # Every rule but the one nothing is sent to is hit, and some packets
+    # match none.
+    assert result.hits[:-1].all() and result.hits[-1] == 0
+    assert -1 in expected
+
+
+def test_match_ipv6():
+    columns = _packets(
+        np.random.default_rng(1),
+        2000,
+        ["2001:db8::/64", "2001:db8:1::/48", "2001:db9::/32"],
+    )
+
+    def halves(addresses: np.ndarray) -> np.ndarray:
+        return np.array(
+            [(int(a) >> 64, int(a) & (2**64 - 1)) for a in addresses], np.uint64
+        )
+
+    packets = Packets(
+        **{
+            **columns,
+            "destination": halves(columns["destination"]),
+            "source": halves(columns["source"]),
+        }
+    )
+
+    result = RuleMatcher(RULES_V6).match(packets)
+
+    expected = [
+        _reference_first_match(
+            RULES_V6, {name: int(column[i]) for name, column in columns.items()}, 6
+        )
+        for i in range(2000)
+    ]
+
+    assert result.first_match.tolist() == expected
+    assert result.hits[:3].all() and result.hits[3] == 0
+
+
+def test_match_nested_prefixes():
+    # The more specific prefix has precedence, whatever the order of the rules.
+    rules = [
+        FlowSpec(destination_prefix=IPNetwork("192.0.2.0/24")),
+        FlowSpec(destination_prefix=IPNetwork("192.0.2.0/25")),
+        FlowSpec(destination_prefix=IPNetwork("192.0.2.1/32")),
+    ]
+
+    destinations = [int(IPAddress(address)) for address in ("192.0.2.1", "192.0.2.2")]
+    destinations += [int(IPAddress("192.0.2.200")), int(IPAddress("198.51.100.1"))]
+
+    result = RuleMatcher(rules).match(Packets(destination=destinations, source=[0] * 4))
+
+    assert result.first_match.tolist() == [2, 1, 0, -1]
+    assert result.hits.tolist() == [1, 1, 1]
+
+
+def test_match_none():
+    result = RuleMatcher([]).match(Packets(destination=[1, 2], source=[0, 0]))
+
+    assert result.first_match.tolist() == [-1, -1]
+    assert result.hits.tolist() == []
@@ -0,0 +1,275 @@
+import bz2
+import gzip
+import logging
+import struct
+
+import pytest
+from netaddr import IPNetwork
+
+from flowspec_exporter.bgp import parse_update
+from flowspec_exporter.flowspec import (
+    Action,
+    FlowSpec,
+    NumericOpEq,
+    NumericOpGte,
+    NumericValues,
+)
+from flowspec_exporter.mrt import is_mrt_file, read_mrt
+
+TIMESTAMP = 1735689600
+
+ISO_TIMESTAMP = "2025-01-01T00:00:00+00:00"
+
+DNS = FlowSpec(
+    destination_prefix=IPNetwork("192.0.2.1/32"),
+    ip_protocol=NumericValues((NumericOpEq, 17)),
+    source_port=NumericValues((NumericOpEq, 53)),
+)
+
+HTTP = FlowSpec(
+    destination_prefix=IPNetwork("198.51.100.0/24"),
+    destination_port=NumericValues((NumericOpGte, 1024)),
+)
+
+IPV6 = FlowSpec(
+    destination_prefix=IPNetwork("2001:db8::/32"),
+    ip_protocol=NumericValues((NumericOpEq, 58)),
+)
+
+# Route distinguisher 65000:1, type 0.
+ROUTE_DISTINGUISHER = struct.pack("!HHI", 0, 65000, 1)
+
+
+def _vpn(flow: FlowSpec) -> bytes:
+    # Short NLRI, the route distinguisher goes between the length and the
+    # components.
+    nlri = bytes(flow)
+
+    return bytes([nlri[0] + len(ROUTE_DISTINGUISHER)]) + ROUTE_DISTINGUISHER + nlri[1:]
+
+
+def _record(type_: int, subtype: int, data: bytes) -> bytes:
+    return struct.pack("!IHHI", TIMESTAMP, type_, subtype, len(data)) + data
+
+
+def _attribute(type_: int, data: bytes) -> bytes:
+    return struct.pack("!BBB", 0xC0, type_, len(data)) + data
+
+
+def _traffic_rate(bytes_per_second: float) -> bytes:
+    return _attribute(16, struct.pack("!BBHf", 0x80, 0x06, 0, bytes_per_second))
+
+
+def _peer_index_table() -> bytes:
+    return _record(
+        13,
+        1,
+        struct.pack("!IH", 0x0A000001, 0)
+        + struct.pack("!H", 2)
+        # IPv4 peer with a 4 bytes AS.
+        + struct.pack("!BI4sI", 0x02, 1, bytes([10, 0, 0, 2]), 65001)
+        # IPv6 peer with a 2 bytes AS.
+        + struct.pack(
+            "!BI16sH", 0x01, 2, bytes(IPNetwork("2001:db8::2").ip.packed), 65002
+        ),
+    )
+
+
+def _rib_generic(
+    sequence: int,
+    afi: int,
+    safi: int,
+    nlri: bytes,
+    entries: list[tuple[int, bytes]],
+    addpath: bool = False,
+) -> bytes:
+    data = (
+        struct.pack("!IHB", sequence, afi, safi)
+        + nlri
+        + struct.pack("!H", len(entries))
+    )
+
+    for peer_index, attributes in entries:
+        data += struct.pack("!HI", peer_index, TIMESTAMP)
+
+        if addpath:
+            data += struct.pack("!I", 7)
+
+        data += struct.pack("!H", len(attributes)) + attributes
+
+    return _record(13, 12 if addpath else 6, data)
+
+
+def _update(
+    afi: int,
+    announced: list[bytes],
+    withdrawn: list[bytes],
+    attributes: bytes = b"",
+) -> bytes:
+    if announced:
+        attributes += _attribute(
+            14, struct.pack("!HBBB", afi, 133, 0, 0) + b"".join(announced)
+        )
+    if withdrawn:
+        attributes += _attribute(15, struct.pack("!HB", afi, 133) + b"".join(withdrawn))
+
+    update = struct.pack("!HH", 0, len(attributes)) + attributes
+
+    return b"\xff" * 16 + struct.pack("!HB", 19 + len(update), 2) + update
+
+
+def _bgp4mp(message: bytes, extended: bool = False) -> bytes:
+    # BGP4MP_MESSAGE_AS4 between IPv4 peers.
+    data = struct.pack("!IIHH4s4s", 65001, 65000, 0, 1, bytes([10, 0, 0, 2]), bytes(4))
+
+    if extended:
+        # The microseconds of BGP4MP_ET come first.
+        return _record(17, 4, struct.pack("!I", 500) + data + message)
+
+    return _record(16, 4, data + message)
+
+
+def _mrt() -> bytes:
+    return b"".join(
+        [
+            _peer_index_table(),
+            _rib_generic(0, 1, 133, bytes(DNS), [(0, _traffic_rate(0))]),
+            _rib_generic(
+                1,
+                1,
+                133,
+                bytes(HTTP),
+                [(0, _traffic_rate(125_000)), (1, b"")],
+                addpath=True,
+            ),
+            _rib_generic(2, 1, 134, _vpn(DNS), [(1, _traffic_rate(12.5))]),
+            _bgp4mp(_update(2, [bytes(IPV6)], [])),
+            _bgp4mp(_update(1, [], [bytes(DNS)]), extended=True),
+        ]
+    )
+
+
+def _read(path, **kwargs) -> list[tuple[str, dict, Action | None, int | None]]:
+    return [
+        (flow.str_filter(), flow.metadata, flow.action, flow.rate_limit_bps)
+        for flow in read_mrt(str(path), **kwargs)
+    ]
+
+
+EXPECTED = [
+    (
+        DNS.str_filter(),
+        {"timestamp": ISO_TIMESTAMP, "peer": "10.0.0.2"},
+        Action.DISCARD,
+        None,
+    ),
+    (
+        HTTP.str_filter(),
+        {"timestamp": ISO_TIMESTAMP, "peer": "10.0.0.2"},
+        Action.RATE_LIMIT,
+        1_000_000,
+    ),
+    (
+        HTTP.str_filter(),
+        {"timestamp": ISO_TIMESTAMP, "peer": "2001:db8::2"},
+        Action.ACCEPT,
+        None,
+    ),
+    (
+        DNS.str_filter(),
+        {
+            "route_distinguisher": "65000:1",
+            "timestamp": ISO_TIMESTAMP,
+            "peer": "2001:db8::2",
+        },
+        Action.RATE_LIMIT,
+        100,
+    ),
+    (
+        IPV6.str_filter(),
+        {"timestamp": ISO_TIMESTAMP, "peer": "10.0.0.2"},
+        Action.ACCEPT,
+        None,
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "compress", [bytes, gzip.compress, bz2.compress], ids=["plain", "gzip", "bz2"]
+)
+def test_read_mrt(tmp_path, compress):
+    path = tmp_path / "updates.mrt"
+    path.write_bytes(compress(_mrt()))
+
+    assert is_mrt_file(str(path))
+    assert _read(path) == EXPECTED
+
+
+def test_read_mrt_withdrawals(tmp_path):
+    path = tmp_path / "updates.mrt"
+    path.write_bytes(_mrt())
+
+    *_, withdrawn = _read(path, withdrawals=True)
+
+    assert withdrawn == (
+        DNS.str_filter(),
+        {"timestamp": ISO_TIMESTAMP, "peer": "10.0.0.2", "withdrawn": "true"},
+        None,
+        None,
+    )
+
+
+@pytest.mark.parametrize("compress", [bytes, gzip.compress], ids=["plain", "gzip"])
+def test_read_mrt_truncated(tmp_path, caplog, compress):
+    path = tmp_path / "updates.mrt"
+    path.write_bytes(compress(_mrt()[:-5]))
+
+    with caplog.at_level(logging.ERROR):
+        flows = _read(path)
+
+    # The records before the truncated one are still read.
+    assert flows == EXPECTED
+    assert "Truncated MRT record" in caplog.text
+
+
+def test_read_mrt_invalid_record(tmp_path, caplog):
+    # A component type that doesn't exist.
+    invalid = _rib_generic(0, 1, 133, bytes([2, 0x30, 0]), [])
+
+    path = tmp_path / "updates.mrt"
+    path.write_bytes(
+        _peer_index_table() + invalid + _bgp4mp(_update(2, [bytes(IPV6)], []))
+    )
+
+    with caplog.at_level(logging.ERROR):
+        flows = _read(path)
+
+    assert [flow[0] for flow in flows] == [IPV6.str_filter()]
+    assert "Invalid MRT record" in caplog.text
+
+
+def test_is_mrt_file(tmp_path):
+    path = tmp_path / "output.txt"
+    path.write_text("Filter: __flowspec_default_inet__\n")
+
+    assert not is_mrt_file(str(path))
+
+
+def test_parse_update():
+    announced, withdrawn = parse_update(
+        memoryview(
+            _update(1, [bytes(HTTP), bytes(DNS)], [bytes(DNS)], _traffic_rate(0))
+        )
+    )
+
+    assert [(flow.str_filter(), flow.action) for flow in announced] == [
+        (HTTP.str_filter(), Action.DISCARD),
+        (DNS.str_filter(), Action.DISCARD),
+    ]
+    assert [flow.str_filter() for flow in withdrawn] == [DNS.str_filter()]
+
+
+def test_parse_update_not_flowspec():
+    keepalive = b"\xff" * 16 + struct.pack("!HB", 19, 4)
+
+    assert parse_update(memoryview(keepalive)) == ([], [])
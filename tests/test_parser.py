@@ -0,0 +1,92 @@
+import asyncio
+import importlib.metadata
+
+import pytest
+
+from flowspec_exporter import parser
+from flowspec_exporter.flowspec import FlowSpec
+from flowspec_exporter.routers.cisco_ios import parse_flows
+
+
+async def scrape(connection, cache, **parameters) -> list[FlowSpec]:
+    return [FlowSpec(metadata={"parameters": str(sorted(parameters))})]
+
+
+def parse(output: str, cache) -> list[FlowSpec]:
+    return []
+
+
+ENTRY_POINTS = [
+    importlib.metadata.EntryPoint(
+        "arista_eos", f"{__name__}:scrape", parser.PLATFORMS_GROUP
+    ),
+    importlib.metadata.EntryPoint(
+        "arista_eos_parse_flows", f"{__name__}:parse", parser.PARSERS_GROUP
+    ),
+    # Built-in names take precedence.
+    importlib.metadata.EntryPoint(
+        "cisco_ios_parse_flows", f"{__name__}:parse", parser.PARSERS_GROUP
+    ),
+]
+
+
+def _clear_caches() -> None:
+    for function in (parser._entry_points, parser.get_platform, parser.get_parser):
+        function.cache_clear()
+
+
+@pytest.fixture
+def entry_points(monkeypatch):
+    groups: list[str] = []
+
+    def fake_entry_points(*, group: str) -> list[importlib.metadata.EntryPoint]:
+        groups.append(group)
+
+        return [
+            entry_point for entry_point in ENTRY_POINTS if entry_point.group == group
+        ]
+
+    monkeypatch.setattr(importlib.metadata, "entry_points", fake_entry_points)
+
+    _clear_caches()
+    yield groups
+    _clear_caches()
+
+
+def test_builtins(entry_points):
+    assert parser.get_parser("cisco_ios_parse_flows") is parse_flows
+    assert parser.is_parser("juniper_junos_json_parse_flows")
+
+    # Without scanning the installed packages.
+    assert entry_points == []
+
+
+def test_unsupported(entry_points):
+    with pytest.raises(ValueError, match="Unsupported platform: arista_os"):
+        parser.get_platform("arista_os")
+
+    with pytest.raises(ValueError, match="Unsupported parser: arista_os"):
+        parser.get_parser("arista_os")
+
+    assert not parser.is_parser("arista_os")
+
+
+def test_entry_points(entry_points):
+    assert parser.get_platform("arista_eos") is scrape
+    assert parser.get_parser("arista_eos_parse_flows") is parse
+    assert parser.is_parser("arista_eos_parse_flows")
+
+    assert parser.platform_names() == [*parser.PLATFORMS, "arista_eos"]
+    assert parser.parser_names() == [*parser.PARSERS, "arista_eos_parse_flows"]
+    assert parser.get_parser("cisco_ios_parse_flows") is parse_flows
+
+    # Scanned once per group.
+    assert sorted(entry_points) == [parser.PARSERS_GROUP, parser.PLATFORMS_GROUP]
+
+
+def test_parse_flow_spec(entry_points):
+    flows = asyncio.run(
+        parser.parse_flow_spec("arista_eos", None, None, vrf="blue")  # type: ignore
+    )
+
+    assert flows[0].metadata == {"parameters": "['vrf']"}
@@ -0,0 +1,110 @@
+import pytest
+from netaddr import IPNetwork
+
+from flowspec_exporter.flowspec import (
+    Action,
+    BitmaskOp,
+    BitmaskValues,
+    FlowSpec,
+    FlowSpecs,
+    NumericOp,
+    NumericValues,
+)
+from flowspec_exporter.serialization import MAGIC, dumps, loads
+from tests import DIR
+
+# Output of `FlowSpecs.to_json(indent=2, default=str)` for `_flows()` when
+# `FlowSpec` was a `dataclass_json` dataclass.
+DATACLASSES_JSON_OUTPUT = DIR / "flowspecs_dataclasses_json.json"
+
+
+def _flows() -> list[FlowSpec]:
+    return [
+        FlowSpec(
+            raw="192.0.2.0/24,*,proto=6,dstport>=80&<=90,=443",
+            destination_prefix=IPNetwork("192.0.2.0/24"),
+            ip_protocol=NumericValues((NumericOp(eq=True), 6)),
+            destination_port=NumericValues(
+                (NumericOp(gt=True, eq=True), 80),
+                (NumericOp(and_=True, lt=True, eq=True), 90),
+                (NumericOp(eq=True), 443),
+            ),
+            tcp_flags=BitmaskValues(
+                (BitmaskOp(match=True), 0x02), (BitmaskOp(and_=True, not_=True), 0x10)
+            ),
+            action=Action.RATE_LIMIT,
+            # Juniper overflows on large rates.
+            rate_limit_bps=-589934592000,
+            matched_packets=10,
+            matched_bytes=1000,
+            transmitted_packets=0,
+            transmitted_bytes=0,
+            dropped_packets=10,
+            dropped_bytes=1000,
+            metadata={"vrf": "blue", "source": "edge1.txt"},
+            filter="destination-prefix: 192.0.2.0/24",
+        ),
+        FlowSpec(
+            raw="2001:db8::/32",
+            destination_prefix=IPNetwork("2001:db8::/32"),
+            source_prefix=IPNetwork("2001:db8:1::1/128"),
+            fragment=BitmaskValues((BitmaskOp(match=True), 0x01)),
+            action=Action.DISCARD,
+            rate_limit_bps=0,
+        ),
+        FlowSpec(),
+    ]
+
+
+def test_binary_round_trip():
+    flows = _flows()
+
+    assert loads(dumps(flows)) == flows
+
+
+@pytest.mark.parametrize(
+    "flow",
+    [
+        FlowSpec(port=NumericValues()),
+        FlowSpec(tcp_flags=BitmaskValues()),
+        FlowSpec(destination_prefix=IPNetwork("0.0.0.0/0")),
+        FlowSpec(source_prefix=IPNetwork("::/0")),
+        FlowSpec(dscp=NumericValues((NumericOp(eq=True), 2**40))),
+        FlowSpec(rate_limit_bps=-1, matched_bytes=2**63),
+        FlowSpec(raw="é", filter="", metadata={"": "ü"}),
+    ],
+    ids=repr,
+)
+def test_binary_round_trip_edge_cases(flow):
+    assert loads(dumps([flow])) == [flow]
+
+
+def test_binary_empty():
+    assert dumps([]) == MAGIC
+    assert loads(MAGIC) == []
+
+
+def test_binary_invalid():
+    with pytest.raises(ValueError, match="Not a binary"):
+        loads(b"[]")
+
+    data = dumps(_flows()[:1])
+
+    for end in range(len(MAGIC) + 1, len(data)):
+        with pytest.raises(ValueError):
+            loads(data[:end])
+
+
+def test_json_matches_dataclasses_json():
+    expected = DATACLASSES_JSON_OUTPUT.read_text()
+
+    assert FlowSpecs(flows=_flows()).to_json(indent=2, default=str) + "\n" == expected
+
+
+def test_json_round_trip():
+    expected = DATACLASSES_JSON_OUTPUT.read_text()
+
+    flowspecs = FlowSpecs.from_json(expected)
+
+    assert flowspecs.flows == _flows()
+    assert flowspecs.to_json(indent=2, default=str) + "\n" == expected
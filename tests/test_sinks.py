@@ -0,0 +1,227 @@
+import asyncio
+import os
+import sqlite3
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from netaddr import IPNetwork
+
+from flowspec_exporter.flowspec import FlowSpec
+from flowspec_exporter.sinks import (
+    FanOutSink,
+    PostgresSink,
+    Sink,
+    SQLiteSink,
+    create_sink,
+)
+
+TIMESTAMP = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# Like the API tests.
+DATABASE = os.environ.get("FLOWSPEC_TEST_DATABASE")
+
+
+def _entries() -> list[FlowSpec]:
+    return [
+        FlowSpec(
+            destination_prefix=IPNetwork("192.0.2.1/32"),
+            matched_packets=10,
+            matched_bytes=1000,
+            metadata={"vrf": "blue"},
+        ),
+        # The same filter in another VRF is another rule.
+        FlowSpec(
+            destination_prefix=IPNetwork("192.0.2.1/32"),
+            matched_packets=20,
+            matched_bytes=2000,
+            metadata={"vrf": "red"},
+        ),
+        # Listed twice in the scrape, the first row is kept.
+        FlowSpec(
+            destination_prefix=IPNetwork("192.0.2.1/32"),
+            matched_packets=30,
+            matched_bytes=3000,
+            metadata={"vrf": "red"},
+        ),
+    ]
+
+
+def test_sqlite_dedups(tmp_path):
+    path = tmp_path / "flowspecs.db"
+
+    async def run() -> None:
+        sink = SQLiteSink(str(path))
+        await sink.open()
+
+        try:
+            await sink.write("edge1", TIMESTAMP, _entries())
+            # The same scrape again, e.g. retried.
+            await sink.write("edge1", TIMESTAMP, _entries())
+        finally:
+            await sink.close()
+
+    asyncio.run(run())
+
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(
+            "SELECT router, timestamp, filter, vrf, afi, matched_packets "
+            "FROM flowspecs ORDER BY vrf"
+        ).fetchall()
+
+    assert rows == [
+        (
+            "edge1",
+            "2025-01-01T00:00:00+00:00",
+            "destination-prefix: 192.0.2.1/32",
+            vrf,
+            "",
+            matched_packets,
+        )
+        for vrf, matched_packets in (("blue", 10), ("red", 20))
+    ]
+
+
+# The table of the worker before the VRFs, and its migration in the README.
+OLD_TABLE = """
+CREATE TABLE flowspecs (
+    router text not null,
+    filter text not null,
+    timestamp timestamptz not null,
+    matched_packets bigint,
+    matched_bytes bigint,
+    transmitted_packets bigint,
+    transmitted_bytes bigint,
+    dropped_packets bigint,
+    dropped_bytes bigint,
+    primary key (router, filter, timestamp)
+)
+"""
+
+MIGRATION = [
+    "CREATE UNIQUE INDEX CONCURRENTLY flowspecs_vrf_pkey "
+    "ON flowspecs (router, vrf, afi, filter, timestamp)",
+    """
+    BEGIN;
+    ALTER TABLE flowspecs DROP CONSTRAINT flowspecs_pkey;
+    ALTER TABLE flowspecs ADD CONSTRAINT flowspecs_pkey PRIMARY KEY USING INDEX flowspecs_vrf_pkey;
+    COMMIT;
+    """,
+]
+
+
+@pytest.mark.skipif(DATABASE is None, reason="FLOWSPEC_TEST_DATABASE isn't set")
+def test_postgres_migration():
+    import asyncpg
+
+    # A schema per test, like the API tests.
+    schema = f"test_{uuid.uuid4().hex}"
+    connection = f"{DATABASE}?search_path={schema}"
+
+    async def run() -> list[tuple]:
+        admin = await asyncpg.connect(DATABASE)
+        await admin.execute(f"CREATE SCHEMA {schema}")
+
+        try:
+            conn = await asyncpg.connect(connection)
+
+            try:
+                await conn.execute(OLD_TABLE)
+
+                # Not changed on start, the columns are added though.
+                with pytest.raises(RuntimeError, match="see the migration"):
+                    await PostgresSink(connection).open()
+
+                for query in MIGRATION:
+                    await conn.execute(query)
+
+                sink = PostgresSink(connection)
+                await sink.open()
+
+                try:
+                    await sink.write("edge1", TIMESTAMP, _entries())
+                    await sink.write("edge1", TIMESTAMP, _entries())
+                finally:
+                    await sink.close()
+
+                rows = await conn.fetch(
+                    "SELECT vrf, matched_packets FROM flowspecs ORDER BY vrf"
+                )
+            finally:
+                await conn.close()
+        finally:
+            await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+            await admin.close()
+
+        return [tuple(row) for row in rows]
+
+    assert asyncio.run(run()) == [("blue", 10), ("red", 20)]
+
+
+class RecordingSink(Sink):
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+
+        self.opened = self.closed = False
+        self.writes: list[str] = []
+
+    async def open(self) -> None:
+        # Let the other sinks open first.
+        await asyncio.sleep(0)
+
+        if self.fail:
+            raise ConnectionError("Unable to connect")
+
+        self.opened = True
+
+    async def write(
+        self, router: str, timestamp: datetime, entries: list[FlowSpec]
+    ) -> None:
+        if self.fail:
+            raise ConnectionError("Connection lost")
+
+        self.writes.append(router)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def test_fan_out_open_failure():
+    sinks = [RecordingSink(), RecordingSink(fail=True), RecordingSink()]
+
+    with pytest.raises(ConnectionError, match="Unable to connect"):
+        asyncio.run(FanOutSink(sinks).open())  # type: ignore
+
+    # The opened sinks are closed, the failed one wasn't opened.
+    assert [(sink.opened, sink.closed) for sink in sinks] == [
+        (True, True),
+        (False, False),
+        (True, True),
+    ]
+
+
+def test_fan_out_write_failure(caplog):
+    sinks = [RecordingSink(), RecordingSink()]
+    fan_out = FanOutSink(sinks)  # type: ignore
+
+    async def run() -> None:
+        await fan_out.open()
+
+        sinks[0].fail = True
+        await fan_out.write("edge1", TIMESTAMP, _entries())
+
+        await fan_out.close()
+
+    asyncio.run(run())
+
+    # The other sink still got the rules.
+    assert sinks[1].writes == ["edge1"]
+    assert "Failed to write to sink" in caplog.text
+    assert all(sink.closed for sink in sinks)
+
+
+def test_create_sink():
+    assert isinstance(create_sink("sqlite:/tmp/flowspecs.db", ""), SQLiteSink)
+
+    with pytest.raises(ValueError, match="Invalid sink 'sqlite'"):
+        create_sink("sqlite", "")
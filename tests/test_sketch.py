@@ -0,0 +1,128 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from flowspec_exporter.sketch import HeavyHitters
+
+CAPACITY = 50
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _stream(seed: int, count: int) -> list[tuple[int, int]]:
+    """Zipf-like keys and sizes, a few keys carry most of the total."""
+
+    rnd = random.Random(seed)
+
+    keys = list(range(1000))
+    weights = [1 / (key + 1) ** 1.2 for key in keys]
+
+    return [
+        (key, rnd.randint(1, 10)) for key in rnd.choices(keys, weights=weights, k=count)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_skewed_stream(seed):
+    stream = _stream(seed, 20_000)
+
+    # Without time passing, the rates are the sums times the decay constant.
+    heavy_hitters: HeavyHitters[int] = HeavyHitters(CAPACITY, clock=Clock())
+    decay = math.log(2) / heavy_hitters.half_life
+
+    totals: Counter[int] = Counter()
+
+    for key, value in stream:
+        heavy_hitters.add(key, value)
+        totals[key] += value
+
+    total = sum(totals.values())
+
+    top = heavy_hitters.top(CAPACITY)
+
+    assert len(heavy_hitters) == len(top) == CAPACITY
+
+    for key, rate, error in top:
+        estimate = rate / decay
+
+        # An overestimate, by at most its error and the total over the
+        # capacity.
+        assert totals[key] <= estimate + 1e-6
+        assert estimate - error / decay <= totals[key] + 1e-6
+        assert error / decay <= total / CAPACITY + 1e-6
+
+    # Every key above its share is kept, and the largest are in order.
+    reported = {key for key, _, _ in top}
+
+    assert {key for key, value in totals.items() if value > total / CAPACITY} <= (
+        reported
+    )
+    assert [key for key, _, _ in heavy_hitters.top(5)] == [
+        key for key, _ in totals.most_common(5)
+    ]
+
+
+def test_decay():
+    clock = Clock()
+    heavy_hitters: HeavyHitters[str] = HeavyHitters(2, half_life=60, clock=clock)
+
+    heavy_hitters.add("stale", 1000)
+
+    clock.now = 600
+    heavy_hitters.add("fresh", 100)
+
+    (fresh, fresh_rate, _), (stale, stale_rate, _) = heavy_hitters.top(2)
+
+    # Ten half-lives later, the stale key is down to a thousandth.
+    assert (fresh, stale) == ("fresh", "stale")
+    assert stale_rate == pytest.approx(fresh_rate * 1000 / 100 / 2**10)
+
+    # And both halve with every half-life.
+    clock.now = 660
+    (_, later, _), _ = heavy_hitters.top(2)
+
+    assert later == pytest.approx(fresh_rate / 2)
+
+    # A new key replaces the stale one, not the fresh one.
+    heavy_hitters.add("new", 1)
+
+    assert {key for key, _, _ in heavy_hitters.top(2)} == {"fresh", "new"}
+
+
+def test_decay_rescale():
+    # Far enough apart for the weights to be scaled back, the rates are the
+    # same.
+    clock = Clock()
+    heavy_hitters: HeavyHitters[str] = HeavyHitters(10, half_life=1, clock=clock)
+
+    heavy_hitters.add("old", 2**20)
+
+    clock.now = 1000
+    heavy_hitters.add("new", 1)
+
+    clock.now = 1010
+    heavy_hitters.add("new", 1)
+
+    rates = {key: rate for key, rate, _ in heavy_hitters.top(10)}
+
+    decay = math.log(2)
+
+    assert rates["new"] == pytest.approx(decay * (1 + 2**-10))
+    assert rates["old"] == pytest.approx(decay * 2**-990, rel=1e-6, abs=0)
+
+
+def test_ignores_non_positive_values():
+    heavy_hitters: HeavyHitters[str] = HeavyHitters(10, clock=Clock())
+
+    heavy_hitters.add("zero", 0)
+    heavy_hitters.add("negative", -5)
+
+    assert heavy_hitters.top(10) == []
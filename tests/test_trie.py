@@ -0,0 +1,209 @@
+import random
+
+import pytest
+from netaddr import IPNetwork
+
+from flowspec_exporter.trie import PrefixTrie
+
+PREFIXES = [
+    IPNetwork(prefix)
+    for prefix in (
+        "0.0.0.0/0",
+        "192.0.2.0/24",
+        "192.0.2.0/25",
+        "192.0.2.128/25",
+        "192.0.2.1/32",
+        "192.0.2.255/32",
+        "198.51.100.0/24",
+        "255.255.255.255/32",
+        "::/0",
+        "2001:db8::/32",
+        "2001:db8::1/128",
+        "2001:db8:ffff::/48",
+        # IPv4-mapped, still IPv6.
+        "::ffff:192.0.2.0/120",
+    )
+]
+
+QUERIES = PREFIXES + [
+    IPNetwork(prefix)
+    for prefix in (
+        "192.0.2.7/32",
+        "192.0.0.0/16",
+        "10.0.0.0/8",
+        "2001:db8:1::/48",
+        "2001::/16",
+        "::1/128",
+    )
+]
+
+
+def _trie(values: list[tuple[IPNetwork, str]]) -> PrefixTrie[str]:
+    trie: PrefixTrie[str] = PrefixTrie()
+
+    for prefix, value in values:
+        trie.add(prefix, value)
+
+    return trie
+
+
+def _values() -> list[tuple[IPNetwork, str]]:
+    # Two values for some prefixes.
+    return [(prefix, str(prefix)) for prefix in PREFIXES] + [
+        (PREFIXES[1], "other"),
+        (PREFIXES[10], "other"),
+    ]
+
+
+def _contains(a: IPNetwork, b: IPNetwork) -> bool:
+    return a.version == b.version and b in a
+
+
+@pytest.mark.parametrize("query", QUERIES, ids=str)
+def test_lookups(query):
+    values = _values()
+    trie = _trie(values)
+
+    assert len(trie) == len(values)
+
+    covering = {(p, v) for p, v in values if _contains(p, query)}
+    covered = {(p, v) for p, v in values if _contains(query, p) and p != query}
+
+    assert set(trie.covering(query)) == covering
+    assert set(trie.covered(query)) == covered
+    assert sorted(trie.overlapping(query)) == sorted(covering | covered)
+
+
+def test_covering_order():
+    trie = _trie(_values())
+
+    # From the shortest prefix to the longest.
+    prefixes = [prefix for prefix, _ in trie.covering(IPNetwork("192.0.2.1/32"))]
+
+    assert prefixes == [
+        IPNetwork("0.0.0.0/0"),
+        IPNetwork("192.0.2.0/24"),
+        IPNetwork("192.0.2.0/24"),
+        IPNetwork("192.0.2.0/25"),
+        IPNetwork("192.0.2.1/32"),
+    ]
+
+
+def test_address_families_apart():
+    trie = _trie([(IPNetwork("0.0.0.0/0"), "ipv4")])
+
+    assert list(trie.covering(IPNetwork("::/128"))) == []
+    assert list(trie.covered(IPNetwork("::/0"))) == []
+    assert list(trie.covering(IPNetwork("0.0.0.0/32"))) == [
+        (IPNetwork("0.0.0.0/0"), "ipv4")
+    ]
+
+
+def test_add_twice():
+    trie = _trie([(IPNetwork("192.0.2.0/24"), "a"), (IPNetwork("192.0.2.0/24"), "a")])
+
+    assert len(trie) == 1
+
+    # Stored by network.
+    trie.add(IPNetwork("192.0.2.7/24"), "b")
+
+    assert sorted(trie.covering(IPNetwork("192.0.2.0/24"))) == [
+        (IPNetwork("192.0.2.0/24"), "a"),
+        (IPNetwork("192.0.2.0/24"), "b"),
+    ]
+
+
+def _nodes(trie: PrefixTrie) -> int:
+    count = 0
+    stack = list(trie._roots.values())
+
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for child in node.children if child is not None)
+
+    return count
+
+
+def test_discard_prunes_empty_nodes():
+    trie: PrefixTrie[str] = PrefixTrie()
+
+    trie.add(IPNetwork("192.0.2.0/24"), "a")
+    nodes = _nodes(trie)
+
+    # Host routes, discarding them drops their branches.
+    trie.add(IPNetwork("192.0.2.1/32"), "b")
+    trie.add(IPNetwork("2001:db8::1/128"), "c")
+
+    assert _nodes(trie) == nodes + 8 + 128
+
+    trie.discard(IPNetwork("192.0.2.1/32"), "b")
+    trie.discard(IPNetwork("2001:db8::1/128"), "c")
+
+    assert _nodes(trie) == nodes
+    assert len(trie) == 1
+
+    # Unknown values and prefixes are ignored.
+    trie.discard(IPNetwork("192.0.2.0/24"), "b")
+    trie.discard(IPNetwork("192.0.2.0/25"), "a")
+    trie.discard(IPNetwork("10.0.0.0/8"), "a")
+
+    assert len(trie) == 1
+
+    # A prefix with another value left, or with longer prefixes below it, is
+    # kept.
+    trie.add(IPNetwork("192.0.2.0/24"), "b")
+    trie.add(IPNetwork("192.0.2.0/25"), "c")
+    trie.discard(IPNetwork("192.0.2.0/24"), "a")
+    trie.discard(IPNetwork("192.0.2.0/24"), "b")
+
+    assert list(trie.covering(IPNetwork("192.0.2.0/25"))) == [
+        (IPNetwork("192.0.2.0/25"), "c")
+    ]
+    assert _nodes(trie) == nodes + 1
+
+    trie.discard(IPNetwork("192.0.2.0/25"), "c")
+
+    # Only the roots are left.
+    assert _nodes(trie) == 2
+    assert len(trie) == 0
+
+
+def test_discard_default_route():
+    trie = _trie([(IPNetwork("0.0.0.0/0"), "a"), (IPNetwork("192.0.2.1/32"), "b")])
+
+    trie.discard(IPNetwork("0.0.0.0/0"), "a")
+
+    assert list(trie.overlapping(IPNetwork("0.0.0.0/0"))) == [
+        (IPNetwork("192.0.2.1/32"), "b")
+    ]
+
+
+def test_random_add_and_discard():
+    rnd = random.Random(0)
+
+    trie: PrefixTrie[int] = PrefixTrie()
+    expected: set[tuple[IPNetwork, int]] = set()
+
+    for _ in range(2000):
+        prefix = rnd.choice(PREFIXES)
+        value = rnd.randrange(3)
+
+        if rnd.random() < 0.6:
+            trie.add(prefix, value)
+            expected.add((prefix, value))
+        else:
+            trie.discard(prefix, value)
+            expected.discard((prefix, value))
+
+    assert len(trie) == len(expected)
+
+    for query in QUERIES:
+        assert sorted(trie.overlapping(query)) == sorted(
+            (p, v) for p, v in expected if _contains(p, query) or _contains(query, p)
+        )
+
+    for prefix, value in expected:
+        trie.discard(prefix, value)
+
+    assert _nodes(trie) == 2